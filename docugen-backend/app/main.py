@@ -1,21 +1,41 @@
 # import app.pil_compat  # Apply PIL compatibility fix before any other imports - temporarily disabled for deployment
 
-from fastapi import FastAPI, HTTPException, Header
+from fastapi import FastAPI, HTTPException, Header, Query, Request, Response, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
 from dotenv import load_dotenv
 import os
-import asyncio
-from openai import OpenAI
-from elevenlabs.client import ElevenLabs
+import io
+import re
+import csv
 import json
 import uuid
+import base64
+import hashlib
 import logging
+import threading
 from datetime import datetime
-from typing import List, Optional, Dict, Any
-from app.services.video_generator import VideoGenerator
-from app.services.social_media import SocialMediaUploader
+from typing import List, Optional, Dict, Any, Tuple
+from app.services.video_generator import VideoGenerator, RENDER_ENGINES, FORMAT_DIMENSIONS
+from app.services.render_scheduler import RenderScheduler
+from app.services.admission import AdmissionController
+from app.services.asset_cache import AssetCache
+from app.services.image_library import ImageLibrary
+from app.services.job_queue import JobQueue, QueueFullError
+from app.services.durable_queue import DurableJobQueue, SharedEventLog
+from app.services.generation_store import GenerationStore
+from app.services.progress import ProgressBroker, TERMINAL_STAGES
+from app.services.stage_graph import StageGraph
+from app.services.voice import VoiceSynthesizer
+from app.services.llm_cache import LLMCache, CachedChatClient
+from app.services.lazy_client import LazyClient
+from app.services.rate_limit import RateLimits, ProviderUnavailableError
+from app.services.batches import BatchStore, BatchDispatcher
+from app.services.file_serving import file_response
+from app.services.artifacts import ArtifactStore, ArtifactReaper
+from app.services.metrics import REGISTRY, JobMetrics, stage, count_bytes, rss_bytes
+from app.services.social_media import SocialMediaUploader, UploadStore
 
 load_dotenv()
 
@@ -36,28 +56,80 @@ app.add_middleware(
 openai_api_key = os.getenv("OPENAI_API_KEY")
 elevenlabs_api_key = os.getenv("ELEVENLABS_API_KEY")
 
+llm_cache = LLMCache()
+rate_limits = RateLimits()
+
+def _openai_sdk_client():
+    from openai import OpenAI
+    # Retries are handled by the shared OpenAI ProviderLimiter rather than per call inside the SDK
+    return OpenAI(api_key=openai_api_key, max_retries=0)
+
+def _elevenlabs_sdk_client():
+    from elevenlabs.client import ElevenLabs
+    return ElevenLabs(api_key=elevenlabs_api_key)
+
+# The SDKs are imported and the clients built on first use, so the API answers before either loads
 if openai_api_key:
-    openai_client = OpenAI(api_key=openai_api_key)
+    openai_client = CachedChatClient(LazyClient(_openai_sdk_client), llm_cache, limiter=rate_limits.provider("openai"))
 else:
     logger.warning("OPENAI_API_KEY not found - OpenAI functionality will be disabled")
     openai_client = None
 
 if elevenlabs_api_key:
-    elevenlabs_client = ElevenLabs(api_key=elevenlabs_api_key)
+    elevenlabs_client = LazyClient(_elevenlabs_sdk_client)
 else:
     logger.warning("ELEVENLABS_API_KEY not found - ElevenLabs functionality will be disabled")
     elevenlabs_client = None
 
-video_generator = VideoGenerator()
-social_uploader = SocialMediaUploader()
+render_admission = AdmissionController()
+render_scheduler = RenderScheduler(admission=render_admission)
+asset_cache = AssetCache()
+image_library = ImageLibrary(sizes=FORMAT_DIMENSIONS)
+artifact_store = ArtifactStore(on_remove=lambda generation_id: _artifacts_removed(generation_id))
+artifact_reaper = ArtifactReaper(artifact_store)
+video_generator = VideoGenerator(scheduler=render_scheduler, cache=asset_cache, limiter=rate_limits.provider("pexels"),
+                                 artifacts=artifact_store, library=image_library, admission=render_admission)
+upload_store = UploadStore()
+social_uploader = SocialMediaUploader(upload_store, on_progress=lambda upload: _upload_progress(upload),
+                                      on_complete=lambda upload: _upload_finished(upload))
+# "all" serves the API and runs jobs in one process; with the sqlite queue, "api" only queues jobs and
+# render workers started with `python -m app.worker` (role "worker") run them, on this machine or others
+APP_ROLE = os.getenv("APP_ROLE", "all")
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "memory")
+if APP_ROLE not in ("all", "api", "worker"):
+    raise RuntimeError(f"Unknown APP_ROLE: {APP_ROLE}")
+if APP_ROLE != "all" and JOB_QUEUE_BACKEND != "sqlite":
+    raise RuntimeError(f"APP_ROLE={APP_ROLE} needs a shared job queue (JOB_QUEUE_BACKEND=sqlite)")
+distributed = JOB_QUEUE_BACKEND == "sqlite"
+
+if distributed:
+    job_queue = DurableJobQueue(hold=lambda fn: _provider_hold(fn), consume=APP_ROLE != "api",
+                                on_abandoned=lambda generation_id, error: _job_abandoned(generation_id, error))
+    event_log = SharedEventLog(origin=job_queue.worker_id)
+    progress_broker = ProgressBroker(on_publish=event_log.append)
+else:
+    job_queue = JobQueue(hold=lambda fn: _provider_hold(fn))
+    event_log = None
+    progress_broker = ProgressBroker()
+
+generation_store = GenerationStore(shared=distributed)
+batch_store = BatchStore()
 
-video_generations = []
+SSE_KEEPALIVE_SECONDS = 15
+VOICE_PROGRESS_SECONDS = 5.0
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+PROVIDER_HOLD_LIMIT = int(os.getenv("PROVIDER_HOLD_LIMIT", "3"))
+
+_social_uploads_lock = threading.Lock()
 
 class VideoGenerationRequest(BaseModel):
     topic: str
     niche: str
     aspect_ratios: Optional[List[str]] = ["16:9", "9:16", "1:1"]
     social_platforms: Optional[List[str]] = []
+    priority: Optional[int] = 0
+    render_engine: Optional[str] = None
+    draft: Optional[bool] = False
 
 class VideoGenerationResponse(BaseModel):
     id: str
@@ -67,43 +139,237 @@ class VideoGenerationResponse(BaseModel):
     created_at: str
     aspect_ratios: Optional[List[str]] = None
     social_platforms: Optional[List[str]] = None
+    queue_position: Optional[int] = None
+    render_engine: Optional[str] = None
+    draft: Optional[bool] = None
+
+class BatchGenerationRequest(BaseModel):
+    requests: List[VideoGenerationRequest]
 
 class SocialUploadRequest(BaseModel):
     generation_id: str
     platforms: List[str]
 
+@app.on_event("startup")
+async def startup():
+    # Picks up batch generations that were still waiting when the server last stopped
+    batch_dispatcher.start()
+    artifact_reaper.start()
+    if event_log:
+        event_log.follow(progress_broker)
+    # Live workers may be mid-upload; only resume when nothing else can be running them
+    if not distributed or job_queue.stats()["worker_processes"] == 0:
+        social_uploader.resume_pending()
+    if distributed:
+        job_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    batch_dispatcher.shutdown()
+    artifact_reaper.shutdown()
+    social_uploader.shutdown()
+    image_library.shutdown()
+    job_queue.shutdown()
+    if event_log:
+        event_log.shutdown()
+    render_scheduler.shutdown()
+    generation_store.close()
+    batch_store.close()
+    upload_store.close()
+
 @app.get("/healthz")
 async def healthz():
     return {"status": "ok"}
 
+REGISTRY.gauge("docugen_queue_depth", "Generation jobs waiting in the queue", lambda: job_queue.depth)
+REGISTRY.gauge("docugen_render_active", "Encodes submitted to the render pool and not yet finished",
+               lambda: render_scheduler.active)
+REGISTRY.gauge("docugen_render_memory_reserved_bytes", "Estimated memory of the encodes admitted and running",
+               lambda: render_admission.memory_in_use)
+REGISTRY.gauge("docugen_render_admission_waiting", "Encodes waiting for the render memory/CPU budget",
+               lambda: render_admission.waiting)
+REGISTRY.gauge("docugen_process_rss_bytes", "Resident memory of the API process", rss_bytes)
+REGISTRY.gauge("docugen_artifacts_bytes", "Bytes of generated files on disk",
+               lambda: artifact_store.stats()["bytes_stored"])
+
+@app.get("/metrics")
+def get_metrics():
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def _encode_cursor(key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+def _decode_cursor(cursor: str, delta: bool = False):
+    try:
+        position, generation_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (int(position) if delta else str(position)), str(generation_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/api/generations")
-async def get_generations():
-    return {"generations": video_generations}
+async def get_generations(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    niche: Optional[str] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    updated_since: Optional[str] = None,
+    since: Optional[int] = Query(None, description="Change feed: only changes after this token (the \"since\" of the last poll); "
+                                                   "deleted generations come back as {id, deleted: true}"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return; script is omitted unless requested"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
+):
+    delta = updated_since is not None or since is not None
+    # Queue positions are part of the response, so they are part of the ETag too
+    positions = job_queue.positions()
+    query_key = (f"{limit}|{cursor}|{status}|{niche}|{created_after}|{created_before}|{updated_since}|{since}|{fields}"
+                 f"|{sorted(positions.items())}")
+    etag = f'W/"{generation_store.current_version()}-{hashlib.md5(query_key.encode()).hexdigest()[:12]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    
+    page, next_key = generation_store.query(
+        limit=limit,
+        after=_decode_cursor(cursor, delta) if cursor else None,
+        status=status,
+        niche=niche,
+        created_after=created_after,
+        created_before=created_before,
+        updated_since=updated_since,
+        since_rev=since
+    )
+    
+    selected = {f.strip() for f in fields.split(",") if f.strip()} | {"id", "deleted"} if fields else None
+    generations = []
+    for g in page:
+        if g["id"] in positions:
+            g["queue_position"] = positions[g["id"]]
+        if selected:
+            g = {k: v for k, v in g.items() if k in selected}
+        else:
+            g.pop("script", None)
+        generations.append(g)
+    
+    response.headers.update(headers)
+    result = {"generations": generations, "next_cursor": _encode_cursor(next_key) if next_key else None}
+    if delta:
+        # Poll again with since=<this> to get only what changed after this page
+        result["since"] = page[-1]["rev"] if page else since
+        result["updated_until"] = page[-1]["updated_at"] if page else updated_since
+    return result
 
-@app.get("/api/download/{generation_id}")
-async def download_audio(generation_id: str):
-    generation = next((g for g in video_generations if g["id"] == generation_id), None)
+@app.get("/api/generations/{generation_id}")
+async def get_generation(generation_id: str):
+    generation = generation_store.get(generation_id)
+    if not generation:
+        raise HTTPException(status_code=404, detail="Generation not found")
+    position = job_queue.position(generation_id)
+    if position:
+        generation["queue_position"] = position
+    return generation
+
+@app.get("/api/generations/{generation_id}/artifacts")
+def get_generation_artifacts(generation_id: str):
+    manifest = artifact_store.manifest(generation_id)
+    if not manifest:
+        raise HTTPException(status_code=404, detail="No artifacts stored for this generation")
+    return manifest
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['stage']}\ndata: {json.dumps(event)}\n\n"
+
+async def _stream_events(generation_id: Optional[str], snapshot: Optional[Dict[str, Any]]):
+    subscription = progress_broker.subscribe(generation_id)
+    try:
+        if snapshot:
+            yield _sse(snapshot)
+            if generation_id and snapshot["stage"] in TERMINAL_STAGES:
+                return
+        while True:
+            event = await subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            yield _sse(event)
+            if generation_id and event["stage"] in TERMINAL_STAGES:
+                return
+    finally:
+        subscription.close()
+
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.get("/api/generations/{generation_id}/events")
+async def generation_events(generation_id: str):
+    generation = generation_store.get(generation_id)
     if not generation:
         raise HTTPException(status_code=404, detail="Generation not found")
     
-    if generation["status"] != "completed":
+    snapshot = progress_broker.latest(generation_id)
+    if generation["status"] in TERMINAL_STAGES:
+        snapshot = {"generation_id": generation_id, "stage": generation["status"], "status": generation["status"],
+                    "timestamp": generation["updated_at"]}
+    elif not snapshot:
+        snapshot = {"generation_id": generation_id, "stage": "queued", "status": "started",
+                    "timestamp": generation["updated_at"], "queue_position": job_queue.position(generation_id)}
+    
+    return StreamingResponse(_stream_events(generation_id, snapshot), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+@app.get("/api/events")
+async def all_events():
+    return StreamingResponse(_stream_events(None, None), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+@app.get("/api/queue")
+async def get_queue():
+    return job_queue.stats()
+
+@app.get("/api/cache")
+def get_cache_stats():
+    return asset_cache.stats()
+
+@app.get("/api/library")
+def get_library_stats():
+    return image_library.stats()
+
+@app.get("/api/render-admission")
+def get_render_admission():
+    return render_admission.stats()
+
+@app.get("/api/artifacts")
+def get_artifact_stats():
+    return artifact_store.stats()
+
+@app.get("/api/cache/llm")
+def get_llm_cache_stats():
+    return llm_cache.stats()
+
+@app.get("/api/rate-limits")
+def get_rate_limits():
+    return rate_limits.stats()
+
+@app.api_route("/api/download/{generation_id}", methods=["GET", "HEAD"])
+async def download_audio(generation_id: str, request: Request):
+    generation = generation_store.get(generation_id)
+    if not generation:
+        raise HTTPException(status_code=404, detail="Generation not found")
+    
+    if generation["status"] not in ("completed", "preview_ready"):
         raise HTTPException(status_code=400, detail="Generation not completed yet")
     
     audio_filename = f"voiceover_{generation_id}.mp3"
-    file_path = f"/tmp/{audio_filename}"
+    file_path = os.path.join(artifact_store.dir_for(generation_id), audio_filename)
     
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="Audio file not found")
     
-    return FileResponse(
-        path=file_path,
-        filename=audio_filename,
-        media_type="audio/mpeg"
-    )
+    artifact_store.touch(generation_id)
+    return file_response(request, file_path, audio_filename, "audio/mpeg")
 
-@app.get("/api/download-video/{generation_id}/{format}")
-async def download_video(generation_id: str, format: str):
-    generation = next((g for g in video_generations if g["id"] == generation_id), None)
+@app.api_route("/api/download-video/{generation_id}/{format}", methods=["GET", "HEAD"])
+async def download_video(generation_id: str, format: str, request: Request):
+    generation = generation_store.get(generation_id)
     if not generation:
         raise HTTPException(status_code=404, detail="Generation not found")
     
@@ -116,214 +382,728 @@ async def download_video(generation_id: str, format: str):
     if format_key not in video_files or not video_files[format_key]:
         raise HTTPException(status_code=404, detail=f"Video file not found for format {format}")
     
-    file_path = video_files[format_key]
+    file_path = _artifact_file(generation_id, video_files[format_key])
     
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="Video file not found on disk")
     
+    artifact_store.touch(generation_id)
     video_filename = f"documentary_{generation_id}_{format}.mp4"
     
-    return FileResponse(
-        path=file_path,
-        filename=video_filename,
-        media_type="video/mp4"
-    )
+    return file_response(request, file_path, video_filename, "video/mp4")
+
+@app.api_route("/api/download-preview/{generation_id}", methods=["GET", "HEAD"])
+async def download_preview(generation_id: str, request: Request):
+    generation = generation_store.get(generation_id)
+    if not generation:
+        raise HTTPException(status_code=404, detail="Generation not found")
+    
+    if not generation.get("preview_file"):
+        raise HTTPException(status_code=404, detail="Generation has no preview")
+    
+    file_path = _artifact_file(generation_id, generation["preview_file"])
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Preview file not found on disk")
+    
+    artifact_store.touch(generation_id)
+    preview_filename = f"preview_{generation_id}_{generation['preview_format'].replace(':', 'x')}.mp4"
+    
+    return file_response(request, file_path, preview_filename, "video/mp4")
 
 @app.post("/api/generate-video")
 async def generate_video(request: VideoGenerationRequest, x_api_key: str = Header(None, alias="X-API-Key")):
     logger.info(f"Incoming video generation request for topic: {request.topic}")
     logger.debug(f"Request details: {request.dict()}")
 
-    if not x_api_key or x_api_key != os.getenv("BACKEND_API_KEY"):
-        logger.error("Missing or invalid X-API-Key header")
-        raise HTTPException(status_code=401, detail="Invalid API key")
+    _check_api_key(x_api_key)
+    _check_request(request)
 
     try:
-        generation_id = str(uuid.uuid4())
+        generation = _new_generation(request, "generating")
+        generation_id = generation["id"]
         logger.info(f"Starting video generation with ID: {generation_id}")
+        generation_store.insert(generation)
         
-        generation = {
-            "id": generation_id,
-            "topic": request.topic,
-            "niche": request.niche,
-            "status": "generating",
-            "created_at": datetime.now().isoformat(),
-            "aspect_ratios": request.aspect_ratios,
-            "social_platforms": request.social_platforms
-        }
-        video_generations.insert(0, generation)
-        
-        asyncio.create_task(process_video_generation(
-            generation_id, 
-            request.topic, 
-            request.niche,
-            request.aspect_ratios,
-            request.social_platforms
-        ))
+        try:
+            queue_position = job_queue.submit(
+                generation_id,
+                process_video_generation,
+                generation_id, 
+                request.topic, 
+                request.niche,
+                request.aspect_ratios,
+                request.social_platforms,
+                request.render_engine,
+                bool(request.draft),
+                priority=request.priority or 0
+            )
+        except QueueFullError as e:
+            generation_store.delete(generation_id)
+            logger.warning(f"Rejected generation {generation_id}: {e}")
+            raise HTTPException(status_code=503, detail=str(e))
         
-        return VideoGenerationResponse(**generation)
+        return VideoGenerationResponse(**generation, queue_position=queue_position)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Critical error in video generation endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/upload-to-social")
-async def upload_to_social(request: SocialUploadRequest):
+def _check_api_key(x_api_key: Optional[str]):
+    if not x_api_key or x_api_key != os.getenv("BACKEND_API_KEY"):
+        logger.error("Missing or invalid X-API-Key header")
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+def _check_render_engine(render_engine: Optional[str]):
+    if render_engine and render_engine not in RENDER_ENGINES:
+        raise HTTPException(status_code=400, detail=f"Unknown render engine: {render_engine}")
+
+def _check_request(request: VideoGenerationRequest):
+    _check_render_engine(request.render_engine)
+    if request.draft and not request.aspect_ratios:
+        raise HTTPException(status_code=400, detail="A draft needs at least one aspect ratio to preview")
+
+def _new_generation(request: VideoGenerationRequest, status: str, **extra) -> Dict[str, Any]:
+    return {
+        "id": str(uuid.uuid4()),
+        "topic": request.topic,
+        "niche": request.niche,
+        "status": status,
+        "created_at": datetime.now().isoformat(),
+        "aspect_ratios": request.aspect_ratios,
+        "social_platforms": request.social_platforms,
+        "render_engine": request.render_engine or video_generator.render_engine,
+        "priority": request.priority or 0,
+        "draft": bool(request.draft),
+        **extra
+    }
+
+def _dedupe_requests(requests: List[VideoGenerationRequest]) -> Tuple[List[VideoGenerationRequest], List[int]]:
+    """Merge requests for the same topic and niche; returns the merged requests and each input's index into them.
+
+    Merged requests render the union of the formats and platforms asked for at the highest priority,
+    so duplicates share one script, voiceover and image set.
+    """
+    unique: List[VideoGenerationRequest] = []
+    by_key: Dict[Tuple[str, str], int] = {}
+    mapping = []
+    for request in requests:
+        key = (" ".join(request.topic.lower().split()), " ".join(request.niche.lower().split()))
+        if key not in by_key:
+            by_key[key] = len(unique)
+            unique.append(request.copy(deep=True))
+        else:
+            merged = unique[by_key[key]]
+            for field in ("aspect_ratios", "social_platforms"):
+                values = getattr(merged, field) or []
+                setattr(merged, field, values + [v for v in getattr(request, field) or [] if v not in values])
+            merged.priority = max(merged.priority or 0, request.priority or 0)
+            # A full render request covers a duplicate that only asked for a preview
+            merged.draft = bool(merged.draft and request.draft)
+            merged.render_engine = merged.render_engine or request.render_engine
+        mapping.append(by_key[key])
+    return unique, mapping
+
+def _create_batch(requests: List[VideoGenerationRequest], source: str) -> Dict[str, Any]:
+    if not requests:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(requests) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch has {len(requests)} items; the limit is {BATCH_MAX_ITEMS}")
+    for request in requests:
+        _check_request(request)
+    
+    batch_id = str(uuid.uuid4())
+    unique, mapping = _dedupe_requests(requests)
+    generations = [_new_generation(request, "pending", batch_id=batch_id) for request in unique]
+    items, seen = [], set()
+    for row, (request, index) in enumerate(zip(requests, mapping)):
+        items.append({"row": row, "topic": request.topic, "niche": request.niche,
+                      "generation_id": generations[index]["id"], "duplicate": index in seen})
+        seen.add(index)
+    batch = {
+        "id": batch_id,
+        "created_at": datetime.now().isoformat(),
+        "source": source,
+        "total": len(requests),
+        "unique": len(unique),
+        "generation_ids": [generation["id"] for generation in generations],
+        "items": items,
+    }
+    
+    for generation in generations:
+        generation_store.insert(generation)
+    batch_store.insert(batch, generations)
+    batch_dispatcher.wake()
+    logger.info(f"Created batch {batch_id}: {len(requests)} requests, {len(unique)} unique")
+    return batch
+
+def _submit_batch_generation(generation_id: str):
+    """Dispatcher callback: move one pending batch generation onto the job queue"""
+    generation = generation_store.get(generation_id)
+    if not generation or generation["status"] != "pending":
+        return
+    
+    # Marked before queuing so a fast job's own status updates can't be overwritten afterwards
+    generation_store.update(generation_id, {"status": "generating"})
+    try:
+        job_queue.submit(
+            generation_id,
+            process_video_generation,
+            generation_id,
+            generation["topic"],
+            generation["niche"],
+            generation["aspect_ratios"],
+            generation["social_platforms"],
+            generation["render_engine"],
+            generation.get("draft", False),
+            priority=generation.get("priority", 0)
+        )
+    except QueueFullError:
+        generation_store.update(generation_id, {"status": "pending"})
+        raise
+
+batch_dispatcher = BatchDispatcher(batch_store, job_queue, _submit_batch_generation)
+
+def _batch_summary(batch: Dict[str, Any], include_items: bool = True) -> Dict[str, Any]:
+    counts: Dict[str, int] = {}
+    stages: Dict[str, int] = {}
+    for generation_id in batch["generation_ids"]:
+        generation = generation_store.get(generation_id)
+        status = generation["status"] if generation else "deleted"
+        counts[status] = counts.get(status, 0) + 1
+        if status == "generating":
+            latest = progress_broker.latest(generation_id)
+            stage = latest["stage"] if latest else "queued"
+            stages[stage] = stages.get(stage, 0) + 1
+    
+    finished = sum(counts.get(status, 0) for status in TERMINAL_STAGES + ("deleted",))
+    summary = {key: batch[key] for key in ("id", "created_at", "source", "total", "unique")}
+    summary.update({
+        "status": "completed" if finished == batch["unique"] else "running",
+        "counts": counts,
+        "active_stages": stages,
+        "pending_submission": batch_store.pending_count(batch["id"]),
+        "progress": round(finished / batch["unique"], 4) if batch["unique"] else 1.0,
+    })
+    if include_items:
+        summary["items"] = batch["items"]
+    return summary
+
+_LIST_SEPARATORS = re.compile(r"[;|,]")
+
+def _parse_batch_upload(content: bytes, filename: str) -> List[VideoGenerationRequest]:
+    """Rows from a CSV (header row with topic, niche, ...) or JSONL upload; list columns split on ; | or ,"""
+    text = content.decode("utf-8-sig")
+    if filename.lower().endswith((".jsonl", ".ndjson")):
+        rows = []
+        for line_number, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                rows.append((line_number, json.loads(line)))
+            except json.JSONDecodeError as e:
+                raise HTTPException(status_code=400, detail=f"Line {line_number}: invalid JSON ({e.msg})")
+    else:
+        rows = []
+        for line_number, row in enumerate(csv.DictReader(io.StringIO(text)), 2):
+            row = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+            for field in ("aspect_ratios", "social_platforms"):
+                if field in row:
+                    row[field] = [value.strip() for value in _LIST_SEPARATORS.split(row[field]) if value.strip()]
+                    if not row[field] and field == "aspect_ratios":
+                        del row[field]
+            for field in ("priority", "render_engine", "draft"):
+                if row.get(field) == "":
+                    del row[field]
+            rows.append((line_number, row))
+    
+    requests = []
+    for line_number, row in rows:
+        try:
+            requests.append(VideoGenerationRequest(**row))
+        except (ValidationError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=f"Line {line_number}: {e}")
+    return requests
+
+@app.post("/api/batches")
+def create_batch(request: BatchGenerationRequest, x_api_key: str = Header(None, alias="X-API-Key")):
+    _check_api_key(x_api_key)
+    return _batch_summary(_create_batch(request.requests, "json"))
+
+@app.post("/api/batches/upload")
+def upload_batch(file: UploadFile = File(...), x_api_key: str = Header(None, alias="X-API-Key")):
+    """Accepts a .csv with a header row, or a .jsonl with one request object per line"""
+    _check_api_key(x_api_key)
+    requests = _parse_batch_upload(file.file.read(), file.filename or "")
+    return _batch_summary(_create_batch(requests, file.filename or "upload"))
+
+@app.get("/api/batches")
+def list_batches(limit: int = Query(20, ge=1, le=100)):
+    return {"batches": [_batch_summary(batch, include_items=False) for batch in batch_store.list(limit)]}
+
+@app.get("/api/batches/{batch_id}")
+def get_batch(batch_id: str):
+    batch = batch_store.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return _batch_summary(batch)
+
+@app.post("/api/upload-to-social", status_code=202)
+def upload_to_social(request: SocialUploadRequest):
     try:
-        generation = next((g for g in video_generations if g["id"] == request.generation_id), None)
+        generation = generation_store.get(request.generation_id)
         if not generation:
             raise HTTPException(status_code=404, detail="Generation not found")
         
         if generation["status"] != "completed":
             raise HTTPException(status_code=400, detail="Generation not completed yet")
         
-        video_files = generation.get("video_files", {})
+        video_files = {format_ratio: _artifact_file(request.generation_id, path)
+                       for format_ratio, path in generation.get("video_files", {}).items() if path}
         if not video_files:
             raise HTTPException(status_code=400, detail="No video files available")
         
         title = f"Documentary: {generation['topic']}"
         description = generation.get("description", f"An AI-generated documentary about {generation['topic']}")
         
-        upload_results = social_uploader.upload_to_platforms(
-            video_files, title, description, request.platforms
-        )
-        
-        if "social_uploads" not in generation:
-            generation["social_uploads"] = {}
-        
-        generation["social_uploads"].update(upload_results)
+        uploads = _start_uploads(request.generation_id, video_files, title, description, request.platforms)
         
-        return {"status": "success", "results": upload_results}
+        return {"status": "accepted", "uploads": uploads}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upload to social media: {str(e)}")
 
-async def process_video_generation(generation_id: str, topic: str, niche: str, 
-                                   aspect_ratios: Optional[List[str]] = None, 
-                                   social_platforms: Optional[List[str]] = None):
+@app.post("/api/generations/{generation_id}/approve", status_code=202)
+def approve_generation(generation_id: str, x_api_key: str = Header(None, alias="X-API-Key")):
+    """Queue the full-quality formats of a draft once its preview is approved, reusing its script, voice and images"""
+    _check_api_key(x_api_key)
+    generation = generation_store.get(generation_id)
+    if not generation:
+        raise HTTPException(status_code=404, detail="Generation not found")
+    
+    if generation["status"] != "preview_ready":
+        raise HTTPException(status_code=409, detail=f"Generation is {generation['status']}, not awaiting approval")
+    
+    # Pinned against the reaper until the full render finalizes it again
+    if generation.get("artifacts_removed_at") or not artifact_store.reopen(generation_id):
+        raise HTTPException(status_code=410, detail="Preview assets have expired; generate the video again")
+    if not os.path.exists(os.path.join(artifact_store.dir_for(generation_id), generation["audio_file"])):
+        _finalize_artifacts(generation_id)
+        raise HTTPException(status_code=410, detail="Preview assets have expired; generate the video again")
+    
+    generation = generation_store.update(generation_id, {"status": "generating",
+                                                         "approved_at": datetime.now().isoformat()})
     try:
-        generation = next((g for g in video_generations if g["id"] == generation_id), None)
-        if not generation:
-            return
-            
-        script_prompt = f"""Create a compelling documentary script about {topic} in the {niche} niche. 
-        The script should be engaging, informative, and suitable for a 2-3 minute video.
-        Include a strong opening hook, key facts, and a memorable conclusion.
-        Format as a narrative script without stage directions."""
+        queue_position = job_queue.submit(generation_id, render_approved_generation, generation_id,
+                                          priority=generation.get("priority", 0))
+    except QueueFullError as e:
+        generation_store.update(generation_id, {"status": "preview_ready", "approved_at": None})
+        _finalize_artifacts(generation_id)
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return VideoGenerationResponse(**generation, queue_position=queue_position)
+
+@app.get("/api/generations/{generation_id}/uploads")
+def get_generation_uploads(generation_id: str):
+    if not generation_store.get(generation_id):
+        raise HTTPException(status_code=404, detail="Generation not found")
+    return {"uploads": upload_store.for_generation(generation_id)}
+
+def _upload_summary(upload: Dict[str, Any]) -> Dict[str, Any]:
+    if "id" not in upload:
+        # Rejected before an upload was created (unsupported platform or missing format)
+        return upload
+    summary = {key: upload.get(key) for key in ("id", "status", "bytes_sent", "total_bytes", "mb_per_second")}
+    return {**summary, **upload.get("result", {})}
+
+def _start_uploads(generation_id: str, video_files: Dict[str, str], title: str, description: str,
+                   platforms: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Queue the uploads in the background and record them as queued (or rejected) on the generation"""
+    uploads = social_uploader.start_uploads(video_files, title, description, platforms, generation_id)
+    summaries = {platform: _upload_summary(upload) for platform, upload in uploads.items()}
+    with _social_uploads_lock:
+        generation = generation_store.get(generation_id)
+        if generation:
+            generation_store.update(generation_id, {
+                "social_uploads": {**generation.get("social_uploads", {}), **summaries}
+            })
+    return summaries
+
+def _upload_progress(upload: Dict[str, Any]):
+    total = upload.get("total_bytes") or 0
+    progress_broker.publish(upload["generation_id"], "upload", "progress", platform=upload["platform"],
+                            upload_id=upload["id"], bytes=upload["bytes_sent"], total_bytes=total,
+                            percent=round(100 * upload["bytes_sent"] / total, 1) if total else None,
+                            mb_per_second=upload.get("mb_per_second"))
+
+def _upload_finished(upload: Dict[str, Any]):
+    generation_id = upload["generation_id"]
+    if not generation_id:
+        return
+    with _social_uploads_lock:
+        generation = generation_store.get(generation_id)
+        if generation:
+            generation_store.update(generation_id, {
+                "social_uploads": {**generation.get("social_uploads", {}), upload["platform"]: _upload_summary(upload)}
+            })
+    progress_broker.publish(generation_id, "upload", "completed" if upload["status"] == "success" else "failed",
+                            platform=upload["platform"], upload_id=upload["id"], seconds=upload.get("seconds"),
+                            mb_per_second=upload.get("mb_per_second"))
+
+def _generate_script(generation_id: str, topic: str, niche: str, metrics: Optional[JobMetrics] = None) -> str:
+    script_prompt = f"""Create a compelling documentary script about {topic} in the {niche} niche. 
+    The script should be engaging, informative, and suitable for a 2-3 minute video.
+    Include a strong opening hook, key facts, and a memorable conclusion.
+    Format as a narrative script without stage directions."""
+    
+    if not openai_client:
+        logger.error(f"OpenAI client not available for generation {generation_id}")
+        raise Exception("Script generation failed: OpenAI API key not configured")
         
-        if not openai_client:
-            logger.error(f"OpenAI client not available for generation {generation_id}")
-            raise Exception("Script generation failed: OpenAI API key not configured")
-            
-        try:
+    try:
+        with stage("llm_script", metrics):
             script_response = openai_client.chat.completions.create(
                 model="gpt-4",
                 messages=[
                     {"role": "system", "content": "You are a professional documentary scriptwriter."},
                     {"role": "user", "content": script_prompt}
                 ],
-                max_tokens=1000
-            )
-        except Exception as openai_error:
-            logger.error(f"OpenAI API error for generation {generation_id}: {str(openai_error)}")
-            raise Exception(f"Script generation failed: {str(openai_error)}")
-        
-        script = script_response.choices[0].message.content
-        
-        if not elevenlabs_client:
-            logger.error(f"ElevenLabs client not available for generation {generation_id}")
-            raise Exception("Voice generation failed: ElevenLabs API key not configured")
-            
-        try:
-            audio = elevenlabs_client.text_to_speech.convert(
-                text=script,
-                voice_id="JBFqnCBsd6RMkjVDRZzb",  # Default voice
-                model_id="eleven_multilingual_v2",
-                output_format="mp3_44100_128"
+                max_tokens=1000,
+                cache_topic=f"{topic} {niche}"
             )
-        except Exception as elevenlabs_error:
-            logger.error(f"ElevenLabs API error for generation {generation_id}: {str(elevenlabs_error)}")
-            raise Exception(f"Voice generation failed: {str(elevenlabs_error)}")
-        
-        audio_filename = f"voiceover_{generation_id}.mp3"
-        with open(f"/tmp/{audio_filename}", "wb") as f:
-            for chunk in audio:
-                f.write(chunk)
-        
-        description_prompt = f"""Create a brief, engaging description for a documentary video about {topic}. 
-        Keep it under 200 characters and make it compelling for viewers."""
+    except ProviderUnavailableError:
+        raise
+    except Exception as openai_error:
+        logger.error(f"OpenAI API error for generation {generation_id}: {str(openai_error)}")
+        raise Exception(f"Script generation failed: {str(openai_error)}")
+    
+    script = script_response.choices[0].message.content
+    count_bytes("out", "llm", len(script_prompt.encode()), metrics)
+    count_bytes("in", "llm", len((script or "").encode()), metrics)
+    return script
+
+def _generate_voice(generation_id: str, script: str, report=None,
+                    metrics: Optional[JobMetrics] = None) -> Tuple[str, float]:
+    """Stream the voiceover to disk; returns the filename and its duration from the MP3 frame headers"""
+    if not elevenlabs_client:
+        logger.error(f"ElevenLabs client not available for generation {generation_id}")
+        raise Exception("Voice generation failed: ElevenLabs API key not configured")
+    
+    audio_filename = f"voiceover_{generation_id}.mp3"
+    last_reported = {"seconds": 0.0}
+    
+    def on_progress(bytes_written: int, seconds: float):
+        if report and seconds - last_reported["seconds"] >= VOICE_PROGRESS_SECONDS:
+            last_reported["seconds"] = seconds
+            report("voice", "progress", bytes=bytes_written, seconds=round(seconds, 2))
+    
+    try:
+        synthesizer = VoiceSynthesizer(elevenlabs_client, limiter=rate_limits.provider("elevenlabs"))
+        audio_path = artifact_store.path(generation_id, audio_filename)
+        with stage("tts", metrics) as usage:
+            duration = synthesizer.synthesize(script, audio_path, on_progress)
+            usage["cpu_seconds"] += synthesizer.worker_cpu_seconds
+        count_bytes("out", "tts", len(script.encode()), metrics)
+        count_bytes("in", "tts_audio", os.path.getsize(audio_path), metrics)
+    except ProviderUnavailableError:
+        raise
+    except Exception as elevenlabs_error:
+        logger.error(f"ElevenLabs API error for generation {generation_id}: {str(elevenlabs_error)}")
+        raise Exception(f"Voice generation failed: {str(elevenlabs_error)}")
+    
+    return audio_filename, duration
+
+def _generate_description(generation_id: str, topic: str, metrics: Optional[JobMetrics] = None) -> str:
+    description_prompt = f"""Create a brief, engaging description for a documentary video about {topic}. 
+    Keep it under 200 characters and make it compelling for viewers."""
+    
+    if not openai_client:
+        logger.error(f"OpenAI client not available for description generation {generation_id}")
+        raise Exception("Description generation failed: OpenAI API key not configured")
         
-        if not openai_client:
-            logger.error(f"OpenAI client not available for description generation {generation_id}")
-            raise Exception("Description generation failed: OpenAI API key not configured")
-            
-        try:
+    try:
+        with stage("llm_description", metrics):
             description_response = openai_client.chat.completions.create(
                 model="gpt-4",
                 messages=[
                     {"role": "system", "content": "You are a video marketing expert."},
                     {"role": "user", "content": description_prompt}
                 ],
-                max_tokens=100
+                max_tokens=100,
+                cache_topic=topic
             )
-        except Exception as openai_error:
-            logger.error(f"OpenAI API error for description generation {generation_id}: {str(openai_error)}")
-            raise Exception(f"Description generation failed: {str(openai_error)}")
-        
-        description = description_response.choices[0].message.content
+    except ProviderUnavailableError:
+        raise
+    except Exception as openai_error:
+        logger.error(f"OpenAI API error for description generation {generation_id}: {str(openai_error)}")
+        raise Exception(f"Description generation failed: {str(openai_error)}")
+    
+    description = description_response.choices[0].message.content
+    count_bytes("out", "llm", len(description_prompt.encode()), metrics)
+    count_bytes("in", "llm", len((description or "").encode()), metrics)
+    return description
+
+def build_generation_graph(generation_id: str, topic: str, niche: str, aspect_ratios: Optional[List[str]],
+                           render_engine: Optional[str], report, metrics: Optional[JobMetrics] = None,
+                           draft: bool = False) -> StageGraph:
+    """script -> (voice || images) -> render, with the description running alongside all of it.
+
+    Drafts end in a ``preview`` stage instead: one low resolution encode of the first format.
+    The images stage returns the decoded set with the sources it came from, so an approved
+    draft can render its full formats from the same images.
+    """
+    graph = StageGraph(on_event=report)
+    graph.add("script", lambda: _generate_script(generation_id, topic, niche, metrics))
+    graph.add("description", lambda: _generate_description(generation_id, topic, metrics))
+    graph.add("voice", lambda script: _generate_voice(generation_id, script, report, metrics), depends_on=["script"])
+    
+    if aspect_ratios:
+        def images(script):
+            try:
+                sources = video_generator.find_images(script, topic, metrics)
+                return video_generator.resolve_images(script, topic, progress_callback=report, metrics=metrics,
+                                                      images_data=sources), sources
+            except ProviderUnavailableError:
+                raise
+            except Exception as e:
+                logger.error(f"Image fetch failed for {generation_id}: {e}")
+                return ([], 0), []
         
-        video_files = {}
-        if aspect_ratios:
+        def render(script, voice, images):
+            audio_filename, audio_duration = voice
             try:
-                video_files = video_generator.generate_multiple_formats(
-                    f"/tmp/{audio_filename}", script, topic, generation_id, aspect_ratios
+                return video_generator.generate_multiple_formats(
+                    artifact_store.path(generation_id, audio_filename), script, topic, generation_id,
+                    aspect_ratios[:1] if draft else aspect_ratios, progress_callback=report,
+                    render_engine=render_engine, resolved_images=images[0], audio_duration=audio_duration,
+                    metrics=metrics, draft=draft
                 )
             except Exception as e:
                 logger.error(f"Video generation failed for {generation_id}: {e}")
-                video_files = {}
+                return {}
         
-        generation["status"] = "completed"
-        generation["script"] = script
-        generation["description"] = description
-        generation["audio_file"] = audio_filename
-        generation["video_files"] = video_files
-        generation["completed_at"] = datetime.now().isoformat()
+        graph.add("images", images, depends_on=["script"], report=False)
+        graph.add("preview" if draft else "render", render, depends_on=["script", "voice", "images"])
+    return graph
+
+def process_video_generation(generation_id: str, topic: str, niche: str, 
+                             aspect_ratios: Optional[List[str]] = None, 
+                             social_platforms: Optional[List[str]] = None,
+                             render_engine: Optional[str] = None, draft: bool = False):
+    report = progress_broker.callback_for(generation_id)
+    job_metrics = JobMetrics()
+    graph = build_generation_graph(generation_id, topic, niche, aspect_ratios, render_engine, report, job_metrics,
+                                   draft)
+    job_args = (generation_id, topic, niche, aspect_ratios, social_platforms, render_engine, draft)
+    try:
+        generation = generation_store.update(generation_id, {"started_at": datetime.now().isoformat()})
+        if not generation:
+            return
+        
+        job_metrics.start()
+        results = graph.run()
+        script = results["script"]
+        description = results["description"]
+        audio_filename, audio_duration = results["voice"]
+        video_files = results.get("render", {})
+        artifacts = _finalize_artifacts(generation_id)
+        
+        if draft:
+            preview_format, preview_file = next(iter(results.get("preview", {}).items()), (None, None))
+            if not preview_file:
+                raise Exception("Preview video generation failed")
+            generation_store.update(generation_id, {
+                "status": "preview_ready",
+                "script": script,
+                "description": description,
+                "audio_file": audio_filename,
+                "audio_duration": round(audio_duration, 2),
+                "image_sources": results["images"][1],
+                "preview_file": preview_file,
+                "preview_format": preview_format,
+                "artifact_bytes": artifacts["bytes"],
+                "preview_ready_at": datetime.now().isoformat(),
+                "stage_timings": graph.timings,
+                "total_seconds": graph.total_seconds,
+                "metrics": job_metrics.finish("preview_ready")
+            })
+            report("preview_ready", "completed", format=preview_format)
+            return
+        
+        generation_store.update(generation_id, {
+            "status": "completed",
+            "script": script,
+            "description": description,
+            "audio_file": audio_filename,
+            "audio_duration": round(audio_duration, 2),
+            "video_files": video_files,
+            "artifact_bytes": artifacts["bytes"],
+            "completed_at": datetime.now().isoformat(),
+            "stage_timings": graph.timings,
+            "total_seconds": graph.total_seconds,
+            "metrics": job_metrics.finish("completed")
+        })
         
         if social_platforms and video_files:
+            # Uploads run on their own workers so this job's slot is free for the next generation
             try:
-                title = f"Documentary: {topic}"
-                upload_results = social_uploader.upload_to_platforms(
-                    video_files, title, description, social_platforms
-                )
-                generation["social_uploads"] = upload_results
+                _start_uploads(generation_id, video_files, f"Documentary: {topic}", description, social_platforms)
             except Exception as e:
                 logger.error(f"Social media upload failed for {generation_id}: {e}")
-                generation["social_uploads"] = {}
         
+        report("completed", "completed")
+        
+    except ProviderUnavailableError as e:
+        if _hold_generation(job_args, e):
+            job_metrics.finish("held")
+        else:
+            _fail_generation(generation_id, e, graph, job_metrics)
     except Exception as e:
-        logger.error(f"Video generation failed for {generation_id}: {str(e)}")
-        generation = next((g for g in video_generations if g["id"] == generation_id), None)
-        if generation:
-            generation["status"] = "failed"
-            generation["failed_at"] = datetime.now().isoformat()
-            
-            error_message = str(e)
-            
-            if "Script generation failed:" in error_message:
-                generation["error"] = "Failed to generate script using OpenAI. Please check your OpenAI API key and try again."
-                generation["error_type"] = "openai_api"
-            elif "Voice generation failed:" in error_message:
-                generation["error"] = "Failed to generate voice using ElevenLabs. Please check your ElevenLabs API key and try again."
-                generation["error_type"] = "elevenlabs_api"
-            elif "Description generation failed:" in error_message:
-                generation["error"] = "Failed to generate description using OpenAI. Please check your OpenAI API key and try again."
-                generation["error_type"] = "openai_api"
-            elif "MoviePy" in error_message or "video" in error_message.lower():
-                generation["error"] = "Video processing failed. This may be due to system resources or video generation issues."
-                generation["error_type"] = "video_processing"
-            elif "Pexels" in error_message or "image" in error_message.lower():
-                generation["error"] = "Image retrieval failed. Please check your Pexels API key and try again."
-                generation["error_type"] = "image_service"
-            else:
-                generation["error"] = f"An unexpected error occurred: {error_message}"
-                generation["error_type"] = "general"
+        _fail_generation(generation_id, e, graph, job_metrics)
+
+def render_approved_generation(generation_id: str):
+    """Full-quality formats for an approved draft from its stored script, voiceover and image sources"""
+    generation = generation_store.get(generation_id)
+    if not generation:
+        return
+    
+    report = progress_broker.callback_for(generation_id)
+    job_metrics = JobMetrics()
+    topic = generation["topic"]
+    audio_file = artifact_store.path(generation_id, generation["audio_file"])
+    graph = StageGraph(on_event=report)
+    # Photos come back from the asset cache, so approving a preview normally downloads nothing
+    graph.add("images", lambda: video_generator.resolve_images(
+        generation["script"], topic, progress_callback=report, metrics=job_metrics,
+        images_data=generation.get("image_sources")
+    ), report=False)
+    graph.add("render", lambda images: video_generator.generate_multiple_formats(
+        audio_file, generation["script"], topic, generation_id, generation["aspect_ratios"],
+        progress_callback=report, render_engine=generation["render_engine"], resolved_images=images,
+        audio_duration=generation["audio_duration"], metrics=job_metrics
+    ), depends_on=["images"])
+    try:
+        generation_store.update(generation_id, {"render_started_at": datetime.now().isoformat()})
+        job_metrics.start()
+        results = graph.run()
+        video_files = results["render"]
+        if not any(video_files.values()):
+            raise Exception("Video generation failed for every format")
+        artifacts = _finalize_artifacts(generation_id)
+        
+        generation_store.update(generation_id, {
+            "status": "completed",
+            "video_files": video_files,
+            "artifact_bytes": artifacts["bytes"],
+            "completed_at": datetime.now().isoformat(),
+            "stage_timings": {**generation.get("stage_timings", {}), **graph.timings},
+            "total_seconds": round(generation.get("total_seconds", 0) + graph.total_seconds, 3),
+            "preview_metrics": generation.get("metrics"),
+            "metrics": job_metrics.finish("completed")
+        })
+        
+        if generation["social_platforms"]:
+            try:
+                _start_uploads(generation_id, video_files, f"Documentary: {topic}", generation["description"],
+                               generation["social_platforms"])
+            except Exception as e:
+                logger.error(f"Social media upload failed for {generation_id}: {e}")
+        
+        report("completed", "completed")
+        
+    except Exception as e:
+        _fail_generation(generation_id, e, graph, job_metrics)
+
+# Providers each kind of job calls; the queue holds a job only while one of these it can't do without is down
+JOB_PROVIDERS = {
+    process_video_generation: ("openai", "elevenlabs", "pexels"),
+    render_approved_generation: ("pexels",),
+}
+
+def _provider_hold(fn) -> float:
+    return rate_limits.hold_for(JOB_PROVIDERS.get(fn, ()))
+
+def _hold_generation(job_args: tuple, error: ProviderUnavailableError) -> bool:
+    """Requeue a job that hit a throttled or failing provider; the queue holds it until the circuit allows calls"""
+    generation_id = job_args[0]
+    generation = generation_store.get(generation_id)
+    if not generation:
+        return True
+    holds = generation.get("provider_holds", 0)
+    if holds >= PROVIDER_HOLD_LIMIT:
+        return False
+    
+    generation_store.update(generation_id, {"provider_holds": holds + 1, "held_reason": str(error)})
+    try:
+        job_queue.submit(generation_id, process_video_generation, *job_args, priority=generation.get("priority", 0))
+    except QueueFullError:
+        return False
+    logger.warning(f"Holding generation {generation_id} ({holds + 1}/{PROVIDER_HOLD_LIMIT}): {error}")
+    progress_broker.publish(generation_id, "held", "started", provider=error.provider, retry_after=error.retry_after)
+    return True
+
+def _finalize_artifacts(generation_id: str) -> Dict[str, Any]:
+    """Record what the generation left on disk and let the reaper enforce the quotas with it counted"""
+    manifest = artifact_store.finalize(generation_id)
+    artifact_reaper.wake()
+    return manifest
+
+def _artifact_file(generation_id: str, recorded_path: str) -> str:
+    """Where a generation's file is on this machine: workers may mount the shared ARTIFACTS_DIR elsewhere"""
+    return os.path.join(artifact_store.dir_for(generation_id), os.path.basename(recorded_path))
+
+def _job_abandoned(generation_id: str, error: str):
+    """The job queue gave up on a generation whose workers kept dying mid-job"""
+    logger.error(f"Video generation abandoned for {generation_id}: {error}")
+    _finalize_artifacts(generation_id)
+    if generation_store.get(generation_id):
+        generation_store.update(generation_id, {
+            "status": "failed",
+            "failed_at": datetime.now().isoformat(),
+            "error": "The render workers running this generation stopped responding. Please try again.",
+            "error_type": "worker_lost",
+        })
+        progress_broker.publish(generation_id, "failed", "failed", error_type="worker_lost")
+
+def _artifacts_removed(generation_id: str):
+    generation_store.update(generation_id, {"artifacts_removed_at": datetime.now().isoformat()})
+
+def _fail_generation(generation_id: str, e: Exception, graph: StageGraph,
+                     job_metrics: Optional[JobMetrics] = None):
+    logger.error(f"Video generation failed for {generation_id}: {str(e)}")
+    _finalize_artifacts(generation_id)
+    metrics = job_metrics.finish("failed") if job_metrics else None
+    if generation_store.get(generation_id):
+        failure = {"status": "failed", "failed_at": datetime.now().isoformat(), "stage_timings": graph.timings}
+        if metrics:
+            failure["metrics"] = metrics
+        
+        error_message = str(e)
+        
+        if isinstance(e, ProviderUnavailableError):
+            failure["error"] = f"The {e.provider} service is rate limiting or unavailable. Please try again later."
+            failure["error_type"] = "provider_unavailable"
+        elif "Script generation failed:" in error_message:
+            failure["error"] = "Failed to generate script using OpenAI. Please check your OpenAI API key and try again."
+            failure["error_type"] = "openai_api"
+        elif "Voice generation failed:" in error_message:
+            failure["error"] = "Failed to generate voice using ElevenLabs. Please check your ElevenLabs API key and try again."
+            failure["error_type"] = "elevenlabs_api"
+        elif "Description generation failed:" in error_message:
+            failure["error"] = "Failed to generate description using OpenAI. Please check your OpenAI API key and try again."
+            failure["error_type"] = "openai_api"
+        elif "MoviePy" in error_message or "video" in error_message.lower():
+            failure["error"] = "Video processing failed. This may be due to system resources or video generation issues."
+            failure["error_type"] = "video_processing"
+        elif "Pexels" in error_message or "image" in error_message.lower():
+            failure["error"] = "Image retrieval failed. Please check your Pexels API key and try again."
+            failure["error_type"] = "image_service"
+        else:
+            failure["error"] = f"An unexpected error occurred: {error_message}"
+            failure["error_type"] = "general"
+        
+        generation_store.update(generation_id, failure)
+        progress_broker.publish(generation_id, "failed", "failed", error_type=failure["error_type"])
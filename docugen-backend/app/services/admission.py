@@ -0,0 +1,226 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Starting memory model per engine, fitted to measured encode peaks (render worker plus its ffmpeg)
+# at 480p and 1080p with 4 and 16 slides: a fixed cost, bytes per output pixel (mostly x264's
+# lookahead), bytes per output pixel per slide (the slide and its resized copies; MoviePy keeps
+# more of them) and a little per second of audio. Calibration scales the whole estimate.
+MEMORY_MODEL = {
+    "ffmpeg": {"base": 85 * MB, "per_pixel": 280, "per_slide_pixel": 9, "per_second": 200 * 1024},
+    "moviepy": {"base": 80 * MB, "per_pixel": 300, "per_slide_pixel": 24, "per_second": 200 * 1024},
+}
+
+def _memory_limit_bytes() -> Optional[int]:
+    """The smaller of physical memory and this container's cgroup limit, if either can be read"""
+    limits = []
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal"):
+                    limits.append(int(line.split()[1]) * 1024)
+    except OSError:
+        pass
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value.isdigit():
+                limits.append(int(value))
+        except OSError:
+            pass
+    return min(limits) if limits else None
+
+class RenderCost:
+    def __init__(self, engine: str, memory_bytes: int, cpu: float):
+        self.engine = engine
+        self.memory_bytes = memory_bytes
+        self.cpu = cpu
+        self.model_bytes = memory_bytes
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"memory_mb": round(self.memory_bytes / MB, 1), "cpu": round(self.cpu, 2)}
+
+class _Ticket:
+    def __init__(self, cost: RenderCost):
+        self.cost = cost
+        self.admitted = False
+        self.queued_at = time.monotonic()
+        self.waited = 0.0
+
+class AdmissionController:
+    """Starts encodes only while their estimated memory and CPU fit the render budget.
+
+    ``estimate`` prices an encode from its engine, output size, slide count
+    and duration with ``MEMORY_MODEL``, scaled by a per-engine factor that
+    ``release`` keeps calibrated against the peaks the render workers measure
+    (and CPU by the cores they actually used). ``acquire`` blocks until the
+    encode fits next to the ones running. Waiters are served in order, but a
+    later one may start early if it fits in what is left after reserving for
+    everything ahead of it, so small encodes fill gaps without delaying big
+    ones. An encode that fits nothing is still started once nothing else is
+    running, rather than never.
+
+    The memory budget defaults to ``RENDER_MEMORY_FRACTION`` of the machine's
+    (or container's) memory; the rest is headroom for the API process, idle
+    render workers and estimation error.
+    """
+
+    def __init__(self, memory_budget_bytes: Optional[int] = None, cpu_budget: Optional[float] = None,
+                 margin: Optional[float] = None, calibration_weight: float = 0.3):
+        budget_mb = int(os.getenv("RENDER_MEMORY_BUDGET_MB", "0"))
+        if memory_budget_bytes is None and budget_mb:
+            memory_budget_bytes = budget_mb * MB
+        if memory_budget_bytes is None:
+            limit = _memory_limit_bytes()
+            fraction = float(os.getenv("RENDER_MEMORY_FRACTION", "0.7"))
+            memory_budget_bytes = int(limit * fraction) if limit else 0
+        self.memory_budget = memory_budget_bytes
+        self.cpu_budget = cpu_budget or float(os.getenv("RENDER_CPU_BUDGET", "0")) or float(os.cpu_count() or 1)
+        self.margin = margin if margin is not None else float(os.getenv("RENDER_MEMORY_MARGIN", "0.15"))
+        self.calibration_weight = calibration_weight
+        self._cond = threading.Condition()
+        self._waiting: List[_Ticket] = []
+        self._memory_in_use = 0
+        self._cpu_in_use = 0.0
+        self._running = 0
+        self._memory_factor = {engine: 1.0 for engine in MEMORY_MODEL}
+        self._cores: Dict[str, float] = {}
+        self._samples = {engine: 0 for engine in MEMORY_MODEL}
+        self._stats = {"admitted": 0, "waited": 0, "wait_seconds": 0.0, "forced": 0, "underestimated": 0}
+        if self.memory_budget:
+            logger.info(f"Render admission: {self.memory_budget / MB:.0f} MB and {self.cpu_budget:g} CPUs")
+        else:
+            logger.warning("Render admission: machine memory unknown and RENDER_MEMORY_BUDGET_MB unset; "
+                           "only CPU is budgeted")
+
+    def estimate(self, engine: str, width: int, height: int, slides: int, duration: float,
+                 threads: int = 1) -> RenderCost:
+        model = MEMORY_MODEL.get(engine, MEMORY_MODEL["moviepy"])
+        pixels = width * height
+        model_bytes = (model["base"] + model["per_pixel"] * pixels + model["per_slide_pixel"] * pixels * slides
+                       + model["per_second"] * duration)
+        with self._cond:
+            factor = self._memory_factor.get(engine, 1.0)
+            cpu = self._cores.get(engine, float(threads))
+        cost = RenderCost(engine, int(model_bytes * factor * (1 + self.margin)), min(cpu, self.cpu_budget))
+        cost.model_bytes = int(model_bytes)
+        return cost
+
+    def _fits(self, memory_in_use: int, cpu_in_use: float, cost: RenderCost) -> bool:
+        memory_ok = not self.memory_budget or memory_in_use + cost.memory_bytes <= self.memory_budget
+        return memory_ok and cpu_in_use + cost.cpu <= self.cpu_budget + 1e-9
+
+    def _admit_waiting(self):
+        """Admit waiters in order; one that doesn't fit keeps its share reserved from those behind it"""
+        memory, cpu = self._memory_in_use, self._cpu_in_use
+        for ticket in list(self._waiting):
+            if self._fits(memory, cpu, ticket.cost) or (self._running == 0 and ticket is self._waiting[0]):
+                if not self._fits(memory, cpu, ticket.cost):
+                    logger.warning(f"Starting a {ticket.cost.memory_bytes / MB:.0f} MB encode alone: "
+                                   f"it exceeds the {self.memory_budget / MB:.0f} MB render budget")
+                    self._stats["forced"] += 1
+                self._waiting.remove(ticket)
+                self._start(ticket)
+            memory += ticket.cost.memory_bytes
+            cpu += ticket.cost.cpu
+        self._cond.notify_all()
+
+    def _start(self, ticket: _Ticket):
+        ticket.admitted = True
+        ticket.waited = time.monotonic() - ticket.queued_at
+        self._memory_in_use += ticket.cost.memory_bytes
+        self._cpu_in_use += ticket.cost.cpu
+        self._running += 1
+        self._stats["admitted"] += 1
+
+    def acquire(self, cost: RenderCost, on_wait: Optional[Callable[[RenderCost], None]] = None) -> _Ticket:
+        """Block until ``cost`` fits the budget; ``on_wait`` is called once if it has to wait"""
+        ticket = _Ticket(cost)
+        with self._cond:
+            self._waiting.append(ticket)
+            self._admit_waiting()
+            if ticket.admitted:
+                return ticket
+            self._stats["waited"] += 1
+        logger.info(f"Encode of {cost.memory_bytes / MB:.0f} MB waiting for render memory "
+                    f"({self._memory_in_use / MB:.0f}/{self.memory_budget / MB:.0f} MB in use)")
+        if on_wait:
+            try:
+                on_wait(cost)
+            except Exception as e:
+                logger.warning(f"Admission wait callback failed: {e}")
+        with self._cond:
+            while not ticket.admitted:
+                self._cond.wait()
+            self._stats["wait_seconds"] += ticket.waited
+        return ticket
+
+    def release(self, ticket: _Ticket, usage: Optional[Dict[str, Any]] = None):
+        """Return the ticket's share; ``usage`` from ``measured_encode`` calibrates later estimates"""
+        with self._cond:
+            self._memory_in_use -= ticket.cost.memory_bytes
+            self._cpu_in_use -= ticket.cost.cpu
+            self._running -= 1
+            if usage:
+                self._calibrate(ticket.cost, usage)
+            self._admit_waiting()
+
+    def _calibrate(self, cost: RenderCost, usage: Dict[str, Any]):
+        engine, weight = cost.engine, self.calibration_weight
+        peak = usage.get("peak_rss_bytes") or 0
+        if peak and cost.model_bytes and engine in self._memory_factor:
+            if peak > cost.memory_bytes:
+                self._stats["underestimated"] += 1
+            ratio = peak / cost.model_bytes
+            # The first measurement replaces the built-in guess; later ones move it gradually
+            if self._samples[engine] == 0:
+                self._memory_factor[engine] = ratio
+            else:
+                self._memory_factor[engine] += weight * (ratio - self._memory_factor[engine])
+            self._samples[engine] += 1
+        if usage.get("seconds") and usage.get("cpu_seconds"):
+            cores = usage["cpu_seconds"] / usage["seconds"]
+            self._cores[engine] = cores if engine not in self._cores else (
+                self._cores[engine] + weight * (cores - self._cores[engine]))
+
+    @contextmanager
+    def admit(self, cost: RenderCost, on_wait: Optional[Callable[[RenderCost], None]] = None):
+        ticket = self.acquire(cost, on_wait)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    @property
+    def memory_in_use(self) -> int:
+        return self._memory_in_use
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "memory_budget_mb": round(self.memory_budget / MB, 1),
+                "memory_reserved_mb": round(self._memory_in_use / MB, 1),
+                "cpu_budget": self.cpu_budget,
+                "cpu_reserved": round(self._cpu_in_use, 2),
+                "running": self._running,
+                "waiting": len(self._waiting),
+                "calibration": {
+                    engine: {"memory_factor": round(factor, 3), "samples": self._samples[engine],
+                             "cores": round(self._cores[engine], 2) if engine in self._cores else None}
+                    for engine, factor in self._memory_factor.items()
+                },
+                **{name: round(value, 2) if isinstance(value, float) else value
+                   for name, value in self._stats.items()},
+            }
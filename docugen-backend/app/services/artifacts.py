@@ -0,0 +1,246 @@
+import os
+import time
+import shutil
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class ArtifactStore:
+    """Generated files (voiceovers, rendered videos and their temp files), one directory per generation.
+
+    Everything a generation writes lives under ``{root}/generations/{id}/``,
+    so removing a generation is a single ``rmtree`` of its own directory and
+    nothing ever lists the shared root. An SQLite manifest records each
+    generation's files and sizes once it is finalized, plus when it was last
+    downloaded; the reaper uses it to delete generations older than
+    ``max_age`` and then the least recently used ones until the total is under
+    ``max_bytes``. Generations still being produced are left alone unless they
+    outlive ``max_age`` (a crashed job's leftovers); ``reopen`` puts a
+    finalized one back in that state while a job writes to it again.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None,
+                 max_age: Optional[int] = None, on_remove: Optional[Callable[[str], None]] = None):
+        self.root = root or os.getenv("ARTIFACTS_DIR", "/tmp/docugen_artifacts")
+        self.max_bytes = max_bytes or int(os.getenv("ARTIFACTS_MAX_GB", "20")) * 1024 * 1024 * 1024
+        self.max_age = max_age or int(os.getenv("ARTIFACTS_MAX_AGE_HOURS", "168")) * 3600
+        self.on_remove = on_remove
+        self.generations_dir = os.path.join(self.root, "generations")
+        os.makedirs(self.generations_dir, exist_ok=True)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"reaped_expired": 0, "reaped_over_quota": 0, "bytes_reaped": 0}
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    generation_id TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL DEFAULT 0,
+                    finalized INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS artifact_files (
+                    generation_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    PRIMARY KEY (generation_id, name)
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_created_at ON artifacts (created_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_last_access ON artifacts (finalized, last_access)")
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, "manifest.db"), timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                self._stats[name] += delta
+
+    def dir_for(self, generation_id: str) -> str:
+        return os.path.join(self.generations_dir, generation_id)
+
+    def path(self, generation_id: str, name: str) -> str:
+        """Where ``name`` goes for this generation; creates the directory and manifest entry on first use"""
+        directory = self.dir_for(generation_id)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+            now = time.time()
+            with self._db() as db:
+                db.execute("INSERT OR IGNORE INTO artifacts (generation_id, created_at, last_access) VALUES (?, ?, ?)",
+                           (generation_id, now, now))
+        return os.path.join(directory, name)
+
+    def finalize(self, generation_id: str) -> Dict[str, Any]:
+        """Record the generation's files and sizes once it stops writing; returns its manifest"""
+        files = {}
+        try:
+            with os.scandir(self.dir_for(generation_id)) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        files[entry.name] = entry.stat().st_size
+        except FileNotFoundError:
+            pass
+
+        now = time.time()
+        size = sum(files.values())
+        with self._db() as db:
+            db.execute("DELETE FROM artifact_files WHERE generation_id = ?", (generation_id,))
+            db.executemany("INSERT INTO artifact_files (generation_id, name, size) VALUES (?, ?, ?)",
+                           [(generation_id, name, file_size) for name, file_size in files.items()])
+            db.execute(
+                "INSERT INTO artifacts (generation_id, created_at, last_access, size, finalized) VALUES (?, ?, ?, ?, 1) "
+                "ON CONFLICT (generation_id) DO UPDATE SET size = excluded.size, finalized = 1, "
+                "last_access = excluded.last_access",
+                (generation_id, now, now, size)
+            )
+        return {"files": files, "bytes": size}
+
+    def reopen(self, generation_id: str) -> bool:
+        """Take a finalized generation out of eviction while a job writes to it again (``finalize`` when done).
+
+        Its age restarts too, so an old draft approved now is not expired mid-render. False if the
+        reaper already removed it or is removing it.
+        """
+        now = time.time()
+        with self._db() as db:
+            reopened = db.execute(
+                "UPDATE artifacts SET finalized = 0, created_at = ?, last_access = ? "
+                "WHERE generation_id = ? AND finalized >= 0", (now, now, generation_id)
+            ).rowcount
+        return bool(reopened) and os.path.isdir(self.dir_for(generation_id))
+
+    def manifest(self, generation_id: str) -> Optional[Dict[str, Any]]:
+        db = self._db()
+        row = db.execute("SELECT created_at, last_access, size, finalized FROM artifacts WHERE generation_id = ?",
+                         (generation_id,)).fetchone()
+        if row is None:
+            return None
+        files = db.execute("SELECT name, size FROM artifact_files WHERE generation_id = ? ORDER BY name",
+                           (generation_id,)).fetchall()
+        return {"generation_id": generation_id, "created_at": row[0], "last_access": row[1],
+                "bytes": row[2], "finalized": row[3] == 1, "files": dict(files)}
+
+    def touch(self, generation_id: str, min_interval: float = 60.0):
+        """Mark a generation as recently used; at most one write per ``min_interval`` so Range seeks stay cheap"""
+        now = time.time()
+        with self._db() as db:
+            db.execute("UPDATE artifacts SET last_access = ? WHERE generation_id = ? AND last_access < ?",
+                       (now, generation_id, now - min_interval))
+
+    def remove(self, generation_id: str, only_finalized: bool = False) -> Optional[int]:
+        """Delete one generation's directory and manifest entry; returns the bytes recorded for it.
+
+        With ``only_finalized`` it is first claimed (``finalized = -1``) so a concurrent ``reopen``
+        can't hand it to a job mid-delete; None if it was no longer finalized.
+        """
+        db = self._db()
+        if only_finalized:
+            with db:
+                claimed = db.execute("UPDATE artifacts SET finalized = -1 WHERE generation_id = ? AND finalized != 0",
+                                     (generation_id,)).rowcount
+            if not claimed:
+                return None
+        row = db.execute("SELECT size FROM artifacts WHERE generation_id = ?", (generation_id,)).fetchone()
+        shutil.rmtree(self.dir_for(generation_id), ignore_errors=True)
+        with db:
+            db.execute("DELETE FROM artifact_files WHERE generation_id = ?", (generation_id,))
+            db.execute("DELETE FROM artifacts WHERE generation_id = ?", (generation_id,))
+        if self.on_remove:
+            try:
+                self.on_remove(generation_id)
+            except Exception as e:
+                logger.warning(f"Artifact removal callback failed for {generation_id}: {e}")
+        return row[0] if row else 0
+
+    def reap(self) -> List[str]:
+        """Apply the age quota, then evict finalized generations least recently used first down to ``max_bytes``"""
+        db = self._db()
+        removed = []
+        expired = db.execute("SELECT generation_id FROM artifacts WHERE created_at < ?",
+                             (time.time() - self.max_age,)).fetchall()
+        for (generation_id,) in expired:
+            self._count(reaped_expired=1, bytes_reaped=self.remove(generation_id))
+            removed.append(generation_id)
+
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+        if total > self.max_bytes:
+            for generation_id, size in db.execute(
+                "SELECT generation_id, size FROM artifacts WHERE finalized != 0 ORDER BY last_access"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                if self.remove(generation_id, only_finalized=True) is None:
+                    continue
+                total -= size
+                self._count(reaped_over_quota=1, bytes_reaped=size)
+                removed.append(generation_id)
+
+        if removed:
+            logger.info(f"Reaped artifacts of {len(removed)} generations ({total} bytes remain)")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        generations, finalized, total = self._db().execute(
+            "SELECT COUNT(*), COALESCE(SUM(finalized = 1), 0), COALESCE(SUM(size), 0) FROM artifacts"
+        ).fetchone()
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({
+            "root": self.root,
+            "generations": generations,
+            "in_progress": generations - finalized,
+            "bytes_stored": total,
+            "max_bytes": self.max_bytes,
+            "max_age_seconds": self.max_age,
+        })
+        return stats
+
+class ArtifactReaper:
+    """Background thread that runs ``ArtifactStore.reap`` every ``interval`` seconds, or sooner when woken"""
+
+    def __init__(self, store: ArtifactStore, interval: Optional[float] = None):
+        self.store = store
+        self.interval = interval or float(os.getenv("ARTIFACTS_REAP_INTERVAL", "300"))
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="artifact-reaper", daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                self.store.reap()
+            except Exception as e:
+                logger.error(f"Artifact reaping failed: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def shutdown(self):
+        self._stopping = True
+        self._wake.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread:
+            thread.join(timeout=1)
@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class AssetCache:
+    """Disk cache for Pexels search results and photo bytes.
+
+    Objects live under ``objects/`` named by the SHA-256 of their key and are
+    written atomically (temp file + rename). An SQLite index tracks size, last
+    access and expiry, so several worker threads or processes can share one
+    cache directory. Entries past ``max_bytes`` are evicted least recently used
+    first; entries written with a TTL are treated as misses once expired.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None,
+                 search_ttl: Optional[int] = None):
+        self.root = root or os.getenv("ASSET_CACHE_DIR", "/tmp/docugen_cache")
+        self.max_bytes = max_bytes or int(os.getenv("ASSET_CACHE_MAX_MB", "2048")) * 1024 * 1024
+        self.search_ttl = search_ttl or int(os.getenv("ASSET_CACHE_SEARCH_TTL", "86400"))
+        self.objects_dir = os.path.join(self.root, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0,
+                       "bytes_read": 0, "bytes_written": 0, "bytes_evicted": 0}
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    expires_at REAL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access)")
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, "index.db"), timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def _path_for(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                self._stats[name] += delta
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        db = self._db()
+        row = db.execute("SELECT path, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count(misses=1)
+            return None
+
+        path, expires_at = row
+        now = time.time()
+        if expires_at is not None and expires_at < now:
+            self._remove(key, path)
+            self._count(misses=1, expired=1)
+            return None
+
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            # Evicted by another process between the lookup and the read
+            self._remove(key, path)
+            self._count(misses=1)
+            return None
+
+        with db:
+            db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        self._count(hits=1, bytes_read=len(data))
+        return data
+
+    def put_bytes(self, key: str, data: bytes, ttl: Optional[int] = None):
+        path = self._path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write cache entry {key}: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, path, size, last_access, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (key, path, len(data), now, now + ttl if ttl else None)
+            )
+        self._count(bytes_written=len(data))
+        self._evict()
+
+    def get_json(self, key: str) -> Optional[Any]:
+        data = self.get_bytes(key)
+        return json.loads(data) if data is not None else None
+
+    def put_json(self, key: str, value: Any, ttl: Optional[int] = None):
+        self.put_bytes(key, json.dumps(value).encode(), ttl)
+
+    def _remove(self, key: str, path: str):
+        with self._db() as db:
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        db = self._db()
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, path, size in db.execute(
+            "SELECT key, path, size FROM entries ORDER BY last_access"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._remove(key, path)
+            total -= size
+            self._count(evictions=1, bytes_evicted=size)
+
+    def stats(self) -> Dict[str, Any]:
+        db = self._db()
+        entries, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats.update({
+            "entries": entries,
+            "bytes_stored": total,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round(stats["hits"] / lookups, 4) if lookups else None,
+        })
+        return stats
@@ -0,0 +1,157 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.job_queue import JobQueue, QueueFullError
+
+logger = logging.getLogger(__name__)
+
+class BatchStore:
+    """Batches and the backlog of their generations not yet handed to the job queue.
+
+    A batch can be far larger than the job queue, so its generations wait in
+    ``batch_items`` until the dispatcher has room for them. Both tables are in
+    SQLite, so a restart resumes a half-submitted batch where it left off.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("BATCHES_DB_PATH", "/tmp/docugen_batches.db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS batches (
+                id TEXT PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_batches_created_at ON batches (created_at);
+            CREATE TABLE IF NOT EXISTS batch_items (
+                generation_id TEXT PRIMARY KEY,
+                batch_id TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                submitted INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_batch_items_pending ON batch_items (submitted, priority, seq);
+        """)
+        self._conn.commit()
+
+    def insert(self, batch: Dict[str, Any], generations: List[Dict[str, Any]]):
+        """Store the batch and queue its unique generations, in order, at their priority"""
+        with self._lock:
+            seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM batch_items").fetchone()[0]
+            self._conn.execute("INSERT INTO batches (id, created_at, data) VALUES (?, ?, ?)",
+                               (batch["id"], batch["created_at"], json.dumps(batch)))
+            self._conn.executemany(
+                "INSERT INTO batch_items (generation_id, batch_id, priority, seq) VALUES (?, ?, ?, ?)",
+                [(g["id"], batch["id"], g.get("priority") or 0, seq + i + 1) for i, g in enumerate(generations)]
+            )
+            self._conn.commit()
+
+    def get(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM batches ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def next_pending(self, limit: int) -> List[str]:
+        """Generation ids waiting to be queued, highest priority then oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT generation_id FROM batch_items WHERE submitted = 0 ORDER BY priority DESC, seq LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [generation_id for (generation_id,) in rows]
+
+    def mark_submitted(self, generation_id: str):
+        with self._lock:
+            self._conn.execute("UPDATE batch_items SET submitted = 1 WHERE generation_id = ?", (generation_id,))
+            self._conn.commit()
+
+    def pending_count(self, batch_id: Optional[str] = None) -> int:
+        sql = "SELECT COUNT(*) FROM batch_items WHERE submitted = 0"
+        params = ()
+        if batch_id:
+            sql += " AND batch_id = ?"
+            params = (batch_id,)
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class BatchDispatcher:
+    """Moves pending batch generations into the job queue as it drains.
+
+    ``headroom`` slots of the queue are left free so single requests are not
+    turned away with a 503 while a large batch is in progress.
+    """
+
+    def __init__(self, store: BatchStore, job_queue: JobQueue, submit: Callable[[str], None],
+                 headroom: Optional[int] = None, poll_seconds: float = 1.0):
+        self.store = store
+        self.job_queue = job_queue
+        self.submit = submit
+        self.headroom = headroom if headroom is not None else int(os.getenv("BATCH_QUEUE_HEADROOM", "10"))
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="batch-dispatcher", daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self.start()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                self.dispatch()
+            except Exception as e:
+                logger.error(f"Batch dispatch failed: {e}")
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def dispatch(self) -> int:
+        """Queue as many pending generations as there is room for; returns how many were queued"""
+        room = max(0, self.job_queue.max_size - self.headroom) - self.job_queue.depth
+        if room <= 0:
+            return 0
+        queued = 0
+        for generation_id in self.store.next_pending(room):
+            try:
+                self.submit(generation_id)
+            except QueueFullError:
+                break
+            self.store.mark_submitted(generation_id)
+            queued += 1
+        if queued:
+            logger.info(f"Queued {queued} batch generations ({self.store.pending_count()} still pending)")
+        return queued
+
+    def shutdown(self):
+        self._stopping = True
+        self._wake.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread:
+            thread.join(timeout=1)
@@ -0,0 +1,438 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import importlib
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.services.job_queue import QueueFullError
+
+logger = logging.getLogger(__name__)
+
+def _target_for(fn: Callable) -> str:
+    if fn.__module__ == "__main__" or "<locals>" in fn.__qualname__:
+        raise ValueError(f"{fn.__qualname__} cannot be queued: jobs must be module-level functions")
+    return f"{fn.__module__}:{fn.__qualname__}"
+
+def _resolve(target: str) -> Callable:
+    module_name, _, name = target.partition(":")
+    obj = importlib.import_module(module_name)
+    for attr in name.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+def worker_id() -> str:
+    """Identifies this process in the jobs table: host, pid and a per-start suffix (pids get reused)"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+class DurableJobQueue:
+    """``JobQueue`` backed by a shared SQLite database, drained by worker threads in any number of processes.
+
+    Jobs are stored as the import path of their function plus JSON arguments,
+    so the process that runs a job need not be the one that queued it: API
+    processes submit (``consume=False``) and ``python -m app.worker`` processes
+    claim. A claim takes a lease of ``lease_seconds`` that a heartbeat thread
+    renews while the claiming process is alive. When a worker dies or is cut
+    off, its lease runs out and the next claim puts the job back in the queue
+    for another worker, up to ``max_attempts`` claims; after that the job is
+    failed and ``on_abandoned(job_id, error)`` is called. Finishing a job is
+    fenced by worker id, so a worker that lost its lease cannot overwrite the
+    outcome of the worker that took over.
+
+    SQLite needs working file locks, so every process must share one machine
+    (or a filesystem with reliable POSIX locking).
+    """
+
+    def __init__(self, db_path: Optional[str] = None, workers: Optional[int] = None,
+                 max_size: Optional[int] = None, hold: Optional[Callable[[Callable], float]] = None,
+                 consume: bool = True, lease_seconds: Optional[float] = None,
+                 poll_interval: Optional[float] = None, max_attempts: Optional[int] = None,
+                 on_abandoned: Optional[Callable[[str, str], None]] = None):
+        self.db_path = db_path or os.getenv("JOB_QUEUE_DB_PATH", "/tmp/docugen_jobs.db")
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "2"))
+        self.max_size = max_size or int(os.getenv("JOB_QUEUE_MAX_SIZE", "100"))
+        self.hold = hold
+        self.consume = consume
+        self.lease_seconds = lease_seconds or float(os.getenv("JOB_LEASE_SECONDS", "30"))
+        self.poll_interval = poll_interval or float(os.getenv("JOB_POLL_SECONDS", "0.5"))
+        self.max_attempts = max_attempts or int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        self.retention_seconds = float(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+        self.on_abandoned = on_abandoned
+        self.worker_id = worker_id()
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._running: Dict[str, int] = {}
+        self._threads = []
+        self._stopping = False
+        self._stats = {"claimed": 0, "completed": 0, "failed": 0, "requeued": 0, "abandoned": 0, "lost": 0}
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                target TEXT NOT NULL,
+                args TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_queued ON jobs (status, priority DESC, seq);
+            CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs (status, lease_expires);
+            CREATE INDEX IF NOT EXISTS idx_jobs_job_id ON jobs (job_id);
+            CREATE TABLE IF NOT EXISTS workers (
+                id TEXT PRIMARY KEY,
+                threads INTEGER NOT NULL,
+                started_at REAL NOT NULL,
+                heartbeat_at REAL NOT NULL
+            );
+        """)
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; multi-statement changes take the write lock up front with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, work: Callable[[sqlite3.Connection], Any]) -> Any:
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            result = work(db)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        return result
+
+    def _count(self, name: str, delta: int = 1):
+        with self._cond:
+            self._stats[name] += delta
+
+    def start(self):
+        if not self.consume:
+            return
+        with self._cond:
+            if self._threads:
+                return
+            self._stopping = False
+            now = time.time()
+            self._db().execute("INSERT OR REPLACE INTO workers (id, threads, started_at, heartbeat_at) VALUES (?, ?, ?, ?)",
+                               (self.worker_id, self.workers, now, now))
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Job worker {self.worker_id} started with {self.workers} threads on {self.db_path} "
+                    f"(lease {self.lease_seconds:g}s)")
+
+    def submit(self, job_id: str, fn: Callable, *args, priority: int = 0, **kwargs) -> int:
+        """Queue a job and return its 1-based position; raises QueueFullError when at capacity"""
+        target = _target_for(fn)
+        payload = json.dumps([args, kwargs])
+
+        def enqueue(db):
+            (queued,) = db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()
+            if queued >= self.max_size:
+                raise QueueFullError(f"Job queue is full ({self.max_size} jobs waiting)")
+            seq = db.execute(
+                "INSERT INTO jobs (job_id, target, args, priority, status, created_at) VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, target, payload, priority, time.time())
+            ).lastrowid
+            (ahead,) = db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND (priority > ? OR (priority = ? AND seq < ?))",
+                (priority, priority, seq)
+            ).fetchone()
+            return ahead + 1
+
+        position = self._transaction(enqueue)
+        with self._cond:
+            self._cond.notify()
+        self.start()
+        return position
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+            try:
+                job, hold_for = self._claim()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not claim a job: {e}")
+                job, hold_for = None, 0.0
+            if job is None:
+                self._wait(min(hold_for, 5.0) if hold_for > 0 else self.poll_interval)
+                continue
+            self._run(*job)
+
+    def _wait(self, seconds: float):
+        with self._cond:
+            if not self._stopping:
+                self._cond.wait(seconds)
+
+    def _claim(self) -> Tuple[Optional[tuple], float]:
+        """Claim the first queued job that isn't held; otherwise None and the shortest hold (0 if none queued)"""
+        abandoned = []
+        holds: Dict[str, float] = {}
+
+        def claim(db):
+            now = time.time()
+            # Jobs whose worker stopped renewing go back to the queue (or give up) before anything new is taken
+            expired = db.execute(
+                "SELECT seq, job_id, attempts, worker FROM jobs WHERE status = 'running' AND lease_expires < ?", (now,)
+            ).fetchall()
+            for seq, job_id, attempts, worker in expired:
+                if attempts >= self.max_attempts:
+                    error = f"Worker stopped responding on all {attempts} attempts (last {worker})"
+                    db.execute("UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE seq = ?",
+                               (now, error, seq))
+                    abandoned.append((job_id, error))
+                else:
+                    db.execute("UPDATE jobs SET status = 'queued', worker = NULL, lease_expires = NULL, error = ? "
+                               "WHERE seq = ?", (f"Lease expired on {worker}", seq))
+                    logger.warning(f"Job {job_id} lost its worker {worker}; requeued (attempt {attempts})")
+                    self._count("requeued")
+
+            row = None
+            for seq, target in db.execute(
+                "SELECT seq, target FROM jobs WHERE status = 'queued' ORDER BY priority DESC, seq"
+            ).fetchall():
+                if target not in holds:
+                    holds[target] = self._hold_for(target)
+                if holds[target] <= 0:
+                    row = db.execute("SELECT seq, job_id, target, args, attempts FROM jobs WHERE seq = ?",
+                                     (seq,)).fetchone()
+                    break
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                       "started_at = ? WHERE seq = ?", (self.worker_id, now + self.lease_seconds, now, row[0]))
+            return row
+
+        row = self._transaction(claim)
+        for job_id, error in abandoned:
+            logger.error(f"Job {job_id} abandoned: {error}")
+            self._count("abandoned")
+            if self.on_abandoned:
+                try:
+                    self.on_abandoned(job_id, error)
+                except Exception as e:
+                    logger.warning(f"Abandoned job callback failed for {job_id}: {e}")
+        if row is None:
+            return None, min(holds.values(), default=0.0)
+        self._count("claimed")
+        seq, job_id, target, payload, attempts = row
+        if attempts:
+            logger.info(f"Job {job_id} resumed on {self.worker_id} (attempt {attempts + 1})")
+        return (seq, job_id, target, payload), 0.0
+
+    def _run(self, seq: int, job_id: str, target: str, payload: str):
+        with self._cond:
+            self._running[job_id] = seq
+        error = None
+        try:
+            args, kwargs = json.loads(payload)
+            _resolve(target)(*args, **kwargs)
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Job {job_id} failed: {e}")
+        finally:
+            with self._cond:
+                self._running.pop(job_id, None)
+
+        try:
+            finished = self._db().execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ?, lease_expires = NULL "
+                "WHERE seq = ? AND worker = ? AND status = 'running'",
+                ("failed" if error else "done", time.time(), error, seq, self.worker_id)
+            ).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"Could not record the outcome of job {job_id}: {e}")
+            return
+        if not finished:
+            logger.warning(f"Job {job_id} finished on {self.worker_id} after its lease passed to another worker")
+            self._count("lost")
+        else:
+            self._count("failed" if error else "completed")
+
+    def _heartbeat(self):
+        interval = self.lease_seconds / 3
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                self._cond.wait(interval)
+                if self._stopping:
+                    return
+            now = time.time()
+            try:
+                db = self._db()
+                db.execute("UPDATE jobs SET lease_expires = ? WHERE status = 'running' AND worker = ?",
+                           (now + self.lease_seconds, self.worker_id))
+                db.execute("UPDATE workers SET heartbeat_at = ? WHERE id = ?", (now, self.worker_id))
+                db.execute("DELETE FROM workers WHERE heartbeat_at < ?", (now - 10 * self.lease_seconds,))
+                db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                           (now - self.retention_seconds,))
+            except sqlite3.Error as e:
+                # Keep trying: the lease only lapses if this goes on for lease_seconds
+                logger.warning(f"Job heartbeat failed: {e}")
+
+    def _hold_for(self, target: str) -> float:
+        if not self.hold:
+            return 0.0
+        try:
+            return self.hold(_resolve(target))
+        except Exception as e:
+            logger.warning(f"Job hold check failed: {e}")
+            return 0.0
+
+    def positions(self) -> Dict[str, int]:
+        """1-based position of every waiting job, across all processes"""
+        rows = self._db().execute("SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY priority DESC, seq")
+        return {job_id: i + 1 for i, (job_id,) in enumerate(rows)}
+
+    def position(self, job_id: str) -> Optional[int]:
+        return self.positions().get(job_id)
+
+    def is_running(self, job_id: str) -> bool:
+        return self._db().execute(
+            "SELECT 1 FROM jobs WHERE job_id = ? AND status = 'running' LIMIT 1", (job_id,)
+        ).fetchone() is not None
+
+    @property
+    def depth(self) -> int:
+        return self._db().execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        db = self._db()
+        counts = dict(db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        live = db.execute("SELECT COUNT(*), COALESCE(SUM(threads), 0) FROM workers WHERE heartbeat_at >= ?",
+                          (time.time() - self.lease_seconds,)).fetchone()
+        head = db.execute("SELECT target FROM jobs WHERE status = 'queued' ORDER BY priority DESC, seq LIMIT 1").fetchone()
+        with self._cond:
+            local = {"running_here": len(self._running), **self._stats}
+        return {
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "workers": self.workers if self.consume else 0,
+            "max_size": self.max_size,
+            "held_for": round(self._hold_for(head[0]), 2) if head else 0.0,
+            "backend": "sqlite",
+            "worker_id": self.worker_id,
+            "worker_processes": live[0],
+            "worker_threads": live[1],
+            **local,
+        }
+
+    def shutdown(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout=1)
+        if not threads:
+            return
+        # Hand unfinished jobs straight back instead of making them wait out the lease
+        try:
+            db = self._db()
+            requeued = db.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, lease_expires = NULL, attempts = attempts - 1 "
+                "WHERE status = 'running' AND worker = ?", (self.worker_id,)
+            ).rowcount
+            db.execute("DELETE FROM workers WHERE id = ?", (self.worker_id,))
+            if requeued:
+                logger.info(f"Requeued {requeued} unfinished jobs from {self.worker_id}")
+        except sqlite3.Error as e:
+            logger.warning(f"Could not release jobs on shutdown: {e}")
+
+class SharedEventLog:
+    """Progress events shared between processes through the job database.
+
+    Every process appends what its ``ProgressBroker`` publishes; processes that
+    serve clients ``follow`` the log and relay other processes' events into
+    their own broker, so SSE streams see renders running on any worker.
+    Events older than ``retention_seconds`` are pruned by the followers.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, origin: Optional[str] = None,
+                 poll_interval: Optional[float] = None, retention_seconds: float = 3600):
+        self.db_path = db_path or os.getenv("JOB_QUEUE_DB_PATH", "/tmp/docugen_jobs.db")
+        self.origin = origin or worker_id()
+        self.poll_interval = poll_interval or float(os.getenv("JOB_POLL_SECONDS", "0.5")) / 2
+        self.retention_seconds = retention_seconds
+        self._local = threading.local()
+        self._stopping = threading.Event()
+        self._thread = None
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                origin TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                event TEXT NOT NULL
+            )
+        """)
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, event: Dict[str, Any]):
+        self._db().execute("INSERT INTO events (origin, created_at, event) VALUES (?, ?, ?)",
+                           (self.origin, time.time(), json.dumps(event)))
+
+    def follow(self, broker):
+        """Relay other processes' events into ``broker`` from a background thread, starting with new ones"""
+        if self._thread:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._follow, args=(broker,), name="event-relay", daemon=True)
+        self._thread.start()
+
+    def _follow(self, broker):
+        db = self._db()
+        (last_id,) = db.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()
+        pruned_at = 0.0
+        while not self._stopping.wait(self.poll_interval):
+            try:
+                rows = db.execute("SELECT id, origin, event FROM events WHERE id > ? ORDER BY id",
+                                  (last_id,)).fetchall()
+                for event_id, origin, event in rows:
+                    last_id = event_id
+                    if origin != self.origin:
+                        broker.relay(json.loads(event))
+                now = time.time()
+                if now - pruned_at > 60:
+                    pruned_at = now
+                    db.execute("DELETE FROM events WHERE created_at < ?", (now - self.retention_seconds,))
+            except sqlite3.Error as e:
+                logger.warning(f"Event relay failed: {e}")
+
+    def shutdown(self):
+        self._stopping.set()
+        thread, self._thread = self._thread, None
+        if thread:
+            thread.join(timeout=1)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import logging
+import subprocess
+from typing import TYPE_CHECKING, Callable, List, Optional, Union
+
+if TYPE_CHECKING:
+    from PIL import Image
+    from moviepy.editor import AudioFileClip
+
+logger = logging.getLogger(__name__)
+
+FPS = 24
+FADE_SECONDS = 0.5
+
+def _slide_alpha(local_t: float, slide_duration: float, index: int, count: int) -> float:
+    """Mask value MoviePy's crossfadein/crossfadeout give a slide at ``local_t`` seconds into it"""
+    alpha = 1.0
+    if index > 0 and local_t < FADE_SECONDS:
+        alpha *= local_t / FADE_SECONDS
+    if index < count - 1 and local_t > slide_duration - FADE_SECONDS:
+        alpha *= max(0.0, (slide_duration - local_t) / FADE_SECONDS)
+    return alpha
+
+def encode_slideshow_ffmpeg(images: List[Image.Image], audio: Union[str, AudioFileClip], output_filename: str,
+                            width: int, height: int, temp_audiofile: Optional[str] = None,
+                            threads: Optional[int] = None,
+                            progress: Optional[Callable[[int], None]] = None,
+                            duration: Optional[float] = None, fps: int = FPS, preset: str = "medium",
+                            crf: Optional[int] = None) -> Optional[str]:
+    """Same slideshow as ``encode_slideshow``, piped straight into ffmpeg.
+
+    MoviePy composites every frame in Python. Here each slide is resized once
+    and its raw bytes are reused for every static frame; only the fade frames
+    are computed. Audio is muxed by ffmpeg from the source file, so
+    ``temp_audiofile`` is unused and only kept for signature compatibility.
+    """
+    # Imported here so only the processes that encode load the media stack
+    import numpy as np
+    from PIL import Image
+    from moviepy.config import get_setting
+
+    if isinstance(audio, str):
+        audio_file = audio
+        if duration is None:
+            from moviepy.editor import AudioFileClip
+
+            probe = AudioFileClip(audio)
+            duration = probe.duration
+            probe.close()
+    else:
+        audio_file = audio.filename
+        duration = duration or audio.duration
+
+    if not images:
+        logger.error("No images available for ffmpeg render")
+        return None
+
+    slides = [np.asarray(img.resize((width, height), Image.Resampling.LANCZOS)) for img in images]
+    static_frames = [slide.tobytes() for slide in slides]
+    slide_duration = duration / len(slides)
+
+    cmd = [
+        get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-vcodec", "rawvideo", "-s", f"{width}x{height}", "-pix_fmt", "rgb24",
+        "-r", str(fps), "-i", "-",
+        "-i", audio_file,
+        "-map", "0:v", "-map", "1:a",
+        "-c:v", "libx264", "-preset", preset, "-pix_fmt", "yuv420p",
+        "-c:a", "aac",
+        "-movflags", "+faststart",
+    ]
+    if crf is not None:
+        cmd.extend(["-crf", str(crf)])
+    if threads:
+        cmd.extend(["-threads", str(threads)])
+    cmd.append(output_filename)
+
+    times = np.arange(0, duration, 1.0 / fps)
+    total_frames = len(times)
+    last_percent = -5
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for frame_index, t in enumerate(times):
+            index = min(int(t // slide_duration), len(slides) - 1)
+            alpha = _slide_alpha(t - index * slide_duration, slide_duration, index, len(slides))
+            if alpha >= 1.0:
+                proc.stdin.write(static_frames[index])
+            else:
+                proc.stdin.write((slides[index] * alpha).astype(np.uint8).tobytes())
+
+            if progress:
+                percent = int(100 * (frame_index + 1) / total_frames)
+                if percent >= last_percent + 5 or percent == 100:
+                    last_percent = percent
+                    progress(percent)
+        proc.stdin.close()
+        stderr = proc.stderr.read()
+        if proc.wait() != 0:
+            raise IOError(f"ffmpeg failed writing {output_filename}: {stderr.decode(errors='replace')}")
+    except BrokenPipeError:
+        stderr = proc.stderr.read()
+        proc.wait()
+        raise IOError(f"ffmpeg exited while writing {output_filename}: {stderr.decode(errors='replace')}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+    return output_filename
@@ -0,0 +1,84 @@
+import os
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+
+logger = logging.getLogger(__name__)
+
+CACHE_CONTROL = "private, max-age=0, must-revalidate"
+
+class DownloadResponse(FileResponse):
+    """``FileResponse`` (single/multi Range, If-Range, ETag, Last-Modified, pathsend) with larger reads.
+
+    Under uvicorn every chunk is a thread-pool read plus an event loop send,
+    so 256 KiB instead of Starlette's 64 KiB cuts the per-download overhead on
+    large MP4s. Servers that implement the ASGI pathsend extension get a
+    zero-copy full-file response from Starlette directly.
+    """
+
+    chunk_size = int(os.getenv("DOWNLOAD_CHUNK_KB", "256")) * 1024
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == bare:
+            return True
+    return False
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _offload_headers(path: str) -> Optional[dict]:
+    """Hand the transfer to the front proxy, which can sendfile() it, when DOWNLOAD_OFFLOAD is set.
+
+    ``nginx`` sends ``X-Accel-Redirect: {DOWNLOAD_OFFLOAD_PREFIX}/{path relative to DOWNLOAD_OFFLOAD_ROOT}``
+    for an ``internal`` location aliased to that root (the artifact root unless set); ``sendfile`` sends ``X-Sendfile: {path}`` for
+    Apache mod_xsendfile / lighttpd.
+    """
+    mode = os.getenv("DOWNLOAD_OFFLOAD", "").lower()
+    if mode == "nginx":
+        root = os.getenv("DOWNLOAD_OFFLOAD_ROOT") or os.getenv("ARTIFACTS_DIR", "/tmp/docugen_artifacts")
+        relative = os.path.relpath(path, root)
+        if relative.startswith(".."):
+            logger.warning(f"{path} is outside DOWNLOAD_OFFLOAD_ROOT {root}; serving it directly")
+            return None
+        prefix = os.getenv("DOWNLOAD_OFFLOAD_PREFIX", "/protected").rstrip("/")
+        return {"X-Accel-Redirect": f"{prefix}/{relative}"}
+    if mode == "sendfile":
+        return {"X-Sendfile": os.path.abspath(path)}
+    return None
+
+def file_response(request: Request, path: str, filename: str, media_type: str) -> Response:
+    """Serve a finished artifact: 304 for a matching conditional GET, else the file with Range support"""
+    stat_result = os.stat(path)
+    response = DownloadResponse(path, filename=filename, media_type=media_type, stat_result=stat_result,
+                                headers={"Cache-Control": CACHE_CONTROL})
+    validators = {"ETag": response.headers["etag"], "Last-Modified": response.headers["last-modified"],
+                  "Cache-Control": CACHE_CONTROL}
+    if _not_modified(request, validators["ETag"], stat_result.st_mtime):
+        return Response(status_code=304, headers=validators)
+
+    offload = _offload_headers(path)
+    if offload:
+        # The proxy answers Range requests itself from the file it is pointed at
+        return Response(status_code=200, media_type=media_type, headers={
+            **validators, **offload,
+            "Content-Disposition": response.headers["content-disposition"],
+        })
+    return response
@@ -0,0 +1,302 @@
+import os
+import json
+import bisect
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Last value of the database-wide write counter, which deletions draw from too
+LAST_REV = ("(SELECT COALESCE(MAX(rev), 0) FROM "
+            "(SELECT MAX(rev) AS rev FROM generations UNION ALL SELECT MAX(rev) FROM generation_tombstones))")
+
+class GenerationStore:
+    """Generation records persisted to SQLite and served from in-memory indexes.
+
+    ``_by_id`` gives O(1) lookups and updates; ``_by_created`` is a sorted list
+    of ``(created_at, id)`` so inserts (which arrive in time order) append and
+    newest-first listing is a reverse walk. Every write goes through to SQLite,
+    which is reloaded on startup. Filtered and delta queries use SQLite's
+    indexes to find ids and the in-memory map to build the records.
+    A delete leaves a tombstone with its own ``rev`` so change feeds report it.
+
+    With ``shared`` on, other processes (render workers) write to the same
+    database: each row carries a ``rev`` from a database-wide counter, and any
+    access first loads the rows whose ``rev`` moved since this process last
+    looked (checked cheaply with ``PRAGMA data_version``). Updates re-read the
+    row under the write lock so concurrent writers merge instead of clobbering.
+    Generations left "generating" are then the job queue's to recover, not
+    marked interrupted on load.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, shared: bool = False):
+        self.db_path = db_path or os.getenv("GENERATIONS_DB_PATH", "/tmp/docugen_generations.db")
+        self.shared = shared
+        self._lock = threading.RLock()
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_created: List[tuple] = []
+        self._rev = 0
+        self._data_version = None
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS generations (
+                id TEXT PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                status TEXT NOT NULL,
+                niche TEXT,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_generations_created_at ON generations (created_at);
+            CREATE INDEX IF NOT EXISTS idx_generations_updated_at ON generations (updated_at);
+            CREATE INDEX IF NOT EXISTS idx_generations_status ON generations (status, created_at);
+            CREATE INDEX IF NOT EXISTS idx_generations_niche ON generations (niche, created_at);
+            CREATE TABLE IF NOT EXISTS generation_tombstones (
+                id TEXT PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                rev INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_generation_tombstones_rev ON generation_tombstones (rev);
+        """)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(generations)")]
+        if "rev" not in columns:
+            self._conn.execute("ALTER TABLE generations ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+            # Existing rows get distinct revs so rev alone can serve as a change cursor
+            self._conn.execute("UPDATE generations SET rev = rowid")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_generations_rev ON generations (rev)")
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        interrupted = []
+        for data, rev in self._conn.execute("SELECT data, rev FROM generations ORDER BY created_at"):
+            generation = json.loads(data)
+            self._by_id[generation["id"]] = generation
+            self._by_created.append((generation["created_at"], generation["id"]))
+            self._rev = max(self._rev, rev)
+            if generation["status"] == "generating" and not self.shared:
+                interrupted.append(generation["id"])
+        deleted_rev = self._conn.execute("SELECT MAX(rev) FROM generation_tombstones").fetchone()[0]
+        self._rev = max(self._rev, deleted_rev or 0)
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+        # Jobs queued in a previous process are gone; don't leave them spinning forever
+        for generation_id in interrupted:
+            self.update(generation_id, {
+                "status": "failed",
+                "failed_at": datetime.now().isoformat(),
+                "error": "Generation was interrupted by a server restart. Please try again.",
+                "error_type": "interrupted",
+            })
+        logger.info(f"Loaded {len(self._by_id)} generations from {self.db_path} ({len(interrupted)} interrupted)")
+
+    def _sync(self):
+        """Load rows other processes changed since the last look (shared mode only)"""
+        if not self.shared:
+            return
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        rows = self._conn.execute("SELECT data, rev FROM generations WHERE rev > ? ORDER BY rev",
+                                  (self._rev,)).fetchall()
+        deleted = self._conn.execute("SELECT id, rev FROM generation_tombstones WHERE rev > ?",
+                                     (self._rev,)).fetchall()
+        for data, rev in rows:
+            self._rev = max(self._rev, rev)
+            self._put(json.loads(data))
+        for generation_id, rev in deleted:
+            self._rev = max(self._rev, rev)
+            self._drop(generation_id)
+
+    def current_version(self) -> int:
+        """The last ``rev`` written to the database, for ETags.
+
+        Persisted and shared by every process on the database, so it never
+        repeats after a restart or differs between replicas the way an
+        in-memory write counter would.
+        """
+        with self._lock:
+            self._sync()
+            return self._conn.execute(f"SELECT {LAST_REV}").fetchone()[0]
+
+    def _put(self, generation: Dict[str, Any]):
+        key = (generation["created_at"], generation["id"])
+        is_new = generation["id"] not in self._by_id
+        self._by_id[generation["id"]] = generation
+        if not is_new:
+            return
+        if not self._by_created or key >= self._by_created[-1]:
+            self._by_created.append(key)
+        else:
+            bisect.insort(self._by_created, key)
+
+    def _drop(self, generation_id: str) -> Optional[Dict[str, Any]]:
+        generation = self._by_id.pop(generation_id, None)
+        if generation is not None:
+            key = (generation["created_at"], generation_id)
+            index = bisect.bisect_left(self._by_created, key)
+            if index < len(self._by_created) and self._by_created[index] == key:
+                del self._by_created[index]
+        return generation
+
+    def _write(self, generation: Dict[str, Any]):
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generations (id, created_at, updated_at, status, niche, data, rev) "
+                f"VALUES (?, ?, ?, ?, ?, ?, {LAST_REV} + 1)",
+                (generation["id"], generation["created_at"], generation["updated_at"],
+                 generation["status"], generation.get("niche"), json.dumps(generation))
+            )
+            self._conn.commit()
+        except BaseException:
+            self._conn.rollback()
+            raise
+
+    def insert(self, generation: Dict[str, Any]) -> Dict[str, Any]:
+        generation = dict(generation)
+        generation.setdefault("updated_at", generation["created_at"])
+        with self._lock:
+            self._write(generation)
+            self._put(generation)
+        return dict(generation)
+
+    def get(self, generation_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._sync()
+            generation = self._by_id.get(generation_id)
+            return dict(generation) if generation else None
+
+    def update(self, generation_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self.shared:
+                # Hold the write lock from the re-read to the write so another process can't slip in between
+                self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync()
+                generation = self._by_id.get(generation_id)
+                if generation is None:
+                    self._conn.rollback()
+                    return None
+                updated = {**generation, **fields, "updated_at": datetime.now().isoformat()}
+                self._write(updated)
+            except BaseException:
+                # Never leave the write lock held for the other processes
+                self._conn.rollback()
+                raise
+            self._by_id[generation_id] = updated
+            return dict(updated)
+
+    def delete(self, generation_id: str) -> bool:
+        with self._lock:
+            self._sync()
+            generation = self._drop(generation_id)
+            if generation is None:
+                return False
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO generation_tombstones (id, created_at, updated_at, rev) "
+                    f"VALUES (?, ?, ?, {LAST_REV} + 1)",
+                    (generation_id, generation["created_at"], datetime.now().isoformat())
+                )
+                self._conn.execute("DELETE FROM generations WHERE id = ?", (generation_id,))
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+            return True
+
+    def list(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Newest first"""
+        with self._lock:
+            self._sync()
+            keys = self._by_created[::-1] if limit is None else self._by_created[:-limit - 1:-1]
+            return [dict(self._by_id[generation_id]) for _, generation_id in keys]
+
+    def query(self, limit: int = 50, after: Optional[Tuple[Any, str]] = None,
+              status: Optional[str] = None, niche: Optional[str] = None,
+              created_after: Optional[str] = None, created_before: Optional[str] = None,
+              updated_since: Optional[str] = None,
+              since_rev: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[Tuple[Any, str]]]:
+        """One page of matching generations and the key to continue from.
+
+        Pages are newest first by ``(created_at, id)``. With ``updated_since``
+        or ``since_rev`` they are instead a change feed: oldest change first
+        by the database-wide write counter ``rev`` (included in each record),
+        starting after ``since_rev``. Every write gets a higher rev than any
+        committed before it, so polling with the last rev seen never skips a
+        change, however many share a timestamp. Deleted generations appear in
+        the feed as ``{"id", "deleted": True, "rev", "created_at", "updated_at"}``
+        whatever the status and niche filters, since their fields are gone.
+        """
+        delta = updated_since is not None or since_rev is not None
+        order_column = "rev" if delta else "created_at"
+        record_clauses, record_params = [], []
+        if status:
+            record_clauses.append("status = ?")
+            record_params.append(status)
+        if niche:
+            record_clauses.append("niche = ?")
+            record_params.append(niche)
+        clauses, params = [], []
+        if created_after:
+            clauses.append("created_at >= ?")
+            params.append(created_after)
+        if created_before:
+            clauses.append("created_at < ?")
+            params.append(created_before)
+        if updated_since:
+            clauses.append("updated_at > ?")
+            params.append(updated_since)
+        if since_rev is not None:
+            clauses.append("rev > ?")
+            params.append(since_rev)
+        if after:
+            clauses.append(f"({order_column}, id) {'>' if delta else '<'} (?, ?)")
+            params.extend(after)
+
+        direction = "ASC" if delta else "DESC"
+        where = record_clauses + clauses
+        sql = (f"SELECT id, rev, created_at, updated_at, 0 AS deleted FROM generations"
+               f"{' WHERE ' + ' AND '.join(where) if where else ''}")
+        sql_params = record_params + params
+        if delta:
+            sql += (f" UNION ALL SELECT id, rev, created_at, updated_at, 1 FROM generation_tombstones"
+                    f"{' WHERE ' + ' AND '.join(clauses) if clauses else ''}")
+            sql_params += params
+        sql += f" ORDER BY {order_column} {direction}, id {direction} LIMIT ?"
+        sql_params.append(limit + 1)
+
+        with self._lock:
+            self._sync()
+            rows = self._conn.execute(sql, sql_params).fetchall()
+            page = []
+            for generation_id, rev, created_at, updated_at, deleted in rows[:limit]:
+                if deleted:
+                    page.append({"id": generation_id, "deleted": True, "rev": rev,
+                                 "created_at": created_at, "updated_at": updated_at})
+                elif generation_id in self._by_id:
+                    generation = dict(self._by_id[generation_id])
+                    if delta:
+                        generation["rev"] = rev
+                    page.append(generation)
+
+        next_key = None
+        if len(rows) > limit and page:
+            next_key = (page[-1][order_column], page[-1]["id"])
+        return page, next_key
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync()
+            return len(self._by_id)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+_STOPWORDS = {"the", "and", "for", "with", "from", "into", "img", "image", "photo", "jpg", "jpeg", "png", "dsc"}
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tags; digits, short words and file-name noise are dropped"""
+    return [word for word in re.findall(r"[a-z]+", (text or "").lower())
+            if len(word) >= 3 and word not in _STOPWORDS]
+
+class ImageLibrary:
+    """Local stock images with a keyword index, searched before (or instead of) Pexels.
+
+    Each image lives under ``images/{id[:2]}/{id}/`` as ``original.jpg`` plus
+    one rendition per render size (``1920x1080.jpg`` ...), resized exactly as
+    the encoders would so a render can use them as-is. Tags go to an SQLite
+    index and to an in-memory inverted index (tag -> image ids) that
+    ``search`` reads without touching disk or the network; images and tags
+    added by other processes (the ingest CLI, render workers) are picked up at
+    most every ``refresh_interval`` seconds. With ``fill`` on, photos downloaded from Pexels are added in the
+    background, so the library grows with the topics that are rendered.
+    """
+
+    def __init__(self, root: Optional[str] = None, sizes: Optional[Dict[str, Tuple[int, int]]] = None,
+                 fill: Optional[bool] = None, max_side: Optional[int] = None, refresh_interval: float = 1.0):
+        self.root = root or os.getenv("IMAGE_LIBRARY_DIR", "/tmp/docugen_library")
+        self.sizes = sizes or {}
+        self.fill = fill if fill is not None else os.getenv("IMAGE_LIBRARY_FILL", "true").lower() == "true"
+        self.max_side = max_side or int(os.getenv("IMAGE_LIBRARY_MAX_SIDE", "2560"))
+        self.refresh_interval = refresh_interval
+        self.images_dir = os.path.join(self.root, "images")
+        os.makedirs(self.images_dir, exist_ok=True)
+        self._local = threading.local()
+        self._index_lock = threading.Lock()
+        self._tags: Dict[str, List[str]] = {}
+        self._image_tags: Dict[str, List[str]] = {}
+        self._sources = set()
+        self._last_rowid = 0
+        self._last_tag_rowid = 0
+        self._refreshed_at = 0.0
+        self._executor = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"searches": 0, "hits": 0, "ingested": 0, "duplicates": 0, "filled": 0, "errors": 0}
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS images (
+                    id TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    source_id TEXT,
+                    width INTEGER NOT NULL,
+                    height INTEGER NOT NULL,
+                    added_at REAL NOT NULL
+                )
+            """)
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS image_tags (
+                    tag TEXT NOT NULL,
+                    image_id TEXT NOT NULL,
+                    PRIMARY KEY (tag, image_id)
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS idx_images_source ON images (source, source_id)")
+        self._refresh(force=True)
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, "index.db"), timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                self._stats[name] += delta
+
+    def _refresh(self, force: bool = False):
+        """Load index rows added since the last refresh (by this process or another) into memory"""
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.refresh_interval:
+            return
+        self._refreshed_at = now
+        db = self._db()
+        # Tags are tracked by their own rowid: re-adding a known image only adds tag rows
+        images = db.execute("SELECT rowid, id, source, source_id FROM images WHERE rowid > ? ORDER BY rowid",
+                            (self._last_rowid,)).fetchall()
+        tag_rows = db.execute("SELECT rowid, tag, image_id FROM image_tags WHERE rowid > ? ORDER BY rowid",
+                              (self._last_tag_rowid,)).fetchall()
+        if not images and not tag_rows:
+            return
+        with self._index_lock:
+            for rowid, image_id, source, source_id in images:
+                self._last_rowid = max(self._last_rowid, rowid)
+                if source_id:
+                    self._sources.add((source, source_id))
+                self._image_tags.setdefault(image_id, [])
+            for rowid, tag, image_id in tag_rows:
+                self._last_tag_rowid = max(self._last_tag_rowid, rowid)
+                tags = self._image_tags.setdefault(image_id, [])
+                if tag not in tags:
+                    tags.append(tag)
+                    self._tags.setdefault(tag, []).append(image_id)
+
+    def dir_for(self, image_id: str) -> str:
+        return os.path.join(self.images_dir, image_id[:2], image_id)
+
+    def path(self, image_id: str, size: Optional[Tuple[int, int]] = None) -> str:
+        name = f"{size[0]}x{size[1]}.jpg" if size else "original.jpg"
+        return os.path.join(self.dir_for(image_id), name)
+
+    def has_source(self, source: str, source_id: Any) -> bool:
+        self._refresh()
+        return (source, str(source_id)) in self._sources
+
+    def search(self, keywords: Iterable[str], count: int) -> List[Dict]:
+        """Up to ``count`` images for the keywords, in keyword order, as ``fetch_stock_footage`` entries.
+
+        An image matches a keyword when it has all of the keyword's tags (any of them
+        if none has all), so "Ancient Rome" prefers images tagged both.
+        """
+        self._refresh()
+        self._count(searches=1)
+        results, seen = [], set()
+        with self._index_lock:
+            for keyword in keywords:
+                tags = tokenize(keyword)
+                postings = [set(self._tags.get(tag, ())) for tag in tags]
+                if not postings:
+                    continue
+                matches = set.intersection(*postings) or set.union(*postings)
+                # Posting lists are in insertion order; walking them keeps results stable between runs
+                for image_id in (image_id for tag in tags for image_id in self._tags.get(tag, ())):
+                    if len(results) >= count:
+                        break
+                    if image_id in matches and image_id not in seen:
+                        seen.add(image_id)
+                        results.append({"url": f"library:{image_id}", "keyword": keyword,
+                                        "id": f"library_{image_id}"})
+        self._count(hits=len(results))
+        return results
+
+    def load(self, image_id: str, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """Decoded RGB image; ``size`` picks a pre-resized rendition"""
+        from PIL import Image
+
+        img = Image.open(self.path(image_id, size))
+        img.load()
+        img = img if img.mode == "RGB" else img.convert("RGB")
+        img.info["library_id"] = image_id
+        return img
+
+    def add(self, content: bytes, tags: Iterable[str], source: str = "local",
+            source_id: Optional[Any] = None) -> Optional[str]:
+        """Store one encoded image with its renditions and tags; returns its id (existing ones get the new tags)"""
+        from PIL import Image
+
+        image_id = hashlib.sha256(content).hexdigest()[:32]
+        tags = list(dict.fromkeys(tag for text in tags for tag in tokenize(text)))
+        db = self._db()
+        if db.execute("SELECT 1 FROM images WHERE id = ?", (image_id,)).fetchone():
+            with db:
+                db.executemany("INSERT OR IGNORE INTO image_tags (tag, image_id) VALUES (?, ?)",
+                               [(tag, image_id) for tag in tags])
+            self._count(duplicates=1)
+            self._refresh(force=True)
+            return image_id
+
+        try:
+            img = Image.open(io.BytesIO(content))
+            img.load()
+            img = img if img.mode == "RGB" else img.convert("RGB")
+        except Exception as e:
+            logger.warning(f"Skipping undecodable library image from {source} {source_id or ''}: {e}")
+            self._count(errors=1)
+            return None
+
+        if max(img.size) > self.max_side:
+            img.thumbnail((self.max_side, self.max_side), Image.Resampling.LANCZOS)
+        directory = self.dir_for(image_id)
+        os.makedirs(directory, exist_ok=True)
+        self._write(img, self.path(image_id))
+        for size in set(self.sizes.values()):
+            self._write(img.resize(size, Image.Resampling.LANCZOS), self.path(image_id, size))
+
+        with db:
+            # Files first, row last: a row in the index always has its renditions on disk
+            db.execute("INSERT OR IGNORE INTO images (id, source, source_id, width, height, added_at) "
+                       "VALUES (?, ?, ?, ?, ?, ?)",
+                       (image_id, source, str(source_id) if source_id is not None else None,
+                        img.width, img.height, time.time()))
+            db.executemany("INSERT OR IGNORE INTO image_tags (tag, image_id) VALUES (?, ?)",
+                           [(tag, image_id) for tag in tags])
+        self._count(ingested=1)
+        self._refresh(force=True)
+        return image_id
+
+    def _write(self, img: Image.Image, path: str):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                img.save(f, "JPEG", quality=90)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def add_later(self, content: bytes, tags: Iterable[str], source: str, source_id: Any):
+        """Queue ``add`` on the library's own thread so renders never wait on resizing"""
+        if not self.fill or self.has_source(source, source_id):
+            return
+        with self._index_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-library")
+        self._executor.submit(self._fill, content, list(tags), source, source_id)
+
+    def _fill(self, content: bytes, tags: List[str], source: str, source_id: Any):
+        try:
+            if self.add(content, tags, source, source_id):
+                self._count(filled=1)
+        except Exception as e:
+            logger.warning(f"Could not add {source} image {source_id} to the library: {e}")
+            self._count(errors=1)
+
+    def ingest_directory(self, directory: str, tags: Iterable[str] = ()) -> Dict[str, int]:
+        """Add every image under ``directory``, tagged with its folder names and file name words"""
+        tags = list(tags)
+        before = dict(self._stats)
+        for dirpath, _, filenames in os.walk(directory):
+            folders = os.path.relpath(dirpath, directory).split(os.sep)
+            for filename in sorted(filenames):
+                if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    with open(path, "rb") as f:
+                        content = f.read()
+                except OSError as e:
+                    logger.warning(f"Could not read {path}: {e}")
+                    self._count(errors=1)
+                    continue
+                self.add(content, tags + folders + [os.path.splitext(filename)[0]], source="local",
+                         source_id=os.path.abspath(path))
+        return {name: self._stats[name] - before[name] for name in ("ingested", "duplicates", "errors")}
+
+    def stats(self) -> Dict[str, Any]:
+        self._refresh()
+        with self._index_lock:
+            index = {"images": len(self._image_tags), "tags": len(self._tags)}
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({"root": self.root, "fill": self.fill, **index})
+        return stats
+
+    def shutdown(self):
+        with self._index_lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True)
+
+def main():
+    from app.services.video_generator import FORMAT_DIMENSIONS
+
+    parser = argparse.ArgumentParser(description="Add a directory of images to the local image library")
+    parser.add_argument("directory")
+    parser.add_argument("--tag", action="append", default=[], help="Extra tag for every image (repeatable)")
+    parser.add_argument("--root", help="Library directory (default: IMAGE_LIBRARY_DIR)")
+    args = parser.parse_args()
+
+    library = ImageLibrary(args.root, sizes=FORMAT_DIMENSIONS, fill=False)
+    start = time.perf_counter()
+    counts = library.ingest_directory(args.directory, args.tag)
+    json.dump({**counts, "seconds": round(time.perf_counter() - start, 2), "library": library.stats()},
+              sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import os
+import heapq
+import itertools
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    pass
+
+class _Job:
+    def __init__(self, job_id: str, fn: Callable, args: tuple, kwargs: dict, priority: int, seq: int):
+        self.job_id = job_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.seq = seq
+
+    def __lt__(self, other: "_Job") -> bool:
+        # Higher priority first, then submission order
+        return (-self.priority, self.seq) < (-other.priority, other.seq)
+
+class JobQueue:
+    """Bounded priority queue drained by worker threads outside the API event loop.
+
+    ``hold``, if given, is called with a job's function and returns how many
+    seconds that job should wait before starting (e.g. while the circuit of a
+    provider it needs is open). A held job stays queued instead of starting
+    only to fail, and the next job in line that isn't held starts instead.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_size: Optional[int] = None,
+                 hold: Optional[Callable[[Callable], float]] = None):
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "2"))
+        self.max_size = max_size or int(os.getenv("JOB_QUEUE_MAX_SIZE", "100"))
+        self.hold = hold
+        self._heap = []
+        self._running: Dict[str, _Job] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopping = False
+
+    def start(self):
+        with self._cond:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Job queue started with {self.workers} workers (max {self.max_size} queued)")
+
+    def submit(self, job_id: str, fn: Callable, *args, priority: int = 0, **kwargs) -> int:
+        """Queue a job and return its 1-based position; raises QueueFullError when at capacity"""
+        with self._cond:
+            if len(self._heap) >= self.max_size:
+                raise QueueFullError(f"Job queue is full ({self.max_size} jobs waiting)")
+            job = _Job(job_id, fn, args, kwargs, priority, next(self._seq))
+            heapq.heappush(self._heap, job)
+            self._cond.notify()
+            position = sum(1 for queued in self._heap if queued < job) + 1
+        self.start()
+        return position
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                job, hold_for = self._next_job()
+                if job is None:
+                    self._cond.wait(min(hold_for, 5.0))
+                    continue
+                self._heap.remove(job)
+                heapq.heapify(self._heap)
+                self._running[job.job_id] = job
+            try:
+                job.fn(*job.args, **job.kwargs)
+            except Exception as e:
+                logger.error(f"Job {job.job_id} failed: {e}")
+            finally:
+                with self._cond:
+                    self._running.pop(job.job_id, None)
+
+    def _next_job(self) -> Tuple[Optional[_Job], float]:
+        """The first waiting job that isn't held, or None and the shortest hold (caller holds the lock)"""
+        holds: Dict[Callable, float] = {}
+        for job in sorted(self._heap):
+            if job.fn not in holds:
+                holds[job.fn] = self._hold_for(job.fn)
+            if holds[job.fn] <= 0:
+                return job, 0.0
+        return None, min(holds.values())
+
+    def _hold_for(self, fn: Callable) -> float:
+        if not self.hold:
+            return 0.0
+        try:
+            return self.hold(fn)
+        except Exception as e:
+            logger.warning(f"Job hold check failed: {e}")
+            return 0.0
+
+    def positions(self) -> Dict[str, int]:
+        """1-based position of every waiting job"""
+        with self._cond:
+            ordered = sorted(self._heap)
+        return {job.job_id: i + 1 for i, job in enumerate(ordered)}
+
+    def position(self, job_id: str) -> Optional[int]:
+        return self.positions().get(job_id)
+
+    def is_running(self, job_id: str) -> bool:
+        with self._cond:
+            return job_id in self._running
+
+    @property
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "queued": len(self._heap),
+                "running": len(self._running),
+                "workers": self.workers,
+                "max_size": self.max_size,
+                "held_for": round(self._hold_for(min(self._heap).fn), 2) if self._heap else 0.0,
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout=1)
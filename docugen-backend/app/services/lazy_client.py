@@ -0,0 +1,25 @@
+import threading
+from typing import Any, Callable
+
+class LazyClient:
+    """Stands in for an SDK client and builds it on first attribute access.
+
+    The OpenAI and ElevenLabs SDKs take hundreds of milliseconds to import;
+    behind this, a process pays for them when it first calls the provider
+    instead of before it can answer ``/healthz``.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
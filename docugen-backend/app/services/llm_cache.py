@@ -0,0 +1,239 @@
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_STOPWORDS = frozenset("""
+a an and are as at be by for from in into is it its of on or the this to vs with
+""".split())
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def topic_tokens(text: str) -> FrozenSet[str]:
+    """Content words of a topic, lowercased and crudely singularized, for fuzzy matching"""
+    tokens = set()
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.add(word)
+    return frozenset(tokens)
+
+def _similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class LLMCache:
+    """Local cache of chat completion results.
+
+    Exact entries are keyed on the normalized messages, model and sampling
+    parameters. When ``fuzzy`` is on, a lookup that misses exactly may also
+    reuse an entry for a close topic: same model, parameters and system
+    prompt, and a topic whose content words overlap by at least
+    ``fuzzy_threshold`` (Jaccard). Entries expire after ``ttl`` seconds and
+    the least recently used are evicted once their text exceeds ``max_bytes``.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[int] = None, max_bytes: Optional[int] = None,
+                 fuzzy: Optional[bool] = None, fuzzy_threshold: Optional[float] = None):
+        self.path = path or os.getenv("LLM_CACHE_PATH", "/tmp/docugen_llm_cache.db")
+        self.ttl = ttl or int(os.getenv("LLM_CACHE_TTL", "604800"))
+        self.max_bytes = max_bytes or int(os.getenv("LLM_CACHE_MAX_MB", "64")) * 1024 * 1024
+        self.fuzzy = fuzzy if fuzzy is not None else os.getenv("LLM_CACHE_FUZZY", "false").lower() == "true"
+        self.fuzzy_threshold = fuzzy_threshold or float(os.getenv("LLM_CACHE_FUZZY_THRESHOLD", "0.75"))
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "fuzzy_hits": 0, "misses": 0, "expired": 0, "evictions": 0,
+                       "bypassed": 0, "miss_seconds": 0.0}
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    scope TEXT NOT NULL,
+                    topic_tokens TEXT,
+                    content TEXT NOT NULL,
+                    finish_reason TEXT,
+                    model TEXT,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS idx_completions_scope ON completions (scope)")
+            db.execute("CREATE INDEX IF NOT EXISTS idx_completions_last_access ON completions (last_access)")
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                self._stats[name] += delta
+
+    @staticmethod
+    def keys_for(model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> Tuple[str, str]:
+        """``(key, scope)``: the exact-match key, and the key shared by prompts that differ only in topic"""
+        normalized = [{"role": m["role"], "content": _normalize_text(m["content"])} for m in messages]
+        system = [m for m in normalized if m["role"] == "system"]
+        exact = json.dumps({"model": model, "messages": normalized, "params": params}, sort_keys=True)
+        scope = json.dumps({"model": model, "system": system, "params": params}, sort_keys=True)
+        return hashlib.sha256(exact.encode()).hexdigest(), hashlib.sha256(scope.encode()).hexdigest()
+
+    def get(self, key: str, scope: str, topic: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        db = self._db()
+        now = time.time()
+        row = db.execute(
+            "SELECT key, content, finish_reason, model, expires_at FROM completions WHERE key = ?", (key,)
+        ).fetchone()
+        if row and row[4] < now:
+            self._remove(key)
+            self._count(expired=1)
+            row = None
+
+        fuzzy_hit = False
+        if row is None and self.fuzzy and topic:
+            row = self._closest(scope, topic_tokens(topic), now)
+            fuzzy_hit = row is not None
+
+        if row is None:
+            self._count(misses=1)
+            return None
+
+        with db:
+            db.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, row[0]))
+        self._count(hits=1, fuzzy_hits=1 if fuzzy_hit else 0)
+        return {"content": row[1], "finish_reason": row[2], "model": row[3], "fuzzy": fuzzy_hit}
+
+    def _closest(self, scope: str, tokens: FrozenSet[str], now: float) -> Optional[tuple]:
+        best, best_score = None, self.fuzzy_threshold
+        for row in self._db().execute(
+            "SELECT key, content, finish_reason, model, expires_at, topic_tokens FROM completions "
+            "WHERE scope = ? AND topic_tokens IS NOT NULL AND expires_at >= ?", (scope, now)
+        ):
+            score = _similarity(tokens, frozenset(row[5].split()))
+            if score >= best_score:
+                best, best_score = row[:5], score
+        return best
+
+    def put(self, key: str, scope: str, content: str, finish_reason: Optional[str] = None,
+            model: Optional[str] = None, topic: Optional[str] = None):
+        now = time.time()
+        tokens = " ".join(sorted(topic_tokens(topic))) if topic else None
+        with self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO completions (key, scope, topic_tokens, content, finish_reason, model, "
+                "size, created_at, last_access, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, scope, tokens, content, finish_reason, model, len(content.encode()), now, now, now + self.ttl)
+            )
+        self._evict()
+
+    def record_miss_latency(self, seconds: float):
+        self._count(miss_seconds=seconds)
+
+    def record_bypass(self):
+        self._count(bypassed=1)
+
+    def _remove(self, key: str):
+        with self._db() as db:
+            db.execute("DELETE FROM completions WHERE key = ?", (key,))
+
+    def _evict(self):
+        db = self._db()
+        with db:
+            expired = db.execute("DELETE FROM completions WHERE expires_at < ?", (time.time(),)).rowcount
+        if expired:
+            self._count(expired=expired)
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in db.execute("SELECT key, size FROM completions ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
+            self._count(evictions=1)
+
+    def stats(self) -> Dict[str, Any]:
+        entries, total = self._db().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+        ).fetchone()
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        miss_seconds = stats.pop("miss_seconds")
+        average_miss = miss_seconds / stats["misses"] if stats["misses"] else None
+        stats.update({
+            "entries": entries,
+            "bytes_stored": total,
+            "max_bytes": self.max_bytes,
+            "fuzzy_enabled": self.fuzzy,
+            "hit_rate": round(stats["hits"] / lookups, 4) if lookups else None,
+            "average_miss_seconds": round(average_miss, 3) if average_miss is not None else None,
+            "estimated_seconds_saved": round(average_miss * stats["hits"], 1) if average_miss is not None else None,
+        })
+        return stats
+
+class _CachedCompletions:
+    def __init__(self, client, cache: LLMCache, limiter=None):
+        self._client = client
+        self._cache = cache
+        self._limiter = limiter
+
+    def create(self, model: str, messages: List[Dict[str, str]], cache_topic: Optional[str] = None, **params):
+        """``chat.completions.create`` with caching; ``cache_topic`` is what fuzzy matching compares"""
+        if params.get("stream") or params.get("n", 1) != 1:
+            self._cache.record_bypass()
+            return self._call(model=model, messages=messages, **params)
+
+        key, scope = self._cache.keys_for(model, messages, params)
+        cached = self._cache.get(key, scope, cache_topic)
+        if cached:
+            logger.info(f"LLM cache {'fuzzy ' if cached['fuzzy'] else ''}hit for {model}")
+            return _response(cached["content"], cached["finish_reason"], cached["model"] or model, cached=True)
+
+        start = time.perf_counter()
+        response = self._call(model=model, messages=messages, **params)
+        self._cache.record_miss_latency(time.perf_counter() - start)
+        choice = response.choices[0]
+        if choice.message.content and choice.finish_reason in (None, "stop", "length"):
+            self._cache.put(key, scope, choice.message.content, choice.finish_reason,
+                            getattr(response, "model", model), cache_topic)
+        return response
+
+    def _call(self, **kwargs):
+        if self._limiter:
+            return self._limiter.call(self._client.chat.completions.create, **kwargs)
+        return self._client.chat.completions.create(**kwargs)
+
+def _response(content: str, finish_reason: Optional[str], model: str, cached: bool = False):
+    message = SimpleNamespace(role="assistant", content=content)
+    choice = SimpleNamespace(message=message, finish_reason=finish_reason, index=0)
+    return SimpleNamespace(choices=[choice], model=model, cached=cached)
+
+class CachedChatClient:
+    """Wraps an OpenAI-compatible client so ``chat.completions.create`` goes through an ``LLMCache``.
+
+    Only misses reach the client, and those go through ``limiter`` (a ``ProviderLimiter``) when one is given.
+    """
+
+    def __init__(self, client, cache: LLMCache, limiter=None):
+        self.client = client
+        self.cache = cache
+        self.chat = SimpleNamespace(completions=_CachedCompletions(client, cache, limiter))
@@ -0,0 +1,318 @@
+import os
+import bisect
+import time
+import logging
+import threading
+import contextlib
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+BYTES_BUCKETS = tuple(mb * 1024 * 1024 for mb in (64, 128, 256, 512, 1024, 2048, 4096, 8192))
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+class Gauge(_Metric):
+    """Read from ``fn`` at scrape time, so it always reflects the live value"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], Optional[float]]):
+        super().__init__(name, help_text)
+        self.fn = fn
+
+    def samples(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception as e:
+            logger.warning(f"Gauge {self.name} failed: {e}")
+            return []
+        return [] if value is None else [f"{self.name} {_format_value(value)}"]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (),
+                 buckets: Iterable[float] = DURATION_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        lines = []
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound if bound == float("inf") else float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """Process-wide metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Iterable[str] = (),
+                  buckets: Iterable[float] = DURATION_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name: str, help_text: str, fn: Callable[[], Optional[float]]) -> Gauge:
+        return self._register(Gauge(name, help_text, fn))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "docugen_stage_seconds", "Wall time of one pipeline step (llm_script, tts, image_download, ...)", ("stage",))
+ENCODE_SECONDS = REGISTRY.histogram(
+    "docugen_encode_seconds", "Wall time of one aspect ratio encode", ("format", "engine"))
+ENCODE_CPU_SECONDS = REGISTRY.histogram(
+    "docugen_encode_cpu_seconds", "CPU seconds of one encode, including its ffmpeg subprocess", ("format", "engine"))
+ENCODE_PEAK_RSS = REGISTRY.histogram(
+    "docugen_encode_peak_rss_bytes", "Peak resident memory of the render worker and its encoder during one encode",
+    ("format", "engine"), buckets=BYTES_BUCKETS)
+UPLOAD_SECONDS = REGISTRY.histogram(
+    "docugen_upload_seconds", "Wall time of one social upload", ("platform", "status"))
+BYTES = REGISTRY.counter(
+    "docugen_bytes_total", "Bytes moved by the pipeline", ("direction", "kind"))
+GENERATION_SECONDS = REGISTRY.histogram(
+    "docugen_generation_seconds", "Wall time of a whole generation job", ("status",))
+JOB_CPU_SECONDS = REGISTRY.histogram(
+    "docugen_job_cpu_seconds", "CPU seconds attributed to one generation job")
+JOB_PEAK_RSS = REGISTRY.histogram(
+    "docugen_job_peak_rss_bytes", "Highest resident memory seen while a generation job ran", buckets=BYTES_BUCKETS)
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, from /proc on Linux"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+class _RssSampler:
+    """One background thread sampling this process's RSS into every job currently running"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._jobs = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, job: "JobMetrics"):
+        with self._lock:
+            self._jobs.add(job)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+                self._thread.start()
+
+    def discard(self, job: "JobMetrics"):
+        with self._lock:
+            self._jobs.discard(job)
+
+    def _run(self):
+        while True:
+            rss = rss_bytes()
+            if rss is None:
+                return
+            with self._lock:
+                jobs = list(self._jobs)
+            for job in jobs:
+                job.note_process_rss(rss)
+            time.sleep(self.interval)
+
+_sampler = _RssSampler(float(os.getenv("METRICS_RSS_SAMPLE_SECONDS", "0.5")))
+
+class JobMetrics:
+    """Timings, bytes, CPU and memory for one generation, also fed into the process-wide histograms.
+
+    Stage CPU is the thread CPU time of whichever thread ran the step (plus
+    what the step's own helper threads report, e.g. parallel TTS segments), and
+    encodes report the CPU of their render worker and ffmpeg subprocess, so
+    the total is attributable even with several jobs in flight. Process RSS
+    is sampled while the job runs and is shared with any concurrent job;
+    encode peaks are per render worker.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.encodes: Dict[str, Dict[str, Any]] = {}
+        self.bytes_in: Dict[str, int] = {}
+        self.bytes_out: Dict[str, int] = {}
+        self.cpu_seconds = 0.0
+        self.process_peak_rss = 0
+        self.encode_peak_rss = 0
+        self._started = None
+        self._lock = threading.Lock()
+
+    def start(self) -> "JobMetrics":
+        self._started = time.perf_counter()
+        self.note_process_rss(rss_bytes() or 0)
+        _sampler.add(self)
+        return self
+
+    def finish(self, status: str) -> Dict[str, Any]:
+        _sampler.discard(self)
+        self.note_process_rss(rss_bytes() or 0)
+        if self._started is not None:
+            GENERATION_SECONDS.observe(time.perf_counter() - self._started, status=status)
+        JOB_CPU_SECONDS.observe(self.cpu_seconds)
+        JOB_PEAK_RSS.observe(max(self.process_peak_rss, self.encode_peak_rss))
+        return self.summary()
+
+    def note_process_rss(self, rss: int):
+        with self._lock:
+            self.process_peak_rss = max(self.process_peak_rss, rss)
+
+    def add_stage(self, name: str, seconds: float, cpu_seconds: float = 0.0):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"count": 0, "seconds": 0.0, "cpu_seconds": 0.0})
+            stage["count"] += 1
+            stage["seconds"] += seconds
+            stage["cpu_seconds"] += cpu_seconds
+            self.cpu_seconds += cpu_seconds
+
+    def add_encode(self, format_ratio: str, engine: str, usage: Dict[str, float]):
+        ENCODE_SECONDS.observe(usage["seconds"], format=format_ratio, engine=engine)
+        ENCODE_CPU_SECONDS.observe(usage["cpu_seconds"], format=format_ratio, engine=engine)
+        if usage.get("peak_rss_bytes"):
+            ENCODE_PEAK_RSS.observe(usage["peak_rss_bytes"], format=format_ratio, engine=engine)
+        with self._lock:
+            self.encodes[format_ratio] = {
+                "engine": engine,
+                "seconds": round(usage["seconds"], 3),
+                "cpu_seconds": round(usage["cpu_seconds"], 3),
+                "peak_rss_mb": round(usage.get("peak_rss_bytes", 0) / 1024 / 1024, 1),
+            }
+            if "estimated_rss_bytes" in usage:
+                self.encodes[format_ratio]["estimated_rss_mb"] = round(usage["estimated_rss_bytes"] / 1024 / 1024, 1)
+                self.encodes[format_ratio]["admission_wait_seconds"] = round(usage["admission_wait_seconds"], 3)
+            self.cpu_seconds += usage["cpu_seconds"]
+            self.encode_peak_rss = max(self.encode_peak_rss, usage.get("peak_rss_bytes", 0))
+
+    def add_bytes(self, direction: str, kind: str, count: int):
+        target = self.bytes_in if direction == "in" else self.bytes_out
+        with self._lock:
+            target[kind] = target.get(kind, 0) + count
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "stages": {name: {"count": stage["count"], "seconds": round(stage["seconds"], 3),
+                                  "cpu_seconds": round(stage["cpu_seconds"], 3)}
+                           for name, stage in self.stages.items()},
+                "encodes": dict(self.encodes),
+                "bytes_in": dict(self.bytes_in),
+                "bytes_out": dict(self.bytes_out),
+                "cpu_seconds": round(self.cpu_seconds, 3),
+                "process_peak_rss_mb": round(self.process_peak_rss / 1024 / 1024, 1),
+                "encode_peak_rss_mb": round(self.encode_peak_rss / 1024 / 1024, 1),
+            }
+
+@contextlib.contextmanager
+def stage(name: str, job: Optional[JobMetrics] = None):
+    """Time a step into ``docugen_stage_seconds`` and, when given, the job's totals.
+
+    Yields a dict; CPU the step spent on other threads goes in its ``cpu_seconds``.
+    """
+    start = time.perf_counter()
+    cpu_start = time.thread_time()
+    usage = {"cpu_seconds": 0.0}
+    try:
+        yield usage
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=name)
+        if job is not None:
+            job.add_stage(name, seconds, time.thread_time() - cpu_start + usage["cpu_seconds"])
+
+def count_bytes(direction: str, kind: str, count: int, job: Optional[JobMetrics] = None):
+    if not count:
+        return
+    BYTES.inc(count, direction=direction, kind=kind)
+    if job is not None:
+        job.add_bytes(direction, kind, count)
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# A draft generation's job ends at preview_ready; approving it starts a new job with its own events
+TERMINAL_STAGES = ("completed", "failed", "preview_ready")
+
+class Subscription:
+    """An event feed for one generation (or all of them) bound to the subscriber's event loop"""
+
+    def __init__(self, broker: "ProgressBroker", generation_id: Optional[str], max_pending: int = 1000):
+        self.broker = broker
+        self.generation_id = generation_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+
+    def deliver(self, event: Dict[str, Any]):
+        # Called on the subscriber's loop; a stalled client loses events rather than memory
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker._unsubscribe(self)
+
+class ProgressBroker:
+    """Fans progress events out from worker threads to async subscribers.
+
+    Publishing never blocks the pipeline: events are handed to each
+    subscriber's loop with ``call_soon_threadsafe``. The latest event per
+    generation is kept so a client that connects mid-render gets a snapshot.
+    ``on_publish`` also receives every event published here (not relayed ones),
+    e.g. to share them with other processes.
+    """
+
+    def __init__(self, max_tracked: int = 1000, on_publish: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.max_tracked = max_tracked
+        self.on_publish = on_publish
+        self._lock = threading.Lock()
+        self._subscribers: Dict[Optional[str], List[Subscription]] = {}
+        self._latest: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def publish(self, generation_id: str, stage: str, status: str = "started", **data):
+        event = {
+            "generation_id": generation_id,
+            "stage": stage,
+            "status": status,
+            "timestamp": datetime.now().isoformat(),
+            **data
+        }
+        self.relay(event)
+        if self.on_publish:
+            try:
+                self.on_publish(event)
+            except Exception as e:
+                logger.warning(f"Progress event forwarding failed: {e}")
+
+    def relay(self, event: Dict[str, Any]):
+        """Deliver an event that was published elsewhere (another process) to this broker's subscribers"""
+        generation_id = event["generation_id"]
+        with self._lock:
+            self._latest[generation_id] = event
+            self._latest.move_to_end(generation_id)
+            while len(self._latest) > self.max_tracked:
+                self._latest.popitem(last=False)
+            targets = self._subscribers.get(generation_id, []) + self._subscribers.get(None, [])
+
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # Subscriber's loop already closed
+                subscription.close()
+
+    def callback_for(self, generation_id: str):
+        """A ``(stage, status, **data)`` callable bound to one generation, for services to report through"""
+        def report(stage: str, status: str = "started", **data):
+            self.publish(generation_id, stage, status, **data)
+        return report
+
+    def latest(self, generation_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._latest.get(generation_id)
+
+    def subscribe(self, generation_id: Optional[str] = None) -> Subscription:
+        """Must be called from the event loop that will consume the events"""
+        subscription = Subscription(self, generation_id)
+        with self._lock:
+            self._subscribers.setdefault(generation_id, []).append(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.generation_id, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.generation_id, None)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
@@ -0,0 +1,401 @@
+import os
+import time
+import random
+import socket
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Requests per minute and burst size per provider; override with e.g. OPENAI_REQUESTS_PER_MINUTE / OPENAI_BURST
+DEFAULT_LIMITS = {
+    "openai": (60.0, 10),
+    "elevenlabs": (30.0, 4),
+    "pexels": (200 / 60, 20),  # Pexels' default quota is 200 requests an hour
+}
+
+# Providers whose callers can do without them (image search falls back to the library and placeholders),
+# so jobs are never held for them
+FALLBACK_PROVIDERS = frozenset({"pexels"})
+
+# Longest a call may wait for its provider's quota before giving up instead; override with e.g.
+# PEXELS_MAX_WAIT_SECONDS. Pexels is short because image search falls back to the library and placeholders
+DEFAULT_MAX_WAIT_SECONDS = {"pexels": 15.0}
+
+RETRYABLE_STATUSES = frozenset({408, 409, 425, 429, 500, 502, 503, 504, 529})
+
+# Network failures by class name, so requests, urllib3, httpx and the SDK errors wrapping them match without
+# importing them (requests' ConnectionError and Timeout, urllib3's ProtocolError, httpx's TransportError, ...)
+TRANSPORT_ERROR_SUFFIXES = ("ConnectionError", "ConnectError", "Timeout", "TimeoutError", "TransportError",
+                            "ProtocolError", "ChunkedEncodingError")
+
+class ProviderUnavailableError(Exception):
+    """A provider's circuit is open, or it kept throttling or failing until retries ran out"""
+
+    def __init__(self, provider: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.retry_after = retry_after
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Seconds from ``"20ms"``, ``"1.5s"``, ``"6m0s"`` or a bare number"""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total, number = 0.0, ""
+    i = 0
+    while i < len(value):
+        char = value[i]
+        if char.isdigit() or char == ".":
+            number += char
+        elif value.startswith("ms", i):
+            total += float(number or 0) / 1000
+            number = ""
+            i += 1
+        elif char in "hms":
+            total += float(number or 0) * {"h": 3600, "m": 60, "s": 1}[char]
+            number = ""
+        else:
+            return None
+        i += 1
+    return total if not number else None
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def _lower_headers(headers: Optional[Mapping]) -> Dict[str, str]:
+    if not headers:
+        return {}
+    try:
+        return {str(key).lower(): str(value) for key, value in headers.items()}
+    except AttributeError:
+        return {}
+
+def classify_error(error: Exception) -> Dict[str, Any]:
+    """Status, headers and whether a retry could help, for errors from requests, the OpenAI SDK or ElevenLabs"""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    headers = _lower_headers(getattr(error, "headers", None) or getattr(response, "headers", None))
+    if status is not None:
+        retryable = status in RETRYABLE_STATUSES
+    else:
+        # Only the network counts: a local OSError (disk full, bad path) would fail the same way on every retry
+        names = {cls.__name__ for cls in type(error).__mro__}
+        retryable = isinstance(error, (ConnectionError, TimeoutError, socket.gaierror)) or any(
+            name.endswith(TRANSPORT_ERROR_SUFFIXES) for name in names
+        )
+    return {"status": status, "headers": headers, "retryable": retryable,
+            "retry_after": _parse_retry_after(headers.get("retry-after"))}
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every job that calls one provider.
+
+    ``acquire`` reserves its tokens immediately, even when that takes the
+    bucket negative, and then sleeps until they would have refilled. Callers
+    are therefore served in the order they arrived and a burst of jobs is
+    spread out at the current rate rather than retrying in lockstep.
+
+    The rate adapts: a 429 halves it and pauses the bucket for any
+    ``Retry-After``, each success adds back 5% of the configured rate, and
+    ``X-RateLimit-*`` headers cap it to what the provider says is left in
+    the current window. A caller that would wait longer than ``max_wait``
+    (an exhausted hourly quota can mean most of an hour) gets
+    ``ProviderUnavailableError`` instead, without taking any tokens.
+    """
+
+    def __init__(self, name: str, rate_per_minute: float, burst: int, max_wait: Optional[float] = None):
+        self.name = name
+        self.max_wait = max_wait
+        self.max_rate_per_minute = rate_per_minute
+        self.rate_per_minute = rate_per_minute
+        self.min_rate_per_minute = rate_per_minute / 20
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"acquired": 0, "waits": 0, "waited_seconds": 0.0, "throttled": 0, "refused": 0}
+
+    def _refill(self, now: float):
+        if now > self._paused_until:
+            start = max(self._updated, self._paused_until)
+            self._tokens = min(self.burst, self._tokens + (now - start) * self.rate_per_minute / 60)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until ``tokens`` are available; returns the seconds spent waiting"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            wait = -self._tokens * 60 / self.rate_per_minute if self._tokens < 0 else 0.0
+            wait += max(0.0, self._paused_until - now)
+            if self.max_wait is not None and wait > self.max_wait:
+                self._tokens += tokens
+                self._stats["refused"] += 1
+                raise ProviderUnavailableError(self.name, f"rate limited for another {wait:.0f}s",
+                                               retry_after=wait)
+            self._stats["acquired"] += 1
+            if wait:
+                self._stats["waits"] += 1
+                self._stats["waited_seconds"] += wait
+        if wait:
+            logger.debug(f"Rate limit {self.name}: waiting {wait:.2f}s")
+            time.sleep(wait)
+        return wait
+
+    def throttle(self, retry_after: Optional[float] = None):
+        """The provider rejected a call as over its limit"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate_per_minute = max(self.min_rate_per_minute, self.rate_per_minute / 2)
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            else:
+                self._tokens = min(self._tokens, 0.0)
+            self._stats["throttled"] += 1
+        logger.warning(f"Rate limit {self.name}: throttled, rate now {self.rate_per_minute:.1f}/min")
+
+    def succeeded(self):
+        with self._lock:
+            if self.rate_per_minute < self.max_rate_per_minute:
+                self.rate_per_minute = min(self.max_rate_per_minute,
+                                           self.rate_per_minute + self.max_rate_per_minute * 0.05)
+
+    def observe(self, headers: Optional[Mapping]):
+        """Tune to the provider's own accounting (OpenAI ``x-ratelimit-*-requests``, Pexels ``X-Ratelimit-*``)"""
+        headers = _lower_headers(headers)
+        remaining = headers.get("x-ratelimit-remaining-requests") or headers.get("x-ratelimit-remaining")
+        reset = headers.get("x-ratelimit-reset-requests") or headers.get("x-ratelimit-reset")
+        if remaining is None:
+            return
+        try:
+            remaining = float(remaining)
+        except ValueError:
+            return
+        reset_seconds = _parse_duration(reset) if reset else None
+        if reset_seconds is not None and reset_seconds > 1e9:
+            reset_seconds = max(0.0, reset_seconds - time.time())  # Pexels sends an epoch timestamp
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if remaining <= 0 and reset_seconds:
+                # The window's quota comes back all at once at the reset
+                self._paused_until = max(self._paused_until, now + reset_seconds)
+                return
+            self._tokens = min(self._tokens, remaining)
+            if reset_seconds:
+                sustainable = remaining * 60 / reset_seconds
+                self.rate_per_minute = max(self.min_rate_per_minute, min(self.max_rate_per_minute, sustainable))
+
+    @property
+    def paused_for(self) -> float:
+        with self._lock:
+            return max(0.0, self._paused_until - time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill(time.monotonic())
+            stats = dict(self._stats)
+            available = self._tokens
+        stats.update({
+            "rate_per_minute": round(self.rate_per_minute, 2),
+            "max_rate_per_minute": round(self.max_rate_per_minute, 2),
+            "burst": self.burst,
+            "available": round(available, 2),
+            "paused_for": round(self.paused_for, 2),
+            "waited_seconds": round(stats["waited_seconds"], 2),
+        })
+        return stats
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive throttling/outage failures.
+
+    While open every call fails fast. After ``reset_seconds`` one probe call
+    is let through (half-open); its success closes the circuit and its
+    failure re-opens it for another ``reset_seconds``.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._trips = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "closed":
+                return
+            remaining = self._opened_at + self.reset_seconds - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return
+        raise ProviderUnavailableError(self.name, "circuit open", retry_after=max(remaining, 1.0))
+
+    def release_probe(self):
+        """Hand back a half-open probe that never reached the provider so the next call can probe"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"Circuit {self.name} closed")
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == "half_open" or (self.state == "closed" and self._failures >= self.failure_threshold):
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._trips += 1
+                logger.warning(f"Circuit {self.name} opened after {self._failures} failures")
+
+    @property
+    def open_for(self) -> float:
+        """Seconds until an open circuit will let a probe through; 0 when calls may proceed"""
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_seconds - time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self._failures, "trips": self._trips,
+                "open_for": round(self.open_for, 2)}
+
+class ProviderLimiter:
+    """Everything between a job and one provider: circuit check, token, call, and jittered retries.
+
+    Retryable failures (429, 5xx, transport errors) back off with full jitter,
+    never less than the provider's ``Retry-After``, and count against the
+    circuit. Other errors are the caller's problem and are raised unchanged.
+    Once retries are exhausted, or the circuit is open, ``ProviderUnavailableError``
+    is raised so the job can be held rather than failed.
+    """
+
+    def __init__(self, name: str, bucket: TokenBucket, breaker: CircuitBreaker,
+                 max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 30.0):
+        self.name = name
+        self.bucket = bucket
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._retries = 0
+
+    def call(self, fn: Callable, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.breaker.before_call()
+            try:
+                self.bucket.acquire()
+                result = fn(*args, **kwargs)
+            except ProviderUnavailableError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                failure = classify_error(e)
+                if not failure["retryable"]:
+                    # The provider answered; this isn't a health problem
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                self.bucket.observe(failure["headers"])
+                if failure["status"] == 429:
+                    self.bucket.throttle(failure["retry_after"])
+                if attempt == self.max_retries or self.breaker.state == "open":
+                    raise ProviderUnavailableError(
+                        self.name, f"giving up after {attempt + 1} attempts: {e}",
+                        retry_after=failure["retry_after"] or self.breaker.open_for or None
+                    ) from e
+                delay = max(failure["retry_after"] or 0.0,
+                            random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+                if self.bucket.max_wait is not None and delay > self.bucket.max_wait:
+                    raise ProviderUnavailableError(self.name, f"asked to retry after {delay:.0f}s: {e}",
+                                                   retry_after=delay) from e
+                self._retries += 1
+                logger.warning(f"{self.name} call failed ({failure['status'] or type(e).__name__}), "
+                               f"retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            self.bucket.succeeded()
+            self.bucket.observe(getattr(result, "headers", None))
+            return result
+
+    @property
+    def hold_for(self) -> float:
+        """How long new work that needs this provider should wait before starting"""
+        return max(self.breaker.open_for, self.bucket.paused_for)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.bucket.stats(), "retries": self._retries, "circuit": self.breaker.stats()}
+
+class RateLimits:
+    """One ``ProviderLimiter`` per provider, created on first use from the environment"""
+
+    def __init__(self, limits: Optional[Dict[str, tuple]] = None, fallbacks: Iterable[str] = FALLBACK_PROVIDERS):
+        self._limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.fallbacks = frozenset(fallbacks)
+        self._providers: Dict[str, ProviderLimiter] = {}
+        self._lock = threading.Lock()
+
+    def provider(self, name: str) -> ProviderLimiter:
+        with self._lock:
+            if name not in self._providers:
+                default_rate, default_burst = self._limits.get(name, (60.0, 10))
+                prefix = name.upper()
+                rate = float(os.getenv(f"{prefix}_REQUESTS_PER_MINUTE", "0")) or default_rate
+                burst = int(os.getenv(f"{prefix}_BURST", "0")) or default_burst
+                breaker = CircuitBreaker(
+                    name,
+                    failure_threshold=int(os.getenv(f"{prefix}_CIRCUIT_FAILURES", "5")),
+                    reset_seconds=float(os.getenv(f"{prefix}_CIRCUIT_RESET_SECONDS", "30"))
+                )
+                max_wait = float(os.getenv(f"{prefix}_MAX_WAIT_SECONDS", "0")) or DEFAULT_MAX_WAIT_SECONDS.get(name)
+                self._providers[name] = ProviderLimiter(
+                    name, TokenBucket(name, rate, burst, max_wait), breaker,
+                    max_retries=int(os.getenv(f"{prefix}_MAX_RETRIES", "4"))
+                )
+            return self._providers[name]
+
+    def hold_for(self, providers: Optional[Iterable[str]] = None) -> float:
+        """How long a job needing ``providers`` (default: all) should be held before starting.
+
+        Only providers the job can't do without count: one with a fallback
+        degrades the job instead of stopping it.
+        """
+        with self._lock:
+            limiters = [limiter for name, limiter in self._providers.items()
+                        if name not in self.fallbacks and (providers is None or name in providers)]
+        return max((limiter.hold_for for limiter in limiters), default=0.0)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            providers = dict(self._providers)
+        return {name: provider.stats() for name, provider in providers.items()}
@@ -0,0 +1,257 @@
+import os
+import time
+import importlib
+import logging
+import multiprocessing
+import threading
+import itertools
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Callable, Dict, List, Optional
+
+from app.services.video_generator import RENDER_ENGINES
+from app.services.metrics import count_bytes
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+_worker_progress_queue = None
+
+def _init_worker(progress_queue):
+    global _worker_progress_queue
+    _worker_progress_queue = progress_queue
+    # Render workers are the only processes that encode; they load the media stack up front
+    # instead of the API process, and before their first encode rather than during it
+    for module in ("numpy", "PIL.Image", "moviepy.editor"):
+        importlib.import_module(module)
+
+class _QueueProgress:
+    """Picklable progress callback that forwards encode percentages from a worker to the parent"""
+
+    def __init__(self, token: int):
+        self.token = token
+
+    def __call__(self, percent: int):
+        if _worker_progress_queue is not None:
+            _worker_progress_queue.put((self.token, percent))
+
+CHILD_RSS_SAMPLE_SECONDS = 0.1
+
+def _peak_rss_kb(field: str = "VmHWM", pid: str = "self") -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def _children_rss_kb() -> int:
+    """Resident memory of this process's child processes (the encoder's ffmpeg)"""
+    total = 0
+    try:
+        for tid in os.listdir("/proc/self/task"):
+            with open(f"/proc/self/task/{tid}/children") as f:
+                total += sum(_peak_rss_kb("VmRSS", pid) for pid in f.read().split())
+    except OSError:
+        pass
+    return total
+
+def measured_encode(encode, *args):
+    """Run ``encode`` in a render worker; returns its result and the worker's usage for that encode.
+
+    A worker runs one encode at a time, so the deltas are this encode's alone:
+    CPU includes the ffmpeg subprocess (moviepy's or ours) once it has been
+    waited for. The worker's peak RSS is reset first and the encoder
+    subprocess's RSS is sampled while it runs, so the peak is this encode's
+    even in a worker that ran bigger ones before (without /proc, the largest
+    ffmpeg the worker has run stands in).
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    child_peak_kb = [0]
+    done = threading.Event()
+
+    def sample_children():
+        while not done.wait(CHILD_RSS_SAMPLE_SECONDS):
+            child_peak_kb[0] = max(child_peak_kb[0], _children_rss_kb())
+
+    sampler = threading.Thread(target=sample_children, name="encode-rss", daemon=True)
+    sampler.start()
+    before = (resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)) if resource else None
+    start = time.perf_counter()
+    try:
+        result = encode(*args)
+    finally:
+        done.set()
+        sampler.join()
+    usage = {"seconds": time.perf_counter() - start, "cpu_seconds": 0.0, "peak_rss_bytes": 0}
+    if resource:
+        after = (resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN))
+        usage["cpu_seconds"] = sum(a.ru_utime + a.ru_stime - b.ru_utime - b.ru_stime for a, b in zip(after, before))
+        worker_kb = _peak_rss_kb() or after[0].ru_maxrss
+        usage["peak_rss_bytes"] = (worker_kb + (child_peak_kb[0] or after[1].ru_maxrss)) * 1024
+    return result, usage
+
+class RenderScheduler:
+    """Runs per-format encodes in a shared pool of worker processes.
+
+    The pool is process-wide, so ``max_workers`` caps concurrent encodes across
+    every generation in flight, and each encode gets ``threads_per_encode``
+    ffmpeg threads so the two together stay within the machine's cores.
+    With an ``admission`` controller, each encode is also only submitted once
+    its estimated memory and CPU fit the render budget; until then the
+    generation's thread waits and reports ``encode`` ``waiting``.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, threads_per_encode: Optional[int] = None,
+                 admission=None):
+        self.admission = admission
+        cpu_count = os.cpu_count() or 1
+        self.max_workers = max_workers or int(os.getenv("RENDER_MAX_WORKERS", "0")) or cpu_count
+        self.threads_per_encode = (threads_per_encode or int(os.getenv("RENDER_THREADS_PER_ENCODE", "0"))
+                                   or max(1, cpu_count // self.max_workers))
+        self._executor = None
+        self._lock = threading.Lock()
+        self._active = 0
+        self._progress_queue = None
+        self._progress_callbacks: Dict[int, Callable[[int], None]] = {}
+        self._tokens = itertools.count()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                logger.info(f"Starting render pool: {self.max_workers} workers x {self.threads_per_encode} threads")
+                context = multiprocessing.get_context("spawn")
+                self._progress_queue = context.SimpleQueue()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self._progress_queue,)
+                )
+                threading.Thread(target=self._pump_progress, args=(self._progress_queue,),
+                                 name="render-progress", daemon=True).start()
+            return self._executor
+
+    def _pump_progress(self, progress_queue):
+        while True:
+            message = progress_queue.get()
+            if message is None:
+                return
+            token, percent = message
+            callback = self._progress_callbacks.get(token)
+            if callback:
+                try:
+                    callback(percent)
+                except Exception as e:
+                    logger.warning(f"Progress callback failed: {e}")
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = self._get_executor().submit(fn, *args, **kwargs)
+        with self._lock:
+            self._active += 1
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: Future):
+        with self._lock:
+            self._active -= 1
+
+    @property
+    def active(self) -> int:
+        """Encodes submitted and not yet finished, including ones waiting for a worker"""
+        return self._active
+
+    def _admit(self, render_engine: str, width: int, height: int, assets, format_ratio: str,
+               progress_callback: Optional[Callable] = None):
+        """Wait for the render budget to fit this encode; returns its ticket, or None without admission control"""
+        if not self.admission:
+            return None
+        cost = self.admission.estimate(render_engine, width, height, len(assets.images), assets.duration,
+                                       self.threads_per_encode)
+        on_wait = None
+        if progress_callback:
+            on_wait = lambda cost: progress_callback("encode", "waiting", format=format_ratio, **cost.as_dict())
+        return self.admission.acquire(cost, on_wait)
+
+    def _release(self, ticket, future: Future):
+        usage = None
+        if not future.cancelled() and future.exception() is None:
+            usage = future.result()[1]
+        self.admission.release(ticket, usage)
+
+    def render_formats(self, generator, assets, generation_id: str, formats: List[str],
+                       progress_callback: Optional[Callable] = None,
+                       render_engine: str = "moviepy", metrics=None) -> Dict[str, Optional[str]]:
+        encode = RENDER_ENGINES[render_engine]
+        results = {format_ratio: None for format_ratio in formats}
+        futures = {}
+        tickets = {}
+        tokens = []
+        for format_ratio in formats:
+            dimensions = generator._get_dimensions(format_ratio)
+            if not dimensions:
+                logger.error(f"Invalid aspect ratio: {format_ratio}")
+                continue
+            width, height = dimensions
+            output_filename, temp_audiofile = generator._output_paths(generation_id, format_ratio)
+            ticket = self._admit(render_engine, width, height, assets, format_ratio, progress_callback)
+            if ticket:
+                tickets[format_ratio] = ticket
+            progress = None
+            if progress_callback:
+                token = next(self._tokens)
+                tokens.append(token)
+                self._progress_callbacks[token] = (
+                    lambda percent, f=format_ratio: progress_callback("encode", "progress", format=f, percent=percent)
+                )
+                progress = _QueueProgress(token)
+            try:
+                futures[format_ratio] = self.submit(
+                    measured_encode, encode, assets.images_for(dimensions), assets.audio_file, output_filename,
+                    width, height, temp_audiofile, self.threads_per_encode, progress, assets.duration
+                )
+            except BaseException:
+                if ticket:
+                    self.admission.release(ticket)
+                raise
+            if ticket:
+                futures[format_ratio].add_done_callback(lambda future, t=ticket: self._release(t, future))
+
+        try:
+            for format_ratio, future in futures.items():
+                try:
+                    results[format_ratio], usage = future.result()
+                    if metrics:
+                        if format_ratio in tickets:
+                            usage = {**usage, "estimated_rss_bytes": tickets[format_ratio].cost.memory_bytes,
+                                     "admission_wait_seconds": tickets[format_ratio].waited}
+                        metrics.add_encode(format_ratio, render_engine, usage)
+                    if results[format_ratio]:
+                        count_bytes("out", "video", os.path.getsize(results[format_ratio]), metrics)
+                    logger.info(f"Created video for {format_ratio}: {results[format_ratio]}")
+                except Exception as e:
+                    logger.error(f"Failed to create video for {format_ratio}: {e}")
+                if progress_callback:
+                    progress_callback("encode", "completed" if results[format_ratio] else "failed", format=format_ratio)
+        finally:
+            for token in tokens:
+                self._progress_callbacks.pop(token, None)
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            progress_queue, self._progress_queue = self._progress_queue, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if progress_queue:
+            progress_queue.put(None)
@@ -1,29 +1,286 @@
+from __future__ import annotations
+
 import os
+import re
+import json
+import time
+import uuid
+import random
+import sqlite3
 import logging
-from typing import Dict, Optional, Any
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-import requests
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, Any
+
+from app.services.metrics import UPLOAD_SECONDS, count_bytes
+
+if TYPE_CHECKING:
+    import requests
 
 logger = logging.getLogger(__name__)
 
+PLATFORM_FORMATS = {
+    "youtube": "16:9",
+    "tiktok": "9:16",
+    "facebook": "16:9",
+    "instagram": "1:1"
+}
+
+# The resumable protocol requires every chunk but the last to be a multiple of 256 KiB
+_CHUNK_GRANULARITY = 256 * 1024
+_UNFINISHED = ("queued", "uploading")
+
+class UploadSessionExpired(Exception):
+    """The resumable session is gone (404/410); the upload has to start over with a new one"""
+
+class UploadStore:
+    """Social upload records, including the resumable session URI and how far each upload got.
+
+    Records are written after every chunk, so a restarted server can find the
+    uploads that were in flight and continue them from the last acknowledged byte.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("SOCIAL_UPLOADS_DB_PATH", "/tmp/docugen_uploads.db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS uploads (
+                id TEXT PRIMARY KEY,
+                generation_id TEXT,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_uploads_generation ON uploads (generation_id, created_at);
+            CREATE INDEX IF NOT EXISTS idx_uploads_status ON uploads (status);
+        """)
+        self._conn.commit()
+
+    def save(self, upload: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads (id, generation_id, status, created_at, data) VALUES (?, ?, ?, ?, ?)",
+                (upload["id"], upload.get("generation_id"), upload["status"], upload["created_at"], json.dumps(upload))
+            )
+            self._conn.commit()
+
+    def get(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM uploads WHERE id = ?", (upload_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def for_generation(self, generation_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM uploads WHERE generation_id = ? ORDER BY created_at", (generation_id,)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        placeholders = ",".join("?" * len(_UNFINISHED))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data FROM uploads WHERE status IN ({placeholders}) ORDER BY created_at", _UNFINISHED
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
 class SocialMediaUploader:
-    def __init__(self):
+    """Uploads finished videos to the social platforms, one background job per platform.
+
+    YouTube uses Google's resumable upload protocol over a shared ``requests``
+    session: the session URI is stored with the upload, the file is sent in
+    ``YOUTUBE_UPLOAD_CHUNK_MB`` chunks and, after a dropped connection, a 5xx
+    or a restart, the upload asks the server how much it has and continues
+    from there. ``on_progress(upload)`` is called after every chunk and
+    ``on_complete(upload)`` once an upload finishes either way.
+    """
+
+    def __init__(self, store: Optional[UploadStore] = None, workers: Optional[int] = None,
+                 on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 on_complete: Optional[Callable[[Dict[str, Any]], None]] = None):
         self.youtube_api_key = os.getenv("YOUTUBE_API_KEY")
+        self.youtube_access_token = os.getenv("YOUTUBE_ACCESS_TOKEN")
+        self.youtube_refresh_token = os.getenv("YOUTUBE_REFRESH_TOKEN")
+        self.youtube_upload_url = os.getenv("YOUTUBE_UPLOAD_URL", "https://www.googleapis.com/upload/youtube/v3/videos")
+        chunk = int(float(os.getenv("YOUTUBE_UPLOAD_CHUNK_MB", "8")) * 1024 * 1024)
+        self.chunk_size = max(_CHUNK_GRANULARITY, chunk - chunk % _CHUNK_GRANULARITY)
+        self.max_retries = int(os.getenv("SOCIAL_UPLOAD_MAX_RETRIES", "5"))
         self.facebook_token = os.getenv("FACEBOOK_ACCESS_TOKEN")
         self.tiktok_token = os.getenv("TIKTOK_ACCESS_TOKEN")
         self.instagram_token = os.getenv("INSTAGRAM_ACCESS_TOKEN")
-    
-    def upload_to_youtube(self, video_file: str, title: str, description: str, 
-                         tags: list = None) -> Dict[str, Any]:
+        self.store = store
+        self.workers = workers or int(os.getenv("SOCIAL_UPLOAD_WORKERS", "4"))
+        self.on_progress = on_progress
+        self.on_complete = on_complete
+        self._credentials = None
+        self._session = None
+        self._executor = None
+        self._init_lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        import requests
+
+        with self._init_lock:
+            if self._session is None:
+                self._session = requests.Session()
+            return self._session
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._init_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="social-upload")
+            return self._executor
+
+    def _youtube_auth(self) -> Dict[str, Dict[str, str]]:
+        """Request kwargs authorizing a YouTube call: OAuth credentials, refreshed when they expire, else the API key"""
+        with self._init_lock:
+            if self._credentials is None and (self.youtube_refresh_token or self.youtube_access_token):
+                from google.oauth2.credentials import Credentials
+
+                self._credentials = Credentials(
+                    self.youtube_access_token,
+                    refresh_token=self.youtube_refresh_token,
+                    token_uri="https://oauth2.googleapis.com/token",
+                    client_id=os.getenv("YOUTUBE_CLIENT_ID"),
+                    client_secret=os.getenv("YOUTUBE_CLIENT_SECRET")
+                )
+            credentials = self._credentials
+            if credentials is not None:
+                if not credentials.valid and credentials.refresh_token:
+                    from google.auth.transport.requests import Request
+
+                    credentials.refresh(Request())
+                return {"headers": {"Authorization": f"Bearer {credentials.token}"}}
+        return {"params": {"key": self.youtube_api_key}}
+
+    def _youtube_start_session(self, video_file: str, body: Dict[str, Any]) -> str:
+        auth = self._youtube_auth()
+        response = self.session.post(
+            self.youtube_upload_url,
+            params={"uploadType": "resumable", "part": ",".join(body.keys()), **auth.get("params", {})},
+            headers={**auth.get("headers", {}), "X-Upload-Content-Type": "video/mp4",
+                     "X-Upload-Content-Length": str(os.path.getsize(video_file))},
+            json=body,
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.headers["Location"]
+
+    def _youtube_offset(self, session_uri: str, total: int) -> Any:
+        """How many bytes the session has; the finished video resource instead if it already has all of them"""
+        response = self.session.put(session_uri, headers={"Content-Range": f"bytes */{total}", "Content-Length": "0",
+                                                          **self._youtube_auth().get("headers", {})}, timeout=30)
+        return self._youtube_result(response)
+
+    @staticmethod
+    def _youtube_result(response: requests.Response) -> Any:
+        import requests
+
+        if response.status_code in (200, 201):
+            return response.json()
+        if response.status_code == 308:
+            match = re.match(r"bytes=0-(\d+)", response.headers.get("Range", ""))
+            return int(match.group(1)) + 1 if match else 0
+        if response.status_code in (404, 410):
+            raise UploadSessionExpired(f"Upload session expired ({response.status_code})")
+        response.raise_for_status()
+        raise requests.HTTPError(f"Unexpected upload response {response.status_code}", response=response)
+
+    def _youtube_resumable(self, upload: Dict[str, Any], body: Dict[str, Any]) -> Dict[str, Any]:
+        import requests
+
+        video_file = upload["video_file"]
+        total = os.path.getsize(video_file)
+        upload["total_bytes"] = total
+        started = time.perf_counter()
+        resumed_from = None
+        failures = 0
+        restarts = 0
+
+        with open(video_file, "rb") as f:
+            while True:
+                try:
+                    if not upload.get("session_uri"):
+                        upload["session_uri"] = self._youtube_start_session(video_file, body)
+                        offset = 0
+                    else:
+                        offset = self._youtube_offset(upload["session_uri"], total)
+                    if resumed_from is None:
+                        resumed_from = offset if isinstance(offset, int) else total
+
+                    while isinstance(offset, int):
+                        upload["bytes_sent"] = offset
+                        self._report(upload, started, resumed_from)
+                        f.seek(offset)
+                        chunk = f.read(self.chunk_size)
+                        response = self.session.put(upload["session_uri"], data=chunk, timeout=120, headers={
+                            "Content-Range": f"bytes {offset}-{offset + len(chunk) - 1}/{total}",
+                            **self._youtube_auth().get("headers", {})
+                        })
+                        if response.status_code >= 500 or response.status_code == 429:
+                            raise requests.HTTPError(f"Upload chunk failed ({response.status_code})", response=response)
+                        offset = self._youtube_result(response)
+                        failures = 0
+
+                    upload["bytes_sent"] = total
+                    elapsed = time.perf_counter() - started
+                    upload["seconds"] = round(elapsed, 2)
+                    upload["mb_per_second"] = round((total - resumed_from) / elapsed / 1024 / 1024, 2) if elapsed else None
+                    return offset
+                except UploadSessionExpired as e:
+                    # Never reset: a server that keeps dropping sessions must not loop us forever
+                    restarts += 1
+                    if restarts > self.max_retries:
+                        raise
+                    delay = random.uniform(0, min(30.0, 0.5 * 2 ** restarts))
+                    logger.warning(f"{e}; restarting upload {upload['id']} in {delay:.1f}s "
+                                   f"({restarts}/{self.max_retries})")
+                    upload["session_uri"] = None
+                    self._save(upload)
+                    time.sleep(delay)
+                except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                    status = getattr(getattr(e, "response", None), "status_code", None)
+                    if status is not None and status < 500 and status != 429:
+                        raise
+                    failures += 1
+                    if failures > self.max_retries:
+                        raise
+                    delay = random.uniform(0, min(30.0, 0.5 * 2 ** failures))
+                    logger.warning(f"Upload {upload['id']} interrupted ({e}); resuming in {delay:.1f}s")
+                    self._save(upload)
+                    time.sleep(delay)
+
+    def _report(self, upload: Dict[str, Any], started: float, resumed_from: int):
+        elapsed = time.perf_counter() - started
+        sent = upload["bytes_sent"] - resumed_from
+        upload["mb_per_second"] = round(sent / elapsed / 1024 / 1024, 2) if elapsed and sent else None
+        self._save(upload)
+        if self.on_progress:
+            try:
+                self.on_progress(dict(upload))
+            except Exception as e:
+                logger.warning(f"Upload progress callback failed: {e}")
+
+    def _save(self, upload: Dict[str, Any]):
+        if self.store:
+            self.store.save(upload)
+
+    def upload_to_youtube(self, video_file: str, title: str, description: str,
+                         tags: list = None, upload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Resumable upload; pass the stored ``upload`` record to continue from its session URI"""
         try:
-            if not self.youtube_api_key:
+            if not (self.youtube_api_key or self.youtube_access_token or self.youtube_refresh_token):
                 return {"status": "error", "message": "YouTube API key not configured"}
             
-            youtube = build('youtube', 'v3', developerKey=self.youtube_api_key)
-            
             body = {
                 'snippet': {
                     'title': title,
@@ -36,15 +293,8 @@ class SocialMediaUploader:
                 }
             }
             
-            media = MediaFileUpload(video_file, chunksize=-1, resumable=True)
-            
-            request = youtube.videos().insert(
-                part=','.join(body.keys()),
-                body=body,
-                media_body=media
-            )
-            
-            response = request.execute()
+            upload = upload if upload is not None else self._new_upload(None, "youtube", video_file, title, description)
+            response = self._youtube_resumable(upload, body)
             
             video_id = response.get('id')
             video_url = f"https://www.youtube.com/watch?v={video_id}"
@@ -55,11 +305,11 @@ class SocialMediaUploader:
                 "video_id": video_id,
                 "message": "Successfully uploaded to YouTube"
             }
-            
+        
         except Exception as e:
             logger.error(f"YouTube upload error: {e}")
             return {"status": "error", "message": f"YouTube upload failed: {str(e)}"}
-    
+
     def upload_to_tiktok(self, video_file: str, title: str, description: str) -> Dict[str, Any]:
         try:
             if not self.tiktok_token:
@@ -93,39 +343,103 @@ class SocialMediaUploader:
             logger.error(f"Instagram upload error: {e}")
             return {"status": "error", "message": f"Instagram upload failed: {str(e)}"}
     
-    def upload_to_platforms(self, video_files: Dict[str, str], title: str, 
-                           description: str, platforms: list) -> Dict[str, Dict[str, Any]]:
-        results = {}
-        
-        platform_format_map = {
-            "youtube": "16:9",
-            "tiktok": "9:16",
-            "facebook": "16:9",
-            "instagram": "1:1"
+    def _new_upload(self, generation_id: Optional[str], platform: str, video_file: Optional[str],
+                    title: str, description: str) -> Dict[str, Any]:
+        return {
+            "id": str(uuid.uuid4()),
+            "generation_id": generation_id,
+            "platform": platform,
+            "video_file": video_file,
+            "title": title,
+            "description": description,
+            "status": "queued",
+            "created_at": datetime.now().isoformat(),
+            "session_uri": None,
+            "bytes_sent": 0,
+            "total_bytes": None
         }
-        
+
+    def _run(self, upload: Dict[str, Any]) -> Dict[str, Any]:
+        platform = upload["platform"]
+        upload["status"] = "uploading"
+        upload["started_at"] = datetime.now().isoformat()
+        self._save(upload)
+        start = time.perf_counter()
+        bytes_before = upload.get("bytes_sent") or 0
+
+        if platform == "youtube":
+            result = self.upload_to_youtube(upload["video_file"], upload["title"], upload["description"],
+                                            upload=upload)
+        elif platform == "tiktok":
+            result = self.upload_to_tiktok(upload["video_file"], upload["title"], upload["description"])
+        elif platform == "facebook":
+            result = self.upload_to_facebook(upload["video_file"], upload["title"], upload["description"])
+        else:
+            result = self.upload_to_instagram(upload["video_file"], upload["title"], upload["description"])
+
+        upload.update({"status": result["status"], "result": result, "completed_at": datetime.now().isoformat()})
+        self._save(upload)
+        UPLOAD_SECONDS.observe(time.perf_counter() - start, platform=platform, status=result["status"])
+        count_bytes("out", "upload", (upload.get("bytes_sent") or 0) - bytes_before)
+        if self.on_complete:
+            try:
+                self.on_complete(dict(upload))
+            except Exception as e:
+                logger.error(f"Upload completion callback failed: {e}")
+        return result
+
+    def _submit(self, video_files: Dict[str, str], title: str, description: str, platforms: list,
+                generation_id: Optional[str]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Future]]:
+        uploads, futures = {}, {}
         for platform in platforms:
-            if platform not in platform_format_map:
-                results[platform] = {"status": "error", "message": f"Unsupported platform: {platform}"}
+            if platform not in PLATFORM_FORMATS:
+                uploads[platform] = {"status": "error", "message": f"Unsupported platform: {platform}"}
                 continue
             
-            required_format = platform_format_map[platform]
+            required_format = PLATFORM_FORMATS[platform]
             video_file = video_files.get(required_format)
             
             if not video_file or not os.path.exists(video_file):
-                results[platform] = {
+                uploads[platform] = {
                     "status": "error", 
                     "message": f"Video file not found for format {required_format}"
                 }
                 continue
             
-            if platform == "youtube":
-                results[platform] = self.upload_to_youtube(video_file, title, description)
-            elif platform == "tiktok":
-                results[platform] = self.upload_to_tiktok(video_file, title, description)
-            elif platform == "facebook":
-                results[platform] = self.upload_to_facebook(video_file, title, description)
-            elif platform == "instagram":
-                results[platform] = self.upload_to_instagram(video_file, title, description)
-        
+            upload = self._new_upload(generation_id, platform, video_file, title, description)
+            self._save(upload)
+            futures[platform] = self.executor.submit(self._run, dict(upload))
+            uploads[platform] = upload
+        return uploads, futures
+    
+    def start_uploads(self, video_files: Dict[str, str], title: str, description: str, platforms: list,
+                      generation_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Queue one background upload per platform and return their records (or the error for a platform
+        that cannot be uploaded); results arrive through ``on_complete``"""
+        return self._submit(video_files, title, description, platforms, generation_id)[0]
+    
+    def upload_to_platforms(self, video_files: Dict[str, str], title: str, 
+                           description: str, platforms: list,
+                           generation_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Upload to every platform concurrently and wait for all of them"""
+        results, futures = self._submit(video_files, title, description, platforms, generation_id)
+        for platform, future in futures.items():
+            results[platform] = future.result()
         return results
+    
+    def resume_pending(self) -> int:
+        """Continue the uploads a previous process left queued or half-sent; returns how many were resumed"""
+        if not self.store:
+            return 0
+        uploads = self.store.unfinished()
+        for upload in uploads:
+            logger.info(f"Resuming {upload['platform']} upload {upload['id']} at {upload.get('bytes_sent', 0)} bytes")
+            self.executor.submit(self._run, upload)
+        return len(uploads)
+
+    def shutdown(self):
+        with self._init_lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            # Unfinished uploads keep their session URI and resume on the next start
+            executor.shutdown(wait=False, cancel_futures=True)
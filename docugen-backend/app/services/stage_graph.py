@@ -0,0 +1,87 @@
+import time
+import logging
+import contextlib
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+class StageGraph:
+    """Runs named stages as soon as the stages they depend on have finished.
+
+    Each stage function is called with its dependencies' results as keyword
+    arguments, so independent stages (e.g. the description and the voiceover)
+    overlap on a thread pool. Per-stage timings are collected in ``timings``.
+    The first stage to raise stops anything not yet started, waits for the
+    stages already running (so none is still writing the generation's files
+    once it is marked failed) and its exception is re-raised from ``run``.
+    """
+
+    def __init__(self, on_event: Optional[Callable] = None):
+        self.on_event = on_event
+        self.timings: Dict[str, Dict[str, Any]] = {}
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._started = None
+
+    def add(self, name: str, fn: Callable, depends_on: Iterable[str] = (), report: bool = True):
+        depends_on = tuple(depends_on)
+        for dependency in depends_on:
+            if dependency not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'")
+        self._stages[name] = {"fn": fn, "depends_on": depends_on, "report": report}
+
+    def _emit(self, name: str, status: str, **data):
+        if self.on_event and self._stages.get(name, {}).get("report", True):
+            try:
+                self.on_event(name, status, **data)
+            except Exception as e:
+                logger.warning(f"Stage event callback failed for {name}: {e}")
+
+    def _run_stage(self, name: str, kwargs: Dict[str, Any]) -> Any:
+        with self.timed(name):
+            return self._stages[name]["fn"](**kwargs)
+
+    @contextlib.contextmanager
+    def timed(self, name: str):
+        """Time a block as a stage; also used for work that runs outside the graph"""
+        if self._started is None:
+            self._started = time.perf_counter()
+        self._emit(name, "started")
+        start = time.perf_counter()
+        timing = {"started_at": datetime.now().isoformat(),
+                  "offset_seconds": round(start - self._started, 3)}
+        self.timings[name] = timing
+        try:
+            yield
+        except Exception:
+            timing.update(seconds=round(time.perf_counter() - start, 3), status="failed")
+            self._emit(name, "failed", seconds=timing["seconds"])
+            raise
+        timing.update(seconds=round(time.perf_counter() - start, 3), status="completed")
+        self._emit(name, "completed", seconds=timing["seconds"])
+
+    def run(self) -> Dict[str, Any]:
+        self._started = time.perf_counter()
+        results: Dict[str, Any] = {}
+        pending = dict(self._stages)
+        running = {}
+        executor = ThreadPoolExecutor(max_workers=max(1, len(self._stages)), thread_name_prefix="stage")
+        try:
+            while pending or running:
+                for name in [n for n, s in pending.items() if all(d in results for d in s["depends_on"])]:
+                    kwargs = {d: results[d] for d in pending[name]["depends_on"]}
+                    running[executor.submit(self._run_stage, name, kwargs)] = name
+                    del pending[name]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name] = future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        return results
+
+    @property
+    def total_seconds(self) -> float:
+        return round(time.perf_counter() - self._started, 3) if self._started else 0.0
@@ -1,20 +1,258 @@
-import os
-import requests
-from PIL import Image, ImageDraw, ImageFont
-
+from __future__ import annotations
 
-from moviepy.editor import AudioFileClip, ImageClip, CompositeVideoClip
+import io
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import tempfile
 import logging
-from typing import List, Dict, Optional, Tuple
+from typing import TYPE_CHECKING, Callable, List, Dict, Optional, Tuple, Union
 import re
+from app.services.ffmpeg_renderer import encode_slideshow_ffmpeg
+from app.services.rate_limit import ProviderUnavailableError, RETRYABLE_STATUSES
+from app.services.metrics import stage, count_bytes
+
+# PIL, numpy, MoviePy and requests are imported where they are used: the API process only loads
+# them once a job needs them, and the media stack only ever loads in processes that render
+if TYPE_CHECKING:
+    import numpy as np
+    import requests
+    from PIL import Image
+    from moviepy.editor import AudioFileClip
 
 logger = logging.getLogger(__name__)
 
+def _resize_for_moviepy(img: Image.Image, target_width: int, target_height: int) -> np.ndarray:
+    """Resize with PIL and hand MoviePy a plain array to avoid PIL compatibility issues"""
+    import numpy as np
+    from PIL import Image
+
+    img_resized = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
+    return np.asarray(img_resized)
+
+def _encode_progress_logger(callback: Callable[[int], None], step: int = 5):
+    """A proglog logger that turns MoviePy's frame progress bar into whole-percent callbacks"""
+    import proglog
+
+    class _EncodeProgressLogger(proglog.ProgressBarLogger):
+        def __init__(self):
+            super().__init__()
+            self._last_percent = -step
+
+        def bars_callback(self, bar, attr, value, old_value=None):
+            if bar != 't' or attr != 'index':
+                return
+            total = self.bars[bar].get('total')
+            if not total:
+                return
+            percent = min(100, int(100 * value / total))
+            if percent >= self._last_percent + step or (percent == 100 and self._last_percent < 100):
+                self._last_percent = percent
+                callback(percent)
+
+    return _EncodeProgressLogger()
+
+def encode_slideshow(images: List[Image.Image], audio: Union[str, AudioFileClip], output_filename: str,
+                     width: int, height: int, temp_audiofile: str, threads: Optional[int] = None,
+                     progress: Optional[Callable[[int], None]] = None,
+                     duration: Optional[float] = None, fps: int = 24, preset: str = "medium",
+                     crf: Optional[int] = None) -> Optional[str]:
+    """Encode one aspect ratio; module level so render workers can run it in another process"""
+    from moviepy.editor import AudioFileClip, ImageClip, CompositeVideoClip
+
+    owns_audio = isinstance(audio, str)
+    audio_clip = AudioFileClip(audio) if owns_audio else audio
+    duration = duration or audio_clip.duration
+    
+    clips = []
+    image_duration = duration / len(images)
+    
+    for i, img in enumerate(images):
+        try:
+            frame = _resize_for_moviepy(img, width, height)
+            img_clip = ImageClip(frame, duration=image_duration)
+            
+            if i > 0:
+                img_clip = img_clip.crossfadein(0.5)
+            if i < len(images) - 1:
+                img_clip = img_clip.crossfadeout(0.5)
+            
+            img_clip = img_clip.set_start(i * image_duration)
+            clips.append(img_clip)
+            
+        except Exception as e:
+            logger.error(f"Error processing image {i} for {width}x{height}: {e}")
+            continue
+    
+    if not clips:
+        logger.error("No valid image clips created")
+        if owns_audio:
+            audio_clip.close()
+        return None
+    
+    video = CompositeVideoClip(clips, size=(width, height))
+    video = video.set_audio(audio_clip)
+    video = video.set_duration(duration)
+    
+    # moov atom first, so players can start (and seek with Range requests) before the download ends
+    ffmpeg_params = ["-movflags", "+faststart"]
+    if crf is not None:
+        ffmpeg_params.extend(["-crf", str(crf)])
+    try:
+        video.write_videofile(
+            output_filename,
+            fps=fps,
+            codec='libx264',
+            audio_codec='aac',
+            temp_audiofile=temp_audiofile,
+            remove_temp=True,
+            threads=threads,
+            preset=preset,
+            ffmpeg_params=ffmpeg_params,
+            verbose=False,
+            logger=_encode_progress_logger(progress) if progress else None
+        )
+    finally:
+        try:
+            video.close()
+            for clip in clips:
+                clip.close()
+            if owns_audio:
+                audio_clip.close()
+        except Exception as cleanup_error:
+            logger.warning(f"Error during video cleanup: {cleanup_error}")
+    
+    return output_filename
+
+RENDER_ENGINES = {
+    "moviepy": encode_slideshow,
+    "ffmpeg": encode_slideshow_ffmpeg,
+}
+
+FORMAT_DIMENSIONS = {
+    "16:9": (1920, 1080),
+    "9:16": (1080, 1920),
+    "1:1": (1080, 1080),
+}
+
+class RenderAssets:
+    """Images and audio resolved once and shared by every aspect ratio of a generation"""
+
+    def __init__(self, audio_file: str, images: List[Image.Image], bytes_downloaded: int = 0,
+                 duration: Optional[float] = None, library=None):
+        self.audio_file = audio_file
+        self.images = images
+        self.bytes_downloaded = bytes_downloaded
+        self.library = library
+        self._audio_clip = None
+        self._duration = duration
+        self._renditions: List[Image.Image] = []
+
+    @property
+    def audio_clip(self) -> AudioFileClip:
+        """Opened on first use; the ffmpeg engine and the render workers only need the path"""
+        if self._audio_clip is None:
+            from moviepy.editor import AudioFileClip
+
+            self._audio_clip = AudioFileClip(self.audio_file)
+        return self._audio_clip
+
+    @property
+    def duration(self) -> float:
+        if self._duration is None:
+            self._duration = self.audio_clip.duration
+        return self._duration
+
+    def images_for(self, size: Tuple[int, int]) -> List[Image.Image]:
+        """The slides for one render size, swapping in the library's pre-resized renditions where it has them"""
+        if not self.library or tuple(size) not in set(self.library.sizes.values()):
+            return self.images
+        images = []
+        for img in self.images:
+            library_id = img.info.get("library_id")
+            if library_id:
+                try:
+                    img = self.library.load(library_id, size)
+                    self._renditions.append(img)
+                except OSError as e:
+                    logger.warning(f"Missing {size[0]}x{size[1]} rendition of library image {library_id}: {e}")
+            images.append(img)
+        return images
+
+    def close(self):
+        if self._audio_clip is not None:
+            try:
+                self._audio_clip.close()
+            except Exception as e:
+                logger.warning(f"Error closing audio clip: {e}")
+            self._audio_clip = None
+        for img in self.images + self._renditions:
+            img.close()
+        self.images = []
+        self._renditions = []
+
 class VideoGenerator:
-    def __init__(self):
+    def __init__(self, scheduler=None, cache=None, limiter=None, artifacts=None, library=None, admission=None):
+        self.scheduler = scheduler
+        self.admission = admission
+        self.cache = cache
+        self.limiter = limiter
+        self.artifacts = artifacts
+        self.library = library
         self.pexels_api_key = os.getenv("PEXELS_API_KEY")
+        self.pexels_api_url = os.getenv("PEXELS_API_URL", "https://api.pexels.com/v1")
         self.temp_dir = "/tmp"
+        self.render_engine = os.getenv("RENDER_ENGINE", "moviepy")
+        if self.render_engine not in RENDER_ENGINES:
+            logger.warning(f"Unknown RENDER_ENGINE '{self.render_engine}', falling back to moviepy")
+            self.render_engine = "moviepy"
+        self.fetch_workers = int(os.getenv("IMAGE_FETCH_WORKERS", "8"))
+        # Draft previews: short side in pixels, frame rate and x264 settings traded for encode speed
+        self.draft_resolution = int(os.getenv("DRAFT_RESOLUTION", "480"))
+        self.draft_encode = {
+            "fps": int(os.getenv("DRAFT_FPS", "12")),
+            "preset": os.getenv("DRAFT_PRESET", "ultrafast"),
+            "crf": int(os.getenv("DRAFT_CRF", "30")),
+        }
+        self._session = None
+        self._fetch_executor = None
+        self._init_lock = threading.Lock()
+    
+    @property
+    def session(self) -> requests.Session:
+        """Keep-alive connection pool shared by every search and download, retrying dropped connections"""
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        with self._init_lock:
+            if self._session is None:
+                # Only transport errors are retried here; throttling and 5xx on searches are left to the
+                # Pexels ProviderLimiter so they back off process-wide and count towards its circuit
+                retry = Retry(total=3, backoff_factor=0.5, status=0, respect_retry_after_header=False,
+                              allowed_methods=("GET",))
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.fetch_workers, max_retries=retry)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+    
+    @property
+    def fetch_executor(self) -> ThreadPoolExecutor:
+        with self._init_lock:
+            if self._fetch_executor is None:
+                self._fetch_executor = ThreadPoolExecutor(max_workers=self.fetch_workers,
+                                                          thread_name_prefix="image-fetch")
+            return self._fetch_executor
+    
+    def _http_get(self, url: str, **kwargs) -> requests.Response:
+        start = time.perf_counter()
+        response = self.session.get(url, **kwargs)
+        logger.info(f"GET {url} -> {response.status_code} in {(time.perf_counter() - start) * 1000:.0f}ms "
+                    f"({len(response.content)} bytes)")
+        return response
         
     def extract_keywords(self, script: str, topic: str) -> List[str]:
         keywords = [topic]
@@ -25,41 +263,64 @@ class VideoGenerator:
         common_words = ['business', 'technology', 'nature', 'people', 'city', 'office']
         keywords.extend(common_words[:3])
         
-        return list(set(keywords))[:8]
+        return list(dict.fromkeys(keywords))[:8]
     
     def fetch_stock_footage(self, keywords: List[str], count: int = 10) -> List[Dict]:
+        """Local library matches first; Pexels only tops up a short set, and placeholders fill an empty one"""
+        search_keywords = keywords[:3]
+        images = self.library.search(search_keywords, count) if self.library else []
+        if len(images) >= count:
+            return images
+        
         if not self.pexels_api_key:
+            if images:
+                return images
             logger.warning("Pexels API key not found, using placeholder images")
             return self._get_placeholder_images(count)
         
         headers = {"Authorization": self.pexels_api_key}
-        images = []
+        url = f"{self.pexels_api_url}/search"
         
-        for keyword in keywords[:3]:
+        def search(keyword: str) -> Optional[Dict]:
+            params = {
+                "query": keyword,
+                "per_page": min(count // len(search_keywords) + 1, 15),
+                "orientation": "landscape"
+            }
             try:
-                url = f"https://api.pexels.com/v1/search"
-                params = {
-                    "query": keyword,
-                    "per_page": min(count // len(keywords[:3]) + 1, 15),
-                    "orientation": "landscape"
-                }
-                
-                response = requests.get(url, headers=headers, params=params, timeout=10)
-                if response.status_code == 200:
-                    data = response.json()
-                    for photo in data.get("photos", []):
-                        images.append({
-                            "url": photo["src"]["large"],
-                            "keyword": keyword,
-                            "id": photo["id"]
-                        })
-                        if len(images) >= count:
-                            break
-                            
+                return self._search_pexels(url, headers, params)
+            except ProviderUnavailableError:
+                raise
             except Exception as e:
                 logger.error(f"Error fetching images for keyword '{keyword}': {e}")
+                return None
+        
+        try:
+            searches = list(self.fetch_executor.map(search, search_keywords))
+        except ProviderUnavailableError as e:
+            if not images:
+                logger.warning(f"Pexels unavailable ({e}); using placeholder images")
+                return self._get_placeholder_images(count)
+            logger.warning(f"Pexels unavailable ({e}); using {len(images)} library images")
+            return images
+        
+        seen_ids = set()
+        for keyword, data in zip(search_keywords, searches):
+            if data is None:
                 continue
-                
+            for photo in data.get("photos", []):
+                # Photos already in the library were matched above when their tags fit
+                if photo["id"] in seen_ids or (self.library and self.library.has_source("pexels", photo["id"])):
+                    continue
+                seen_ids.add(photo["id"])
+                images.append({
+                    "url": photo["src"]["large"],
+                    "keyword": keyword,
+                    "id": photo["id"],
+                    "alt": photo.get("alt", "")
+                })
+                if len(images) >= count:
+                    break
             if len(images) >= count:
                 break
         
@@ -68,6 +329,27 @@ class VideoGenerator:
             
         return images[:count]
     
+    def _search_pexels(self, url: str, headers: Dict, params: Dict) -> Optional[Dict]:
+        cache_key = f"pexels-search:{params['query'].lower()}|{params['per_page']}|{params['orientation']}"
+        if self.cache:
+            cached = self.cache.get_json(cache_key)
+            if cached is not None:
+                return cached
+        
+        def request() -> requests.Response:
+            response = self._http_get(url, headers=headers, params=params, timeout=10)
+            if response.status_code in RETRYABLE_STATUSES:
+                response.raise_for_status()
+            return response
+        
+        response = self.limiter.call(request) if self.limiter else request()
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        if self.cache:
+            self.cache.put_json(cache_key, data, ttl=self.cache.search_ttl)
+        return data
+    
     def _get_placeholder_images(self, count: int) -> List[Dict]:
         placeholder_images = []
         colors = [(52, 152, 219), (155, 89, 182), (46, 204, 113), (241, 196, 15), (231, 76, 60)]
@@ -83,26 +365,28 @@ class VideoGenerator:
         
         return placeholder_images
     
-    def download_image(self, image_data: Dict) -> Optional[str]:
-        try:
-            if image_data["url"].startswith("placeholder_"):
-                return self._create_placeholder_image(image_data)
-            
-            response = requests.get(image_data["url"], timeout=15)
-            if response.status_code == 200:
-                filename = f"{self.temp_dir}/image_{image_data['id']}.jpg"
-                with open(filename, 'wb') as f:
-                    f.write(response.content)
-                return filename
-        except Exception as e:
-            logger.error(f"Error downloading image {image_data['id']}: {e}")
-            return self._create_placeholder_image(image_data)
-        
-        return None
+    def fetch_image_bytes(self, image_data: Dict) -> Optional[bytes]:
+        """Encoded photo bytes from the cache or the network; never touches the filesystem otherwise"""
+        cache_key = f"pexels-photo:{image_data['id']}"
+        content = self.cache.get_bytes(cache_key) if self.cache else None
+        if content is None:
+            response = self._http_get(image_data["url"], timeout=15)
+            if response.status_code != 200:
+                return None
+            content = response.content
+            image_data["bytes_downloaded"] = len(content)
+            if self.cache:
+                self.cache.put_bytes(cache_key, content)
+            if self.library:
+                self.library.add_later(content, [image_data.get("keyword"), image_data.get("alt")], "pexels",
+                                       image_data["id"])
+        return content
     
-    def _create_placeholder_image(self, image_data: Dict) -> str:
+    def _create_placeholder_image(self, image_data: Dict) -> Image.Image:
+        from PIL import Image, ImageDraw, ImageFont
+
         width, height = 1920, 1080
-        color = image_data.get("color", (100, 100, 100))
+        color = tuple(image_data.get("color", (100, 100, 100)))
         
         img = Image.new('RGB', (width, height), color)
         draw = ImageDraw.Draw(img)
@@ -121,164 +405,202 @@ class VideoGenerator:
         y = (height - text_height) // 2
         
         draw.text((x, y), text, fill=(255, 255, 255), font=font)
+        return img
+    
+    def find_images(self, script: str, topic: str, metrics=None) -> List[Dict]:
+        """The image set for a script: Pexels photos (or placeholders) as JSON-safe dicts for ``resolve_images``"""
+        keywords = self.extract_keywords(script, topic)
+        with stage("image_search", metrics):
+            images_data = self.fetch_stock_footage(keywords, count=8)
+        return [{key: img_data[key] for key in ("url", "keyword", "id", "color", "alt") if key in img_data}
+                for img_data in images_data]
+    
+    def resolve_images(self, script: str, topic: str,
+                       progress_callback: Optional[Callable] = None, metrics=None,
+                       images_data: Optional[List[Dict]] = None) -> Tuple[List[Image.Image], int]:
+        """Search, download and decode the slide images; needs only the script, not the audio.
+
+        Pass ``images_data`` from ``find_images`` to skip the search and load that exact set
+        (from the asset cache when it is still there). ``metrics`` (a ``JobMetrics``) receives
+        the search, per-image download and decode timings.
+        """
+        report = progress_callback or (lambda *args, **kwargs: None)
+        report("images", "started")
+        if images_data is None:
+            images_data = self.find_images(script, topic, metrics)
+        images_data = [dict(img_data) for img_data in images_data]
+        
+        start = time.perf_counter()
+        loaded = list(self.fetch_executor.map(lambda img_data: self._load_image(img_data, metrics), images_data))
+        images = [img for img in loaded if img is not None]
+        bytes_downloaded = sum(img_data.get("bytes_downloaded", 0) for img_data in images_data)
+        count_bytes("in", "image", bytes_downloaded, metrics)
+        logger.info(f"Fetched {len(images)} images in {(time.perf_counter() - start) * 1000:.0f}ms")
         
-        filename = f"{self.temp_dir}/placeholder_{image_data['id']}.jpg"
-        img.save(filename, 'JPEG')
-        return filename
+        report("images", "completed", count=len(images), bytes_downloaded=bytes_downloaded)
+        return images, bytes_downloaded
     
-    def create_video(self, audio_file: str, script: str, topic: str, generation_id: str, 
-                    aspect_ratio: str = "16:9") -> Optional[str]:
-            
+    def prepare_assets(self, audio_file: str, script: str, topic: str,
+                       progress_callback: Optional[Callable] = None,
+                       resolved_images: Optional[Tuple[List[Image.Image], int]] = None,
+                       audio_duration: Optional[float] = None, metrics=None) -> Optional[RenderAssets]:
+        """Download and decode the image set once for all formats; ``audio_duration`` saves probing the audio"""
+        images, bytes_downloaded = resolved_images or self.resolve_images(script, topic, progress_callback, metrics)
+        if not images:
+            logger.error("No images available for video creation")
+            return None
+        
+        return RenderAssets(audio_file, images, bytes_downloaded, duration=audio_duration, library=self.library)
+    
+    def _load_image(self, img_data: Dict, metrics=None) -> Optional[Image.Image]:
+        """Download and decode once, in memory; formats resize from this image straight into arrays"""
+        from PIL import Image
+
+        if img_data["url"].startswith("placeholder_"):
+            return self._create_placeholder_image(img_data)
+        if img_data["url"].startswith("library:"):
+            try:
+                with stage("image_decode", metrics):
+                    return self.library.load(img_data["url"][len("library:"):])
+            except Exception as e:
+                logger.error(f"Error loading library image {img_data['id']}: {e}")
+                return self._create_placeholder_image(img_data)
         try:
-            keywords = self.extract_keywords(script, topic)
-            images_data = self.fetch_stock_footage(keywords, count=8)
-            
-            image_files = []
-            for img_data in images_data:
-                img_file = self.download_image(img_data)
-                if img_file:
-                    image_files.append(img_file)
-            
-            if not image_files:
-                logger.error("No images available for video creation")
+            with stage("image_download", metrics):
+                content = self.fetch_image_bytes(img_data)
+            if content is None:
                 return None
-            
-            audio_clip = AudioFileClip(audio_file)
-            duration = audio_clip.duration
-            
-            dimensions = self._get_dimensions(aspect_ratio)
-            if not dimensions:
-                logger.error(f"Invalid aspect ratio: {aspect_ratio}")
-                return None
-            
-            width, height = dimensions
-            
-            clips = []
-            image_duration = duration / len(image_files)
-            
-            for i, img_file in enumerate(image_files):
-                try:
-                    processed_img_file = self._preprocess_image_for_moviepy(img_file, width, height)
-                    if not processed_img_file:
-                        logger.error(f"Failed to preprocess image {img_file}")
-                        continue
-                    
-                    img_clip = ImageClip(processed_img_file, duration=image_duration)
-                    
-                    if i > 0:
-                        img_clip = img_clip.crossfadein(0.5)
-                    if i < len(image_files) - 1:
-                        img_clip = img_clip.crossfadeout(0.5)
-                    
-                    img_clip = img_clip.set_start(i * image_duration)
-                    clips.append(img_clip)
-                    
-                except Exception as e:
-                    logger.error(f"Error processing image {img_file}: {e}")
-                    continue
-            
-            if not clips:
-                logger.error("No valid image clips created")
-                return None
-            
-            video = CompositeVideoClip(clips, size=(width, height))
-            video = video.set_audio(audio_clip)
-            video = video.set_duration(duration)
-            
-            output_filename = f"{self.temp_dir}/video_{generation_id}_{aspect_ratio.replace(':', 'x')}.mp4"
-            
-            video.write_videofile(
-                output_filename,
-                fps=24,
-                codec='libx264',
-                audio_codec='aac',
-                temp_audiofile=f"{self.temp_dir}/temp_audio_{generation_id}.m4a",
-                remove_temp=True,
-                verbose=False,
-                logger=None
-            )
-            
-            try:
-                video.close()
-                audio_clip.close()
-                for clip in clips:
-                    clip.close()
-            except Exception as cleanup_error:
-                logger.warning(f"Error during video cleanup: {cleanup_error}")
-            finally:
-                for img_file in image_files:
-                    try:
-                        if os.path.exists(img_file):
-                            os.remove(img_file)
-                    except Exception as file_cleanup_error:
-                        logger.warning(f"Failed to cleanup temp file {img_file}: {file_cleanup_error}")
-                
-                processed_files = []
-                try:
-                    processed_files = [f for f in os.listdir(self.temp_dir) if f.startswith("processed_") and generation_id in f]
-                except:
-                    pass
-                
-                for pf in processed_files:
-                    try:
-                        os.remove(os.path.join(self.temp_dir, pf))
-                    except:
-                        pass
-            
-            return output_filename
-            
+            with stage("image_decode", metrics):
+                img = Image.open(io.BytesIO(content))
+                img.load()
+                return img if img.mode == 'RGB' else img.convert('RGB')
         except Exception as e:
-            logger.error(f"Error creating video: {e}")
-            
-            try:
-                for img_file in image_files:
-                    if os.path.exists(img_file):
-                        os.remove(img_file)
-            except:
-                pass
-            
+            logger.error(f"Error loading image {img_data['id']}: {e}")
+            return self._create_placeholder_image(img_data)
+    
+    def render_format(self, assets: RenderAssets, generation_id: str, 
+                      aspect_ratio: str = "16:9", progress_callback: Optional[Callable] = None,
+                      render_engine: Optional[str] = None, metrics=None, draft: bool = False) -> Optional[str]:
+        dimensions = self._get_dimensions(aspect_ratio, draft)
+        if not dimensions:
+            logger.error(f"Invalid aspect ratio: {aspect_ratio}")
             return None
+        
+        width, height = dimensions
+        output_filename, temp_audiofile = self._output_paths(generation_id, aspect_ratio, draft)
+        progress = None
+        if progress_callback:
+            progress = lambda percent: progress_callback("encode", "progress", format=aspect_ratio, percent=percent)
+        render_engine = render_engine or self.render_engine
+        encode = RENDER_ENGINES[render_engine]
+        # MoviePy muxes from a clip; ffmpeg reads the file itself and only needs the duration
+        audio = assets.audio_clip if encode is encode_slideshow else assets.audio_file
+        images = assets.images if draft else assets.images_for(dimensions)
+        ticket = None
+        if self.admission:
+            # In-process encodes share the render budget with the pool's, but can't be measured apart to calibrate it
+            on_wait = None
+            if progress_callback:
+                on_wait = lambda cost: progress_callback("encode", "waiting", format=aspect_ratio, **cost.as_dict())
+            ticket = self.admission.acquire(
+                self.admission.estimate(render_engine, width, height, len(images), assets.duration), on_wait)
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            result = encode(images, audio, output_filename, width, height, temp_audiofile,
+                            progress=progress, duration=assets.duration, **(self.draft_encode if draft else {}))
+        finally:
+            if ticket:
+                self.admission.release(ticket)
+        if metrics:
+            # In-process encodes only see this thread's CPU; the render workers also count ffmpeg's
+            usage = {"seconds": time.perf_counter() - start, "cpu_seconds": time.thread_time() - cpu_start}
+            format_ratio = f"{aspect_ratio}-draft" if draft else aspect_ratio
+            metrics.add_encode(format_ratio, render_engine, usage)
+        if result:
+            count_bytes("out", "video", os.path.getsize(result), metrics)
+        return result
     
-    def _get_dimensions(self, aspect_ratio: str) -> Optional[Tuple[int, int]]:
-        dimensions_map = {
-            "16:9": (1920, 1080),
-            "9:16": (1080, 1920),
-            "1:1": (1080, 1080)
-        }
-        return dimensions_map.get(aspect_ratio)
+    def _output_paths(self, generation_id: str, aspect_ratio: str, draft: bool = False) -> Tuple[str, str]:
+        suffix = aspect_ratio.replace(':', 'x')
+        name = "preview" if draft else "video"
+        if self.artifacts:
+            return (self.artifacts.path(generation_id, f"{name}_{suffix}.mp4"),
+                    self.artifacts.path(generation_id, f"temp_audio_{name}_{suffix}.m4a"))
+        return (f"{self.temp_dir}/{name}_{generation_id}_{suffix}.mp4",
+                f"{self.temp_dir}/temp_audio_{name}_{generation_id}_{suffix}.m4a")
     
-    def _preprocess_image_for_moviepy(self, img_file: str, target_width: int, target_height: int) -> Optional[str]:
-        """Preprocess image to avoid PIL compatibility issues with MoviePy"""
+    def create_video(self, audio_file: str, script: str, topic: str, generation_id: str, 
+                    aspect_ratio: str = "16:9", render_engine: Optional[str] = None) -> Optional[str]:
         try:
-            with Image.open(img_file) as img:
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Resize image to target dimensions
-                img_resized = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
-                
-                processed_filename = f"{self.temp_dir}/processed_{os.path.basename(img_file)}"
-                img_resized.save(processed_filename, 'JPEG', quality=95)
-                
-                return processed_filename
-                
+            assets = self.prepare_assets(audio_file, script, topic)
+            if not assets:
+                return None
         except Exception as e:
-            logger.error(f"Error preprocessing image {img_file}: {e}")
+            logger.error(f"Error preparing assets: {e}")
             return None
+        
+        try:
+            return self.render_format(assets, generation_id, aspect_ratio, render_engine=render_engine)
+        except Exception as e:
+            logger.error(f"Error creating video: {e}")
+            return None
+        finally:
+            assets.close()
+    
+    def _get_dimensions(self, aspect_ratio: str, draft: bool = False) -> Optional[Tuple[int, int]]:
+        dimensions = FORMAT_DIMENSIONS.get(aspect_ratio)
+        if dimensions and draft:
+            # Scaled so the short side is draft_resolution, rounded to even sizes for yuv420p
+            scale = self.draft_resolution / min(dimensions)
+            dimensions = tuple(int(round(side * scale / 2)) * 2 for side in dimensions)
+        return dimensions
     
     def generate_multiple_formats(self, audio_file: str, script: str, topic: str, 
-                                 generation_id: str, formats: Optional[List[str]] = None) -> Dict[str, Optional[str]]:
+                                 generation_id: str, formats: Optional[List[str]] = None,
+                                 progress_callback: Optional[Callable] = None,
+                                 render_engine: Optional[str] = None,
+                                 resolved_images: Optional[Tuple[List[Image.Image], int]] = None,
+                                 audio_duration: Optional[float] = None, metrics=None,
+                                 draft: bool = False) -> Dict[str, Optional[str]]:
+        """Render every format; ``progress_callback(stage, status, **data)`` receives image and encode progress.
+
+        Pass ``resolved_images`` from ``resolve_images`` when the images were fetched ahead of the audio,
+        ``audio_duration`` when the voice stage already knows it, and ``metrics`` to collect encode usage.
+        ``draft`` renders low resolution previews (``preview_*.mp4``) in this process instead of the
+        render pool, so a preview never waits behind full-quality encodes.
+        """
+        render_engine = render_engine or self.render_engine
         if formats is None:
             formats = ["16:9", "9:16", "1:1"]
         
-        results = {}
-        for format_ratio in formats:
-            try:
-                video_file = self.create_video(audio_file, script, topic, generation_id, format_ratio)
-                results[format_ratio] = video_file
-                logger.info(f"Created video for {format_ratio}: {video_file}")
-            except Exception as e:
-                logger.error(f"Failed to create video for {format_ratio}: {e}")
-                results[format_ratio] = None
+        results = {format_ratio: None for format_ratio in formats}
+        try:
+            assets = self.prepare_assets(audio_file, script, topic, progress_callback, resolved_images,
+                                         audio_duration, metrics)
+        except Exception as e:
+            logger.error(f"Failed to prepare assets for {generation_id}: {e}")
+            return results
+        if not assets:
+            return results
+        
+        logger.info(f"Resolved {len(assets.images)} images ({assets.bytes_downloaded} bytes) for {generation_id}")
+        try:
+            if self.scheduler and not draft:
+                return self.scheduler.render_formats(self, assets, generation_id, formats, progress_callback,
+                                                     render_engine=render_engine, metrics=metrics)
+            
+            for format_ratio in formats:
+                try:
+                    video_file = self.render_format(assets, generation_id, format_ratio, progress_callback,
+                                                    render_engine=render_engine, metrics=metrics, draft=draft)
+                    results[format_ratio] = video_file
+                    logger.info(f"Created video for {format_ratio}: {video_file}")
+                    if progress_callback:
+                        progress_callback("encode", "completed" if video_file else "failed", format=format_ratio)
+                except Exception as e:
+                    logger.error(f"Failed to create video for {format_ratio}: {e}")
+                    results[format_ratio] = None
+        finally:
+            assets.close()
         
         return results
@@ -0,0 +1,302 @@
+import os
+import re
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 25: [11025, 12000, 8000]}
+
+def parse_frame_header(header: bytes) -> Optional[Tuple[int, int, int]]:
+    """``(frame_length, samples, sample_rate)`` for an MPEG audio frame header, or None if it isn't one"""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version_bits = (header[1] >> 3) & 0x03
+    layer_bits = (header[1] >> 1) & 0x03
+    bitrate_index = (header[2] >> 4) & 0x0F
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    version = {0: 25, 2: 2, 3: 1}[version_bits]
+    layer = 4 - layer_bits
+    bitrate = _BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    if layer == 3 and version != 1:
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate
+    return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+
+def _id3v2_length(data: bytes) -> int:
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+def _is_info_frame(frame: bytes) -> bool:
+    # LAME/Xing header frames carry no audio and describe the whole file's frame count
+    return b"Xing" in frame[:64] or b"Info" in frame[:64] or b"VBRI" in frame[:64]
+
+class Mp3DurationTracker:
+    """Counts MP3 frames as bytes arrive so the duration is known without decoding or reopening the file"""
+
+    def __init__(self):
+        self.duration = 0.0
+        self.frames = 0
+        self.bytes_seen = 0
+        self._buffer = bytearray()
+        self._skip = 0
+        self._started = False
+        self._checked_info = False
+
+    def feed(self, chunk: bytes) -> float:
+        self.bytes_seen += len(chunk)
+        if self._skip:
+            consumed = min(self._skip, len(chunk))
+            self._skip -= consumed
+            chunk = chunk[consumed:]
+        self._buffer.extend(chunk)
+
+        buf = self._buffer
+        pos = 0
+        if not self._started:
+            if len(buf) < 10:
+                return self.duration
+            tag_length = _id3v2_length(bytes(buf[:10]))
+            self._started = True
+            if tag_length:
+                if tag_length > len(buf):
+                    self._skip = tag_length - len(buf)
+                    buf.clear()
+                    return self.duration
+                pos = tag_length
+
+        while len(buf) - pos >= 4:
+            parsed = parse_frame_header(bytes(buf[pos:pos + 4]))
+            if not parsed:
+                pos += 1
+                continue
+            frame_length, samples, sample_rate = parsed
+            is_audio = True
+            if not self._checked_info:
+                if len(buf) - pos < min(frame_length, 64):
+                    break
+                self._checked_info = True
+                is_audio = not _is_info_frame(bytes(buf[pos:pos + 64]))
+            if is_audio:
+                self.frames += 1
+                self.duration += samples / sample_rate
+            if frame_length > len(buf) - pos:
+                self._skip = frame_length - (len(buf) - pos)
+                pos = len(buf)
+                break
+            pos += frame_length
+        del buf[:pos]
+        return self.duration
+
+def mp3_frames(data: bytes) -> Tuple[bytes, float]:
+    """Just the audio frames of an MP3 (no ID3 tags or Xing/Info frame) and their duration.
+
+    Frame-level output from several encodes with the same settings can be
+    concatenated into one valid stream without re-encoding.
+    """
+    pos = _id3v2_length(data)
+    end = len(data) - 128 if data[-128:-125] == b"TAG" else len(data)
+    out = bytearray()
+    duration = 0.0
+    first = True
+    while end - pos >= 4:
+        parsed = parse_frame_header(data[pos:pos + 4])
+        if not parsed:
+            pos += 1
+            continue
+        frame_length, samples, sample_rate = parsed
+        frame = data[pos:pos + frame_length]
+        if not (first and _is_info_frame(frame)):
+            out.extend(frame)
+            duration += samples / sample_rate
+        first = False
+        pos += frame_length
+    return bytes(out), duration
+
+def without_leading_tags(chunks: Iterable[bytes]) -> Iterable[bytes]:
+    """Pass an MP3 stream through minus its leading ID3 tag and Xing/Info frame, so more frames can follow it"""
+    buf = bytearray()
+    skip = 0
+    for chunk in chunks:
+        if buf is None:
+            if skip:
+                # The rest of an info frame that straddled chunks
+                consumed = min(skip, len(chunk))
+                skip -= consumed
+                chunk = chunk[consumed:]
+            if chunk:
+                yield chunk
+            continue
+        buf.extend(chunk)
+        if len(buf) < 10:
+            continue
+        start = _id3v2_length(bytes(buf[:10]))
+        if len(buf) < start + 4:
+            continue
+        parsed = parse_frame_header(bytes(buf[start:start + 4]))
+        if parsed and len(buf) < start + min(parsed[0], 64):
+            continue
+        if parsed and _is_info_frame(bytes(buf[start:start + 64])):
+            start += parsed[0]
+        skip = max(0, start - len(buf))
+        head, buf = bytes(buf[start:]), None
+        if head:
+            yield head
+    if buf:
+        yield bytes(buf)
+
+def split_script(script: str, max_chars: int = 1200) -> List[str]:
+    """Split on paragraphs, packing short ones together and breaking long ones at sentence ends"""
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", script) if p.strip()]
+    pieces = []
+    for paragraph in paragraphs:
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        current = ""
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                pieces.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}".strip()
+        if current:
+            pieces.append(current)
+
+    segments = []
+    for piece in pieces:
+        if segments and len(segments[-1]) + len(piece) + 2 <= max_chars:
+            segments[-1] = f"{segments[-1]}\n\n{piece}"
+        else:
+            segments.append(piece)
+    return segments
+
+def stream_to_file(chunks: Iterable[bytes], path: str,
+                   on_progress: Optional[Callable[[int, float], None]] = None) -> float:
+    """Write TTS chunks as they arrive and return the audio duration tracked from frame headers"""
+    tracker = Mp3DurationTracker()
+    with open(path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+            tracker.feed(chunk)
+            if on_progress:
+                on_progress(tracker.bytes_seen, tracker.duration)
+    return tracker.duration
+
+class VoiceSynthesizer:
+    """Turns a script into one MP3, synthesizing paragraphs in parallel on long scripts.
+
+    The first segment is streamed straight to disk so audio starts landing
+    immediately; later segments are collected in memory and appended, in
+    order, as frame-level MP3 (same voice and output format, so no re-encode).
+    """
+
+    def __init__(self, client, voice_id: str = "JBFqnCBsd6RMkjVDRZzb", model_id: str = "eleven_multilingual_v2",
+                 output_format: str = "mp3_44100_128", max_parallel: Optional[int] = None,
+                 segment_chars: Optional[int] = None, limiter=None):
+        self.client = client
+        self.limiter = limiter
+        self.voice_id = voice_id
+        self.model_id = model_id
+        self.output_format = output_format
+        self.max_parallel = max_parallel or int(os.getenv("TTS_MAX_PARALLEL", "4"))
+        self.segment_chars = segment_chars or int(os.getenv("TTS_SEGMENT_CHARS", "1200"))
+        # CPU the segment threads used in the last ``synthesize`` (the calling thread's own isn't included)
+        self.worker_cpu_seconds = 0.0
+
+    def _convert(self, text: str, previous_text: Optional[str], next_text: Optional[str]) -> Iterable[bytes]:
+        kwargs = {}
+        # Neighbouring text keeps intonation continuous across segment boundaries
+        if previous_text:
+            kwargs["previous_text"] = previous_text
+        if next_text:
+            kwargs["next_text"] = next_text
+        return self.client.text_to_speech.convert(
+            text=text,
+            voice_id=self.voice_id,
+            model_id=self.model_id,
+            output_format=self.output_format,
+            **kwargs
+        )
+
+    def _guarded(self, fn: Callable):
+        # The SDK only sends the request once iteration starts, so each attempt re-runs the whole segment
+        return self.limiter.call(fn) if self.limiter else fn()
+
+    def synthesize(self, script: str, path: str,
+                   on_progress: Optional[Callable[[int, float], None]] = None) -> float:
+        """Write the voiceover to ``path`` and return its duration in seconds"""
+        segments = split_script(script, self.segment_chars) or [script]
+        start = time.perf_counter()
+        self.worker_cpu_seconds = 0.0
+        if len(segments) == 1:
+            duration = self._guarded(lambda: stream_to_file(self._convert(segments[0], None, None), path, on_progress))
+            logger.info(f"Synthesized {duration:.1f}s of audio in {time.perf_counter() - start:.1f}s")
+            return duration
+
+        lock = threading.Lock()
+
+        def fetch(index: int) -> bytes:
+            previous_text = segments[index - 1] if index > 0 else None
+            next_text = segments[index + 1] if index + 1 < len(segments) else None
+            cpu_start = time.thread_time()
+            try:
+                return self._guarded(lambda: b"".join(self._convert(segments[index], previous_text, next_text)))
+            finally:
+                with lock:
+                    self.worker_cpu_seconds += time.thread_time() - cpu_start
+
+        totals = {"bytes": 0, "seconds": 0.0}
+
+        def report(extra_bytes: int, extra_seconds: float):
+            if on_progress:
+                with lock:
+                    totals["bytes"] += extra_bytes
+                    totals["seconds"] += extra_seconds
+                    on_progress(totals["bytes"], totals["seconds"])
+
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel, len(segments) - 1) or 1,
+                                thread_name_prefix="tts") as executor:
+            futures = [executor.submit(fetch, i) for i in range(1, len(segments))]
+
+            first_seen = {"bytes": 0, "seconds": 0.0}
+
+            def first_progress(bytes_seen: int, seconds: float):
+                report(bytes_seen - first_seen["bytes"], seconds - first_seen["seconds"])
+                first_seen.update(bytes=bytes_seen, seconds=seconds)
+
+            # The first segment's Xing/Info frame would claim its frame count for the whole file
+            duration = self._guarded(lambda: stream_to_file(
+                without_leading_tags(self._convert(segments[0], None, segments[1])), path, first_progress
+            ))
+            with open(path, "ab") as f:
+                for future in futures:
+                    frames, segment_duration = mp3_frames(future.result())
+                    f.write(frames)
+                    duration += segment_duration
+                    report(len(frames), segment_duration)
+
+        logger.info(f"Synthesized {duration:.1f}s of audio from {len(segments)} segments "
+                    f"in {time.perf_counter() - start:.1f}s")
+        return duration
@@ -0,0 +1,79 @@
+"""Render worker: runs generation jobs from the shared job queue.
+
+Start any number of these, on one machine or several, next to an API started
+with APP_ROLE=api. All of them need the same JOB_QUEUE_BACKEND=sqlite
+settings and the same databases and ARTIFACTS_DIR on shared storage.
+
+The API's /metrics only covers the API process in that setup; encode, stage
+and job metrics live in the workers, which serve their own /metrics on
+WORKER_METRICS_PORT (or --metrics-port) for Prometheus to scrape.
+
+    python -m app.worker [--threads 2] [--metrics-port 9101]
+"""
+
+import os
+import signal
+import argparse
+import threading
+
+os.environ.setdefault("JOB_QUEUE_BACKEND", "sqlite")
+os.environ["APP_ROLE"] = "worker"
+
+def serve_metrics(port: int):
+    """Serve this worker's metrics registry on /metrics from a background thread"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from app.services.metrics import REGISTRY
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="worker-metrics", daemon=True).start()
+    return server
+
+def run(threads=None, metrics_port=None):
+    from app import main
+
+    if metrics_port is None:
+        metrics_port = int(os.getenv("WORKER_METRICS_PORT", "0"))
+    metrics_server = serve_metrics(metrics_port) if metrics_port else None
+    if threads:
+        main.job_queue.workers = threads
+    stopping = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stopping.set())
+
+    main.job_queue.start()
+    stopping.wait()
+    main.logger.info(f"Worker {main.job_queue.worker_id} stopping")
+    # Unfinished jobs go back to the queue for another worker
+    main.job_queue.shutdown()
+    main.event_log.shutdown()
+    main.social_uploader.shutdown()
+    main.image_library.shutdown()
+    main.render_scheduler.shutdown()
+    main.generation_store.close()
+    if metrics_server:
+        metrics_server.shutdown()
+
+def cli():
+    parser = argparse.ArgumentParser(description="Run generation jobs from the shared job queue")
+    parser.add_argument("--threads", type=int, help="Jobs run at once by this worker (default: JOB_WORKERS)")
+    parser.add_argument("--metrics-port", type=int, help="Serve /metrics on this port (default: WORKER_METRICS_PORT)")
+    args = parser.parse_args()
+    run(args.threads, args.metrics_port)
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,157 @@
+"""Concurrent download load test against a real uvicorn server: full MP4 downloads,
+random Range seeks and conditional revalidations, with server memory.
+
+Each --chunk-kb value runs a fresh server, so Starlette's 64 KiB default can be
+compared with DOWNLOAD_CHUNK_KB.
+
+Run from docugen-backend/: python -m benchmarks.bench_downloads [--clients 50] [--size-mb 64]
+"""
+
+import os
+import sys
+import time
+import random
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from app.services.generation_store import GenerationStore
+from benchmarks.common import Timer, report
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_memory_mb(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS", "VmHWM")):
+                name, value = line.split(":")
+                values[name] = round(int(value.split()[0]) / 1024, 1)
+    return values
+
+
+def percentiles(samples) -> dict:
+    samples = sorted(samples)
+    return {"p50_ms": round(statistics.median(samples) * 1000, 1),
+            "p95_ms": round(samples[int(len(samples) * 0.95) - 1] * 1000, 1)}
+
+
+def run_clients(clients: int, requests_per_client: int, fn) -> dict:
+    local = threading.local()
+    latencies, total_bytes = [], [0]
+    lock = threading.Lock()
+
+    def worker(_):
+        session = getattr(local, "session", None) or requests.Session()
+        local.session = session
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            received = fn(session)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                total_bytes[0] += received
+
+    with Timer() as t, ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(worker, range(clients)))
+    return {"requests": len(latencies), "seconds": round(t.elapsed, 2),
+            "throughput_mb_s": round(total_bytes[0] / t.elapsed / 1024 / 1024, 1),
+            "requests_per_second": round(len(latencies) / t.elapsed, 1), **percentiles(latencies)}
+
+
+def bench_server(chunk_kb: int, env: dict, url: str, size: int, args) -> dict:
+    port = int(url.rsplit(":", 1)[1].split("/")[0])
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env={**env, "DOWNLOAD_CHUNK_KB": str(chunk_kb)}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        for _ in range(100):
+            try:
+                head = requests.head(url, timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        etag = head.headers["etag"]
+        baseline = server_memory_mb(server.pid)
+
+        def full(session):
+            received = 0
+            with session.get(url, stream=True) as response:
+                for chunk in response.iter_content(1024 * 1024):
+                    received += len(chunk)
+            assert received == size, received
+            return received
+
+        def seek(session):
+            start = random.randrange(0, size - args.range_kb * 1024)
+            response = session.get(url, headers={"Range": f"bytes={start}-{start + args.range_kb * 1024 - 1}"})
+            assert response.status_code == 206, response.status_code
+            return len(response.content)
+
+        def revalidate(session):
+            response = session.get(url, headers={"If-None-Match": etag})
+            assert response.status_code == 304, response.status_code
+            return 0
+
+        results = {
+            "full_downloads": run_clients(args.clients, args.full_per_client, full),
+            "range_seeks": run_clients(args.clients, args.seeks_per_client, seek),
+            "conditional_304": run_clients(args.clients, args.seeks_per_client, revalidate),
+        }
+        memory = server_memory_mb(server.pid)
+        results["server_rss_mb"] = {"before": baseline["VmRSS"], "peak": memory["VmHWM"], "after": memory["VmRSS"]}
+        return results
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--full-per-client", type=int, default=2)
+    parser.add_argument("--seeks-per-client", type=int, default=20)
+    parser.add_argument("--range-kb", type=int, default=512)
+    parser.add_argument("--chunk-kb", type=int, nargs="+", default=[64, 256])
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="docugen_bench_")
+    video_path = os.path.join(work_dir, "video.mp4")
+    size = args.size_mb * 1024 * 1024
+    with open(video_path, "wb") as f:
+        for _ in range(args.size_mb):
+            f.write(os.urandom(1024 * 1024))
+
+    db_path = os.path.join(work_dir, "generations.db")
+    store = GenerationStore(db_path)
+    store.insert({"id": "bench", "topic": "Bench", "niche": "bench", "status": "completed",
+                  "created_at": datetime.now().isoformat(), "video_files": {"16:9": video_path}})
+    store.close()
+
+    env = {**os.environ, "GENERATIONS_DB_PATH": db_path,
+           "BATCHES_DB_PATH": os.path.join(work_dir, "batches.db"),
+           "LLM_CACHE_PATH": os.path.join(work_dir, "llm.db"),
+           "ASSET_CACHE_DIR": os.path.join(work_dir, "cache")}
+    url = f"http://127.0.0.1:{free_port()}/api/download-video/bench/16x9"
+
+    results = {"clients": args.clients, "file_mb": args.size_mb}
+    for chunk_kb in args.chunk_kb:
+        results[f"chunk_{chunk_kb}kb"] = bench_server(chunk_kb, env, url, size, args)
+    report("downloads", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Per-image time and peak RSS: the in-memory image pipeline vs the old /tmp round trip.
+
+The legacy path is reproduced here as it was: write the download to /tmp, reopen it,
+LANCZOS-resize, re-encode to processed_*.jpg at quality 95, then let ImageClip decode
+that file again, once per format. Each mode runs in its own process so ru_maxrss is
+not shared.
+
+Run from docugen-backend/: python -m benchmarks.bench_image_pipeline [--images 8]
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+FORMATS = [(1920, 1080), (1080, 1920), (1080, 1080)]
+
+
+def run_legacy(generator, images_data):
+    from PIL import Image
+    from moviepy.editor import ImageClip
+
+    for img_data in images_data:
+        content = generator.fetch_image_bytes(img_data)
+        filename = f"{generator.temp_dir}/image_{img_data['id']}.jpg"
+        with open(filename, "wb") as f:
+            f.write(content)
+        for width, height in FORMATS:
+            with Image.open(filename) as img:
+                if img.mode != "RGB":
+                    img = img.convert("RGB")
+                resized = img.resize((width, height), Image.Resampling.LANCZOS)
+                processed = f"{generator.temp_dir}/processed_{width}x{height}_{os.path.basename(filename)}"
+                resized.save(processed, "JPEG", quality=95)
+            clip = ImageClip(processed, duration=1)
+            clip.get_frame(0)
+            clip.close()
+            os.remove(processed)
+        os.remove(filename)
+
+
+def run_memory(generator, images_data):
+    from moviepy.editor import ImageClip
+    from app.services.video_generator import _resize_for_moviepy
+
+    images = [generator._load_image(img_data) for img_data in images_data]
+    for img in images:
+        for width, height in FORMATS:
+            clip = ImageClip(_resize_for_moviepy(img, width, height), duration=1)
+            clip.get_frame(0)
+            clip.close()
+
+
+def child(mode: str, api_url: str, count: int):
+    os.environ["PEXELS_API_KEY"] = "bench"
+    os.environ["PEXELS_API_URL"] = api_url
+    from app.services.video_generator import VideoGenerator
+    from benchmarks.common import Timer, peak_rss_mb
+
+    generator = VideoGenerator()
+    generator.temp_dir = tempfile.mkdtemp(prefix="docugen_bench_")
+    images_data = generator.fetch_stock_footage(["Forest", "River", "Mountain"], count=count)
+    baseline_rss = peak_rss_mb()
+    with Timer() as t:
+        (run_legacy if mode == "legacy" else run_memory)(generator, images_data)
+    print(json.dumps({
+        "images": len(images_data),
+        "formats": len(FORMATS),
+        "ms_per_image": round(t.elapsed * 1000 / len(images_data), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "peak_rss_growth_mb": round(peak_rss_mb() - baseline_rss, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--mode", choices=["legacy", "memory"])
+    parser.add_argument("--api-url")
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args.mode, args.api_url, args.images)
+        return
+
+    from tests.fakes import FakePexelsServer
+    from benchmarks.common import report
+
+    results = {}
+    with FakePexelsServer() as pexels:
+        for mode in ("legacy", "memory"):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_image_pipeline", "--mode", mode,
+                 "--api-url", pexels.api_url, "--images", str(args.images)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+    report("image_pipeline", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Wall-clock time and bytes downloaded for 1 vs 3 formats, shared assets vs per-format renders.
+
+Run from docugen-backend/: python -m benchmarks.bench_multiformat [--seconds 10]
+"""
+
+import os
+import argparse
+import tempfile
+
+from tests.fakes import FakePexelsServer
+from benchmarks.common import Timer, make_synthetic_audio, report
+
+FORMATS = ["16:9", "9:16", "1:1"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with FakePexelsServer() as pexels:
+        os.environ["PEXELS_API_KEY"] = "bench"
+        os.environ["PEXELS_API_URL"] = pexels.api_url
+        from app.services.video_generator import VideoGenerator
+
+        generator = VideoGenerator()
+        generator.temp_dir = tempfile.mkdtemp(prefix="docugen_bench_")
+        audio_file = make_synthetic_audio(os.path.join(generator.temp_dir, "audio.mp3"), args.seconds)
+        script = "Ancient Rome built roads across Europe. Engineers used Concrete and Stone."
+
+        results = {}
+        runs = [
+            ("shared_1_format", lambda: generator.generate_multiple_formats(audio_file, script, "Rome", "b1", FORMATS[:1])),
+            ("shared_3_formats", lambda: generator.generate_multiple_formats(audio_file, script, "Rome", "b3", FORMATS)),
+            ("per_format_3_formats", lambda: {
+                f: generator.create_video(audio_file, script, "Rome", "bp", f) for f in FORMATS
+            }),
+        ]
+        for name, run in runs:
+            pexels.reset_counters()
+            with Timer() as t:
+                outputs = run()
+            results[name] = {
+                "wall_seconds": round(t.elapsed, 2),
+                "bytes_downloaded": pexels.bytes_served,
+                "http_requests": pexels.requests,
+                "videos": sum(1 for v in outputs.values() if v),
+            }
+
+    report("multiformat", results)
+
+
+if __name__ == "__main__":
+    main()
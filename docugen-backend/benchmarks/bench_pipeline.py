@@ -0,0 +1,222 @@
+"""End-to-end generation throughput, offline: stub OpenAI and ElevenLabs, placeholder images (or the fake Pexels).
+
+For every audio length x format set x concurrency level, runs ``jobs`` full
+``process_video_generation`` jobs (script, description, voice, images,
+encodes) and reports videos/hour, per-stage latency from the jobs' metrics,
+peak memory and disk used. ``--mode create_video`` instead times
+``VideoGenerator.create_video`` on a synthetic track, one format at a time.
+
+The stub script is sized so the voiceover comes out at the requested length.
+Results are printed and, with --output, written as JSON with the run's
+environment so runs can be compared over time.
+
+Run from docugen-backend/:
+    python -m benchmarks.bench_pipeline [--durations 30 120 600] [--formats 16:9 16:9,9:16,1:1]
+                                        [--concurrency 1 2] [--engine ffmpeg] [--output results.json]
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List
+
+from benchmarks.common import Timer, make_synthetic_audio, peak_rss_mb, report
+
+WORDS_PER_SECOND = 2.5
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    return {"p50": round(statistics.median(values), 3), "max": round(values[-1], 3), "n": len(values)}
+
+
+def stage_latencies(generations: List[Dict]) -> Dict[str, Dict[str, float]]:
+    """Per-stage wall seconds across jobs; image downloads and decodes are summed per job"""
+    samples: Dict[str, List[float]] = {}
+    for generation in generations:
+        metrics = generation.get("metrics") or {}
+        for name, stage in metrics.get("stages", {}).items():
+            samples.setdefault(name, []).append(stage["seconds"])
+        for format_ratio, encode in metrics.get("encodes", {}).items():
+            samples.setdefault(f"encode_{format_ratio}", []).append(encode["seconds"])
+        if generation.get("total_seconds"):
+            samples.setdefault("total", []).append(generation["total_seconds"])
+    return {name: summarize(values) for name, values in sorted(samples.items())}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_pipeline(args, work_dir: str) -> Dict:
+    import app.main as main_module
+    from tests.fakes import FakeElevenLabs, FakeOpenAI
+    from app.services.llm_cache import CachedChatClient
+
+    main_module.elevenlabs_client = FakeElevenLabs(words_per_second=WORDS_PER_SECOND)
+    # Warm the render pool so worker spawn cost is not charged to the first job
+    main_module.render_scheduler.submit(os.getpid).result()
+
+    results = {}
+    for seconds in args.durations:
+        # Topics are unique per job, so every job misses the LLM cache and runs the stub script stage
+        main_module.openai_client = CachedChatClient(FakeOpenAI(script_words=int(seconds * WORDS_PER_SECOND)),
+                                                     main_module.llm_cache)
+        for formats in args.formats:
+            for concurrency in args.concurrency:
+                jobs = max(args.jobs, concurrency)
+                generation_ids = []
+                for i in range(jobs):
+                    request = main_module.VideoGenerationRequest(
+                        topic=f"Bench {seconds}s {'+'.join(formats)} x{concurrency} #{i}", niche="history",
+                        aspect_ratios=formats, render_engine=args.engine
+                    )
+                    generation = main_module._new_generation(request, "generating")
+                    main_module.generation_store.insert(generation)
+                    generation_ids.append(generation["id"])
+
+                def run(generation_id, request_formats=formats):
+                    generation = main_module.generation_store.get(generation_id)
+                    main_module.process_video_generation(generation_id, generation["topic"], "history",
+                                                         request_formats, [], args.engine)
+
+                with Timer() as t, ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    list(executor.map(run, generation_ids))
+
+                generations = [main_module.generation_store.get(g) for g in generation_ids]
+                completed = [g for g in generations if g["status"] == "completed"]
+                videos = sum(1 for g in completed for path in g.get("video_files", {}).values() if path)
+                metrics = [g.get("metrics") or {} for g in generations]
+                results[f"{seconds}s|{','.join(formats)}|x{concurrency}"] = {
+                    "audio_seconds": seconds,
+                    "formats": formats,
+                    "concurrency": concurrency,
+                    "jobs": jobs,
+                    "completed": len(completed),
+                    "wall_seconds": round(t.elapsed, 2),
+                    "generations_per_hour": round(len(completed) / t.elapsed * 3600, 2),
+                    "videos_per_hour": round(videos / t.elapsed * 3600, 2),
+                    "stages": stage_latencies(completed),
+                    "cpu_seconds_per_job": summarize([m.get("cpu_seconds", 0) for m in metrics]),
+                    "process_peak_rss_mb": max(m.get("process_peak_rss_mb", 0) for m in metrics),
+                    "encode_peak_rss_mb": max(m.get("encode_peak_rss_mb", 0) for m in metrics),
+                    "disk_mb_per_job": round(statistics.mean(g.get("artifact_bytes", 0) for g in generations)
+                                             / 1024 / 1024, 2),
+                    "errors": sorted({g.get("error_type") for g in generations if g["status"] != "completed"}
+                                     - {None}),
+                }
+                for generation_id in generation_ids:
+                    main_module.artifact_store.remove(generation_id)
+
+    main_module.render_scheduler.shutdown()
+    return results
+
+
+def run_create_video(args, work_dir: str) -> Dict:
+    from app.services.artifacts import ArtifactStore
+    from app.services.video_generator import VideoGenerator
+
+    generator = VideoGenerator(artifacts=ArtifactStore(os.path.join(work_dir, "artifacts")))
+    script = "Ancient Rome built Roads across Europe. Engineers used Concrete and Stone."
+    results = {}
+    for seconds in args.durations:
+        audio_file = make_synthetic_audio(os.path.join(work_dir, f"audio_{seconds}.mp3"), seconds)
+        for formats in args.formats:
+            for format_ratio in formats:
+                generation_id = f"create-{seconds}-{format_ratio.replace(':', 'x')}"
+                with Timer() as t:
+                    output = generator.create_video(audio_file, script, "Rome", generation_id, format_ratio,
+                                                    render_engine=args.engine)
+                results[f"{seconds}s|{format_ratio}"] = {
+                    "audio_seconds": seconds,
+                    "format": format_ratio,
+                    "wall_seconds": round(t.elapsed, 2),
+                    "videos_per_hour": round(3600 / t.elapsed, 2) if output else 0,
+                    "realtime_factor": round(seconds / t.elapsed, 2),
+                    "output_mb": round(os.path.getsize(output) / 1024 / 1024, 2) if output else None,
+                    "process_peak_rss_mb": round(peak_rss_mb(), 1),
+                }
+                generator.artifacts.remove(generation_id)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["pipeline", "create_video"], default="pipeline")
+    parser.add_argument("--durations", type=int, nargs="+", default=[30, 120, 600],
+                        help="Voiceover lengths in seconds")
+    parser.add_argument("--formats", nargs="+", default=["16:9", "16:9,9:16,1:1"],
+                        help="Comma-separated format sets, one run per set")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--jobs", type=int, default=0, help="Jobs per level (default: the concurrency)")
+    parser.add_argument("--engine", choices=["ffmpeg", "moviepy"], default="ffmpeg")
+    parser.add_argument("--fake-pexels", action="store_true",
+                        help="Fetch images from the local fake Pexels server instead of placeholders")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory")
+    args = parser.parse_args()
+    args.formats = [formats.split(",") for formats in args.formats]
+
+    work_dir = tempfile.mkdtemp(prefix="docugen_bench_")
+    os.environ.update({
+        "GENERATIONS_DB_PATH": os.path.join(work_dir, "generations.db"),
+        "BATCHES_DB_PATH": os.path.join(work_dir, "batches.db"),
+        "SOCIAL_UPLOADS_DB_PATH": os.path.join(work_dir, "uploads.db"),
+        "LLM_CACHE_PATH": os.path.join(work_dir, "llm.db"),
+        "ASSET_CACHE_DIR": os.path.join(work_dir, "cache"),
+        "IMAGE_LIBRARY_DIR": os.path.join(work_dir, "library"),
+        "ARTIFACTS_DIR": os.path.join(work_dir, "artifacts"),
+    })
+    # Empty rather than unset so a local .env cannot switch the run to the real Pexels API
+    os.environ["PEXELS_API_KEY"] = ""
+
+    pexels = None
+    if args.fake_pexels:
+        from tests.fakes import FakePexelsServer
+        pexels = FakePexelsServer().start()
+        os.environ.update({"PEXELS_API_KEY": "bench", "PEXELS_API_URL": pexels.api_url})
+
+    try:
+        with Timer() as t:
+            runs = run_pipeline(args, work_dir) if args.mode == "pipeline" else run_create_video(args, work_dir)
+    finally:
+        if pexels:
+            pexels.stop()
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        "environment": {
+            "timestamp": datetime.now().isoformat(),
+            "git_revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "render_max_workers": os.getenv("RENDER_MAX_WORKERS") or os.cpu_count(),
+            "engine": args.engine,
+            "images": "fake_pexels" if args.fake_pexels else "placeholder",
+        },
+        "mode": args.mode,
+        "total_seconds": round(t.elapsed, 2),
+        "runs": runs,
+    }
+    report("pipeline", results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "pipeline", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Encode time of the MoviePy compositor vs the direct ffmpeg pipe, per aspect ratio.
+
+Placeholder images and a synthetic audio track, rendered in-process one format at a time.
+Run from docugen-backend/: python -m benchmarks.bench_render_engines [--seconds 10]
+"""
+
+import os
+import argparse
+import tempfile
+
+from benchmarks.common import Timer, make_synthetic_audio, report
+
+FORMATS = ["16:9", "9:16", "1:1"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--formats", default=",".join(FORMATS))
+    args = parser.parse_args()
+
+    os.environ.pop("PEXELS_API_KEY", None)
+    from app.services.video_generator import VideoGenerator
+
+    generator = VideoGenerator()
+    generator.temp_dir = tempfile.mkdtemp(prefix="docugen_bench_")
+    audio_file = make_synthetic_audio(os.path.join(generator.temp_dir, "audio.mp3"), args.seconds)
+    assets = generator.prepare_assets(audio_file, "Mountains and Glaciers", "Alps")
+
+    results = {"audio_seconds": args.seconds, "images": len(assets.images)}
+    try:
+        for format_ratio in args.formats.split(","):
+            timings = {}
+            for engine in ("moviepy", "ffmpeg"):
+                with Timer() as t:
+                    output = generator.render_format(assets, f"{engine}", format_ratio, render_engine=engine)
+                timings[engine] = {"encode_seconds": round(t.elapsed, 2),
+                                   "output_bytes": os.path.getsize(output) if output else None}
+            timings["speedup"] = round(timings["moviepy"]["encode_seconds"] / timings["ffmpeg"]["encode_seconds"], 2)
+            results[format_ratio] = timings
+    finally:
+        assets.close()
+
+    report("render_engines", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Sequential in-process encodes vs the process-pool RenderScheduler.
+
+Uses placeholder images and a synthetic audio track, so no network is needed.
+Run from docugen-backend/: python -m benchmarks.bench_render_scheduler [--seconds 10] [--workers N]
+"""
+
+import os
+import argparse
+import tempfile
+
+from benchmarks.common import Timer, make_synthetic_audio, report
+
+FORMATS = ["16:9", "9:16", "1:1"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--threads", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.pop("PEXELS_API_KEY", None)
+    from app.services.video_generator import VideoGenerator
+    from app.services.render_scheduler import RenderScheduler
+
+    temp_dir = tempfile.mkdtemp(prefix="docugen_bench_")
+    audio_file = make_synthetic_audio(os.path.join(temp_dir, "audio.mp3"), args.seconds)
+    script = "Deep Oceans hide Whales and Coral."
+
+    scheduler = RenderScheduler(max_workers=args.workers or None, threads_per_encode=args.threads or None)
+    sequential = VideoGenerator()
+    parallel = VideoGenerator(scheduler=scheduler)
+    for generator in (sequential, parallel):
+        generator.temp_dir = temp_dir
+
+    # Start the pool before timing so worker spawn cost is not counted per job
+    scheduler.submit(os.getpid).result()
+
+    results = {"cpu_count": os.cpu_count(), "workers": scheduler.max_workers,
+               "threads_per_encode": scheduler.threads_per_encode}
+    for name, generator in (("sequential", sequential), ("process_pool", parallel)):
+        with Timer() as t:
+            outputs = generator.generate_multiple_formats(audio_file, script, "Oceans", name, FORMATS)
+        results[name] = {"wall_seconds": round(t.elapsed, 2),
+                         "videos": sum(1 for v in outputs.values() if v)}
+
+    results["speedup"] = round(results["sequential"]["wall_seconds"] / results["process_pool"]["wall_seconds"], 2)
+    scheduler.shutdown()
+    report("render_scheduler", results)
+
+
+if __name__ == "__main__":
+    main()
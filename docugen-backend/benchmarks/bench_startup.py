@@ -0,0 +1,171 @@
+"""Cold start of an API-only process: import time, time to first /healthz and resident memory.
+
+Every run starts a fresh interpreter with empty stores in a scratch directory
+and provider keys set, so a client built at import time would be paid for
+here. Reports the median and worst of --runs for:
+
+- ``import``: ``import app.main`` alone, and which heavy modules it loaded
+- ``healthz``: ``uvicorn app.main:app`` launch to the first 200 from /healthz,
+  and the server's RSS at that point
+
+and checks them against --target-healthz-seconds and --target-rss-mb.
+
+Run from docugen-backend/:
+    python -m benchmarks.bench_startup [--runs 5] [--target-healthz-seconds 1.5] [--target-rss-mb 90]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+from typing import Dict, List
+
+from benchmarks.common import report
+from benchmarks.bench_pipeline import git_revision
+
+# Modules the API process should not need before it serves a request
+HEAVY_MODULES = ("numpy", "PIL.Image", "moviepy.editor", "proglog", "openai", "elevenlabs",
+                 "google.auth", "googleapiclient", "requests")
+
+IMPORT_PROBE = f"""
+import sys, json, time, resource
+start = time.perf_counter()
+import app.main
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": seconds,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_modules": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+
+def healthz_ok(port: int) -> bool:
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.5) as s:
+            s.sendall(b"GET /healthz HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+            return s.recv(64).startswith(b"HTTP/1.1 200")
+    except OSError:
+        return False
+
+
+def time_interpreter(env: Dict[str, str]) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], env=env, check=True)
+    return time.perf_counter() - start
+
+
+def time_import(env: Dict[str, str]) -> Dict:
+    output = subprocess.run([sys.executable, "-c", IMPORT_PROBE], env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def time_healthz(env: Dict[str, str], timeout: float = 60.0) -> Dict:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while not healthz_ok(port):
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with {server.returncode} before answering /healthz")
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError("No /healthz response")
+            time.sleep(0.005)
+        return {"seconds": time.perf_counter() - start, "rss_mb": rss_mb(server.pid)}
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {"p50": round(statistics.median(values), 3), "max": round(max(values), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-healthz-seconds", type=float, default=1.5)
+    parser.add_argument("--target-rss-mb", type=float, default=90)
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="docugen_bench_")
+    env = {**os.environ, "PYTHONPATH": os.getcwd(),
+           "GENERATIONS_DB_PATH": os.path.join(work_dir, "generations.db"),
+           "BATCHES_DB_PATH": os.path.join(work_dir, "batches.db"),
+           "SOCIAL_UPLOADS_DB_PATH": os.path.join(work_dir, "uploads.db"),
+           "LLM_CACHE_PATH": os.path.join(work_dir, "llm.db"),
+           "ASSET_CACHE_DIR": os.path.join(work_dir, "cache"),
+           "ARTIFACTS_DIR": os.path.join(work_dir, "artifacts"),
+           "IMAGE_LIBRARY_DIR": os.path.join(work_dir, "library"),
+           # Configured but never called: startup must not build (or import) the SDK clients
+           "OPENAI_API_KEY": "bench", "ELEVENLABS_API_KEY": "bench"}
+
+    try:
+        interpreter, imports, healthz = [], [], []
+        for _ in range(args.runs):
+            interpreter.append(time_interpreter(env))
+            imports.append(time_import(env))
+            healthz.append(time_healthz(env))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    healthz_seconds = summarize([run["seconds"] for run in healthz])
+    healthz_rss = summarize([run["rss_mb"] for run in healthz])
+    results = {
+        "environment": {
+            "timestamp": datetime.now().isoformat(),
+            "git_revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "runs": args.runs,
+        "interpreter_seconds": summarize(interpreter),
+        "import": {
+            "seconds": summarize([run["seconds"] for run in imports]),
+            "rss_mb": summarize([run["rss_mb"] for run in imports]),
+            "heavy_modules": sorted({m for run in imports for m in run["heavy_modules"]}),
+        },
+        "healthz": {"seconds": healthz_seconds, "rss_mb": healthz_rss},
+        "targets": {
+            "healthz_seconds": args.target_healthz_seconds,
+            "rss_mb": args.target_rss_mb,
+            "met": healthz_seconds["max"] <= args.target_healthz_seconds and healthz_rss["max"] <= args.target_rss_mb,
+        },
+    }
+    report("startup", results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "startup", "results": results}, f, indent=2)
+    if not results["targets"]["met"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
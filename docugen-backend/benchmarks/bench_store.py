@@ -0,0 +1,74 @@
+"""Lookup, update and listing latency of GenerationStore at 100k generations,
+against the linear scan over a list that it replaced.
+
+Run from docugen-backend/: python -m benchmarks.bench_store [--count 100000]
+"""
+
+import os
+import uuid
+import random
+import argparse
+import tempfile
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from app.services.generation_store import GenerationStore
+from benchmarks.common import Timer, report
+
+
+def latency_us(fn, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {"p50_us": round(statistics.median(samples), 2),
+            "p99_us": round(samples[int(len(samples) * 0.99) - 1], 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=2_000)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="docugen_bench_"), "generations.db")
+    store = GenerationStore(db_path)
+    start = datetime(2025, 1, 1)
+    records = [{
+        "id": str(uuid.uuid4()),
+        "topic": f"Topic {i}",
+        "niche": random.choice(["history", "science", "nature"]),
+        "status": "completed",
+        "created_at": (start + timedelta(seconds=i)).isoformat(),
+        "script": "lorem ipsum " * 150,
+    } for i in range(args.count)]
+
+    with Timer() as t:
+        for record in records:
+            store.insert(record)
+    results = {"count": args.count, "insert_per_second": round(args.count / t.elapsed)}
+
+    sample_ids = [(random.choice(records)["id"],) for _ in range(args.lookups)]
+    results["store_get"] = latency_us(store.get, sample_ids)
+    results["store_update"] = latency_us(lambda i: store.update(i, {"status": "completed"}), sample_ids[:500])
+    results["store_list_50"] = latency_us(lambda: store.list(limit=50), [()] * 200)
+
+    as_list = list(reversed(records))
+    scan = lambda i: next((g for g in as_list if g["id"] == i), None)
+    results["list_scan_get"] = latency_us(scan, sample_ids[:200])
+
+    store.close()
+    with Timer() as t:
+        reopened = GenerationStore(db_path)
+    results["reload_seconds"] = round(t.elapsed, 2)
+    results["reloaded_count"] = len(reopened)
+    reopened.close()
+
+    report("generation_store", results)
+
+
+if __name__ == "__main__":
+    main()
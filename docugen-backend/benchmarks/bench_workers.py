@@ -0,0 +1,200 @@
+"""Distributed render workers on one box: throughput, and recovery when a worker dies mid-job.
+
+Starts --workers ``app.worker`` processes (stub OpenAI and ElevenLabs,
+placeholder images) sharing a scratch directory's databases and artifacts,
+then acts as an APP_ROLE=api process: queues --jobs generations and waits
+for them. With --kill-after, the worker running the oldest job at that point
+is SIGKILLed together with its render pool and ffmpeg (a node going away); its
+jobs must finish on the others once their lease (--lease seconds) runs out.
+
+Reports generations/hour, which worker finished each job, how many jobs were
+reassigned, whether every video is readable through the API's artifact paths,
+and whether progress events from the workers reached this process's broker.
+
+Run from docugen-backend/:
+    python -m benchmarks.bench_workers [--workers 3] [--jobs 6] [--seconds 20] [--kill-after 8] [--lease 5]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import sqlite3
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import Dict, List
+
+from benchmarks.common import Timer, report
+from benchmarks.bench_pipeline import WORDS_PER_SECOND, git_revision
+
+
+def run_worker(args):
+    """One worker process: the real worker loop with offline providers"""
+    import app.worker
+    from app import main
+    from tests.fakes import FakeElevenLabs, FakeOpenAI
+    from app.services.llm_cache import CachedChatClient
+
+    main.elevenlabs_client = FakeElevenLabs(words_per_second=WORDS_PER_SECOND)
+    main.openai_client = CachedChatClient(FakeOpenAI(script_words=int(args.seconds * WORDS_PER_SECOND)),
+                                          main.llm_cache)
+    app.worker.run(args.threads)
+
+
+def start_workers(args, env: Dict[str, str], log_dir: str) -> List[subprocess.Popen]:
+    workers = []
+    for i in range(args.workers):
+        log = open(os.path.join(log_dir, f"worker_{i}.log"), "w")
+        workers.append(subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.bench_workers", "--worker", "--threads", str(args.threads),
+             "--seconds", str(args.seconds)],
+            env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True
+        ))
+    return workers
+
+
+def kill_busiest(jobs_db: str, workers: List[subprocess.Popen]) -> Dict:
+    """SIGKILL the process group of the worker holding the oldest running job"""
+    with sqlite3.connect(jobs_db) as db:
+        row = db.execute("SELECT job_id, worker FROM jobs WHERE status = 'running' ORDER BY started_at LIMIT 1").fetchone()
+    if not row:
+        return {}
+    job_id, worker = row
+    pid = int(worker.split(":")[1])
+    for process in workers:
+        if process.pid == pid:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+            return {"worker": worker, "job_id": job_id}
+    return {}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=3, help="Worker processes")
+    parser.add_argument("--threads", type=int, default=1, help="Jobs each worker runs at once")
+    parser.add_argument("--jobs", type=int, default=6)
+    parser.add_argument("--seconds", type=int, default=20, help="Voiceover length per job")
+    parser.add_argument("--formats", default="16:9", help="Comma-separated formats per job")
+    parser.add_argument("--engine", choices=["ffmpeg", "moviepy"], default="ffmpeg")
+    parser.add_argument("--kill-after", type=float, default=0,
+                        help="Seconds after queueing to kill the worker running the oldest job (0: never)")
+    parser.add_argument("--lease", type=float, default=5, help="JOB_LEASE_SECONDS for the run")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return run_worker(args)
+
+    work_dir = tempfile.mkdtemp(prefix="docugen_bench_")
+    jobs_db = os.path.join(work_dir, "jobs.db")
+    os.environ.update({
+        "GENERATIONS_DB_PATH": os.path.join(work_dir, "generations.db"),
+        "BATCHES_DB_PATH": os.path.join(work_dir, "batches.db"),
+        "SOCIAL_UPLOADS_DB_PATH": os.path.join(work_dir, "uploads.db"),
+        "LLM_CACHE_PATH": os.path.join(work_dir, "llm.db"),
+        "ASSET_CACHE_DIR": os.path.join(work_dir, "cache"),
+        "IMAGE_LIBRARY_DIR": os.path.join(work_dir, "library"),
+        "ARTIFACTS_DIR": os.path.join(work_dir, "artifacts"),
+        "JOB_QUEUE_BACKEND": "sqlite",
+        "JOB_QUEUE_DB_PATH": jobs_db,
+        "JOB_LEASE_SECONDS": str(args.lease),
+        "JOB_POLL_SECONDS": "0.2",
+        "RENDER_MAX_WORKERS": os.getenv("RENDER_MAX_WORKERS") or str(max(1, (os.cpu_count() or 1) // args.workers)),
+        "PEXELS_API_KEY": "",
+        "PYTHONPATH": os.getcwd(),
+    })
+    workers = start_workers(args, dict(os.environ), work_dir)
+
+    os.environ["APP_ROLE"] = "api"
+    from app import main as api
+    from app.services.progress import TERMINAL_STAGES
+
+    api.event_log.follow(api.progress_broker)
+    formats = args.formats.split(",")
+    killed = {}
+    try:
+        generation_ids = []
+        with Timer() as t:
+            for i in range(args.jobs):
+                request = api.VideoGenerationRequest(topic=f"Workers bench #{i}", niche="history",
+                                                     aspect_ratios=formats, render_engine=args.engine)
+                generation = api._new_generation(request, "generating")
+                api.generation_store.insert(generation)
+                api.job_queue.submit(generation["id"], api.process_video_generation, generation["id"],
+                                     request.topic, request.niche, formats, [], args.engine, False)
+                generation_ids.append(generation["id"])
+
+            deadline = time.monotonic() + args.timeout
+            while time.monotonic() < deadline:
+                if args.kill_after and not killed and t.start + args.kill_after <= time.perf_counter():
+                    killed = kill_busiest(jobs_db, workers) or {"worker": None}
+                statuses = [api.generation_store.get(g)["status"] for g in generation_ids]
+                if all(status in TERMINAL_STAGES for status in statuses):
+                    break
+                time.sleep(0.2)
+
+        generations = [api.generation_store.get(g) for g in generation_ids]
+        with sqlite3.connect(jobs_db) as db:
+            jobs = db.execute("SELECT job_id, worker, attempts, status, error FROM jobs").fetchall()
+        completed = [g for g in generations if g["status"] == "completed"]
+        readable = all(os.path.getsize(api._artifact_file(g["id"], path)) > 0
+                       for g in completed for path in g["video_files"].values() if path)
+        relayed = [g for g in generation_ids if (api.progress_broker.latest(g) or {}).get("stage") == "completed"]
+        by_worker: Dict[str, int] = {}
+        for _, worker, _, status, _ in jobs:
+            if status == "done":
+                by_worker[worker] = by_worker.get(worker, 0) + 1
+    finally:
+        for process in workers:
+            if process.poll() is None:
+                os.killpg(process.pid, signal.SIGTERM)
+        for process in workers:
+            process.wait()
+        api.event_log.shutdown()
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        "environment": {
+            "timestamp": datetime.now().isoformat(),
+            "git_revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "render_max_workers_per_worker": os.environ["RENDER_MAX_WORKERS"],
+            "engine": args.engine,
+        },
+        "workers": args.workers,
+        "threads_per_worker": args.threads,
+        "jobs": args.jobs,
+        "audio_seconds": args.seconds,
+        "formats": formats,
+        "lease_seconds": args.lease,
+        "wall_seconds": round(t.elapsed, 2),
+        "completed": len(completed),
+        "generations_per_hour": round(len(completed) / t.elapsed * 3600, 2),
+        "jobs_by_worker": by_worker,
+        "killed": killed or None,
+        "reassigned": sum(1 for _, _, attempts, _, _ in jobs if attempts > 1),
+        "videos_readable": readable,
+        "progress_relayed": len(relayed),
+        "errors": sorted({g.get("error_type") for g in generations if g["status"] != "completed"} - {None}),
+    }
+    report("workers", results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "workers", "results": results}, f, indent=2)
+    if len(completed) != args.jobs or not readable:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import os
+import json
+import time
+import resource
+from typing import Dict
+
+import numpy as np
+from moviepy.audio.AudioClip import AudioArrayClip
+
+
+def make_synthetic_audio(path: str, seconds: float, fps: int = 44100) -> str:
+    """Write a tone with a slow tremolo so the encoder sees real audio content"""
+    if os.path.exists(path):
+        return path
+    t = np.linspace(0, seconds, int(seconds * fps), endpoint=False)
+    tone = 0.2 * np.sin(2 * np.pi * 220 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 0.5 * t))
+    clip = AudioArrayClip(np.column_stack([tone, tone]), fps=fps)
+    clip.write_audiofile(path, fps=fps, codec="libmp3lame", verbose=False, logger=None)
+    clip.close()
+    return path
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def report(name: str, results: Dict):
+    print(json.dumps({"benchmark": name, "results": results}, indent=2))
@@ -0,0 +1,39 @@
+import os
+import tempfile
+
+import pytest
+
+from tests.fakes import FakePexelsServer, FakeUploadServer
+
+
+@pytest.fixture
+def pexels_server():
+    with FakePexelsServer(photos_per_query=3, image_size=(64, 48)) as server:
+        yield server
+
+
+@pytest.fixture
+def upload_server():
+    with FakeUploadServer() as server:
+        yield server
+
+
+@pytest.fixture(scope="session")
+def api():
+    """``app.main`` on scratch databases and directories, with no provider keys"""
+    root = tempfile.mkdtemp(prefix="docugen_test_")
+    os.environ.update({
+        "GENERATIONS_DB_PATH": os.path.join(root, "generations.db"),
+        "BATCHES_DB_PATH": os.path.join(root, "batches.db"),
+        "SOCIAL_UPLOADS_DB_PATH": os.path.join(root, "uploads.db"),
+        "LLM_CACHE_PATH": os.path.join(root, "llm.db"),
+        "ASSET_CACHE_DIR": os.path.join(root, "cache"),
+        "IMAGE_LIBRARY_DIR": os.path.join(root, "library"),
+        "ARTIFACTS_DIR": os.path.join(root, "artifacts"),
+        "OPENAI_API_KEY": "",
+        "ELEVENLABS_API_KEY": "",
+        "PEXELS_API_KEY": "",
+    })
+    from app import main
+
+    return main
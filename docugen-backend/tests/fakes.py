@@ -0,0 +1,380 @@
+"""Local stand-ins for the external services, used by benchmarks and tests"""
+
+import io
+import json
+import time
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from PIL import Image, ImageDraw
+
+logger = logging.getLogger(__name__)
+
+
+class FakePexelsServer:
+    """Serves the Pexels search API and photo downloads from localhost.
+
+    ``quota`` searches are allowed per ``quota_window`` seconds, reported in
+    ``X-Ratelimit-*`` headers like the real API, with 429 + ``Retry-After``
+    beyond it. ``fail_next`` injects outages for circuit breaker tests.
+    """
+
+    def __init__(self, photos_per_query: int = 15, image_size: Tuple[int, int] = (1880, 1253),
+                 latency: float = 0.0, quota: Optional[int] = None, quota_window: float = 3600.0):
+        self.photos_per_query = photos_per_query
+        self.image_size = image_size
+        self.latency = latency
+        self.quota = quota
+        self.quota_window = quota_window
+        self.bytes_served = 0
+        self.requests = 0
+        self.rejected = 0
+        self._window_start = time.time()
+        self._window_used = 0
+        self._failures = []
+        self._images: Dict[int, bytes] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.url}/v1"
+
+    def start(self) -> "FakePexelsServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counters(self):
+        with self._lock:
+            self.bytes_served = 0
+            self.requests = 0
+            self.rejected = 0
+
+    def fail_next(self, count: int, status: int = 503, retry_after: Optional[float] = None):
+        """Answer the next ``count`` searches with ``status``"""
+        with self._lock:
+            self._failures.extend([(status, retry_after)] * count)
+
+    def _admit_search(self) -> Tuple[int, Dict[str, str]]:
+        """Status and rate limit headers for the next search"""
+        with self._lock:
+            if self._failures:
+                status, retry_after = self._failures.pop(0)
+                self.rejected += 1
+                return status, {"Retry-After": str(retry_after)} if retry_after is not None else {}
+            if self.quota is None:
+                return 200, {}
+            now = time.time()
+            if now - self._window_start >= self.quota_window:
+                self._window_start, self._window_used = now, 0
+            reset = self._window_start + self.quota_window
+            headers = {"X-Ratelimit-Limit": str(self.quota), "X-Ratelimit-Reset": str(int(reset))}
+            if self._window_used >= self.quota:
+                self.rejected += 1
+                headers.update({"X-Ratelimit-Remaining": "0", "Retry-After": str(max(1, int(reset - now + 0.999)))})
+                return 429, headers
+            self._window_used += 1
+            headers["X-Ratelimit-Remaining"] = str(self.quota - self._window_used)
+            return 200, headers
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _photo_bytes(self, photo_id: int) -> bytes:
+        with self._lock:
+            if photo_id not in self._images:
+                hue = (photo_id * 47) % 255
+                img = Image.new('RGB', self.image_size, (hue, 255 - hue, (hue * 3) % 255))
+                draw = ImageDraw.Draw(img)
+                for i in range(0, self.image_size[0], 40):
+                    draw.line([(i, 0), (self.image_size[0] - i, self.image_size[1])], fill=(255, 255, 255), width=3)
+                buf = io.BytesIO()
+                img.save(buf, 'JPEG', quality=90)
+                self._images[photo_id] = buf.getvalue()
+            return self._images[photo_id]
+
+    def _search(self, query: str, per_page: int) -> Dict:
+        base = sum(ord(c) for c in query) * 100
+        photos = []
+        for i in range(min(per_page, self.photos_per_query)):
+            photo_id = base + i
+            photos.append({
+                "id": photo_id,
+                "alt": query,
+                "src": {"large": f"{self.url}/photos/{photo_id}.jpg"}
+            })
+        return {"photos": photos, "per_page": per_page, "page": 1}
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+                with fake._lock:
+                    fake.bytes_served += len(body)
+                    fake.requests += 1
+
+            def do_GET(self):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                parsed = urlparse(self.path)
+                if parsed.path == "/v1/search":
+                    status, headers = fake._admit_search()
+                    if status != 200:
+                        self._send(status, json.dumps({"error": "rejected"}).encode(), "application/json", headers)
+                        return
+                    params = parse_qs(parsed.query)
+                    query = params.get("query", [""])[0]
+                    per_page = int(params.get("per_page", ["15"])[0])
+                    body = json.dumps(fake._search(query, per_page)).encode()
+                    self._send(200, body, "application/json", headers)
+                elif parsed.path.startswith("/photos/"):
+                    photo_id = int(parsed.path.rsplit("/", 1)[-1].split(".")[0])
+                    self._send(200, fake._photo_bytes(photo_id), "image/jpeg")
+                else:
+                    self._send(404, b"not found", "text/plain")
+
+        return Handler
+
+
+class _Namespace:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeOpenAI:
+    """Offline stand-in for ``OpenAI()`` covering ``chat.completions.create``"""
+
+    def __init__(self, latency: float = 0.0, script_words: int = 300):
+        self.latency = latency
+        self.script_words = script_words
+        self.calls = []
+        self._lock = threading.Lock()
+        self.chat = _Namespace(completions=_Namespace(create=self._create))
+
+    def _create(self, model: str, messages, max_tokens: int = None, **kwargs):
+        with self._lock:
+            self.calls.append({"model": model, "messages": messages, "max_tokens": max_tokens, **kwargs})
+        if self.latency:
+            time.sleep(self.latency)
+        prompt = messages[-1]["content"]
+        if max_tokens and max_tokens <= 100:
+            content = f"A short documentary: {prompt[:80]}"
+        else:
+            sentence = "The History of Rome shaped Europe through Roads, Law and Engineering."
+            words = sentence.split()
+            content = " ".join(words[i % len(words)] for i in range(self.script_words))
+        message = _Namespace(role="assistant", content=content)
+        return _Namespace(choices=[_Namespace(message=message, finish_reason="stop", index=0)], model=model)
+
+
+class FakeElevenLabs:
+    """Offline stand-in for ``ElevenLabs()`` covering ``text_to_speech.convert``.
+
+    Returns a real MP3 (a quiet tone) whose length follows the text at roughly
+    ``words_per_second``, streamed in ``chunk_size`` pieces like the real SDK.
+    """
+
+    def __init__(self, latency: float = 0.0, words_per_second: float = 2.5, chunk_size: int = 4096):
+        self.latency = latency
+        self.words_per_second = words_per_second
+        self.chunk_size = chunk_size
+        self.calls = []
+        self._lock = threading.Lock()
+        self._audio: Dict[int, bytes] = {}
+        self.text_to_speech = _Namespace(convert=self._convert)
+
+    def _mp3_bytes(self, seconds: int) -> bytes:
+        with self._lock:
+            if seconds not in self._audio:
+                import os
+                import tempfile
+                import numpy as np
+                from moviepy.audio.AudioClip import AudioArrayClip
+
+                fps = 44100
+                t = np.linspace(0, seconds, seconds * fps, endpoint=False)
+                tone = 0.1 * np.sin(2 * np.pi * 180 * t)
+                clip = AudioArrayClip(np.column_stack([tone, tone]), fps=fps)
+                fd, path = tempfile.mkstemp(suffix=".mp3")
+                os.close(fd)
+                try:
+                    clip.write_audiofile(path, fps=fps, codec="libmp3lame", bitrate="128k", verbose=False, logger=None)
+                    with open(path, "rb") as f:
+                        self._audio[seconds] = f.read()
+                finally:
+                    clip.close()
+                    os.remove(path)
+            return self._audio[seconds]
+
+    def _convert(self, text: str, voice_id: str = None, model_id: str = None, output_format: str = None, **kwargs):
+        with self._lock:
+            self.calls.append({"text": text, "voice_id": voice_id, "model_id": model_id})
+        if self.latency:
+            time.sleep(self.latency)
+        seconds = max(1, int(round(len(text.split()) / self.words_per_second)))
+        data = self._mp3_bytes(seconds)
+        return (data[i:i + self.chunk_size] for i in range(0, len(data), self.chunk_size))
+
+
+class FakeUploadServer:
+    """Implements YouTube's resumable upload protocol on localhost.
+
+    ``POST /upload/youtube/v3/videos?uploadType=resumable`` opens a session
+    and returns its URI in ``Location``; ``PUT`` to that URI appends a
+    ``Content-Range`` chunk (308 with ``Range`` until the last one, then 200
+    with the video resource) or, with ``bytes */total``, reports progress.
+    ``interrupt_next`` keeps only part of the next chunks and answers 503,
+    like a dropped connection; ``expire_sessions`` makes open sessions 404.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.bytes_received = 0
+        self.requests = 0
+        self.sessions: Dict[str, Dict] = {}
+        self.videos: Dict[str, Dict] = {}
+        self._interruptions = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def upload_url(self) -> str:
+        return f"{self.url}/upload/youtube/v3/videos"
+
+    def start(self) -> "FakeUploadServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def interrupt_next(self, count: int):
+        with self._lock:
+            self._interruptions += count
+
+    def expire_sessions(self):
+        with self._lock:
+            for session in self.sessions.values():
+                session["expired"] = True
+
+    def _open_session(self, body: Dict, total: int) -> str:
+        with self._lock:
+            session_id = f"s{len(self.sessions) + 1}"
+            self.sessions[session_id] = {"total": total, "received": 0, "data": bytearray(),
+                                         "metadata": body, "expired": False}
+        return session_id
+
+    def _put(self, session_id: str, content_range: str, body: bytes) -> Tuple[int, Dict, Optional[Dict]]:
+        """Status, headers and JSON body for a chunk or status query"""
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None or session["expired"]:
+                return 404, {}, {"error": "session not found"}
+            if not content_range.startswith("bytes */"):
+                start = int(content_range.split()[1].split("-")[0])
+                if start == session["received"]:
+                    if self._interruptions:
+                        self._interruptions -= 1
+                        body = body[:len(body) // 2]
+                        session["data"] += body
+                        session["received"] += len(body)
+                        self.bytes_received += len(body)
+                        return 503, {}, {"error": "backend error"}
+                    session["data"] += body
+                    session["received"] += len(body)
+                    self.bytes_received += len(body)
+            if session["received"] >= session["total"]:
+                video_id = f"fake-{session_id}"
+                self.videos[video_id] = {"bytes": bytes(session["data"]), "metadata": session["metadata"]}
+                return 200, {}, {"id": video_id, "snippet": session["metadata"].get("snippet", {})}
+            headers = {"Range": f"bytes=0-{session['received'] - 1}"} if session["received"] else {}
+            return 308, headers, None
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, payload: Optional[Dict], headers: Optional[Dict[str, str]] = None):
+                body = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+            def do_POST(self):
+                parsed = urlparse(self.path)
+                body = self._body()
+                with fake._lock:
+                    fake.requests += 1
+                if parsed.path != "/upload/youtube/v3/videos" or parse_qs(parsed.query).get("uploadType") != ["resumable"]:
+                    self._send(404, {"error": "not found"})
+                    return
+                session_id = fake._open_session(json.loads(body or b"{}"),
+                                                int(self.headers.get("X-Upload-Content-Length", "0")))
+                self._send(200, None, {"Location": f"{fake.url}/upload/session/{session_id}"})
+
+            def do_PUT(self):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                body = self._body()
+                with fake._lock:
+                    fake.requests += 1
+                if not self.path.startswith("/upload/session/"):
+                    self._send(404, {"error": "not found"})
+                    return
+                status, headers, payload = fake._put(self.path.rsplit("/", 1)[-1],
+                                                     self.headers.get("Content-Range", ""), body)
+                self._send(status, payload, headers)
+
+        return Handler
@@ -0,0 +1,165 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app.services.durable_queue import DurableJobQueue
+
+# Jobs are stored by import path, so they run module-level functions
+RAN = []
+GATE = threading.Event()
+STARTED = threading.Event()
+
+
+def record(name):
+    RAN.append(name)
+
+
+def wait_for_gate(name):
+    STARTED.set()
+    GATE.wait(10)
+    RAN.append(name)
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    RAN.clear()
+    GATE.clear()
+    STARTED.clear()
+    yield
+    GATE.set()
+
+
+@pytest.fixture
+def queues(tmp_path):
+    created = []
+
+    def make(**kwargs):
+        kwargs.setdefault("workers", 1)
+        kwargs.setdefault("poll_interval", 0.02)
+        queue = DurableJobQueue(db_path=str(tmp_path / "jobs.db"), **kwargs)
+        created.append(queue)
+        return queue
+
+    yield make
+    for queue in created:
+        queue.shutdown()
+
+
+def _job(queue, job_id):
+    with sqlite3.connect(queue.db_path) as db:
+        return dict(zip(("status", "worker", "attempts", "lease_expires", "error"), db.execute(
+            "SELECT status, worker, attempts, lease_expires, error FROM jobs WHERE job_id = ? ORDER BY seq DESC",
+            (job_id,)
+        ).fetchone()))
+
+
+def _until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _orphan(queue, job_id, attempts=1):
+    """Make a queued job look claimed by a worker that died with its lease already run out"""
+    with sqlite3.connect(queue.db_path) as db:
+        db.execute("UPDATE jobs SET status = 'running', worker = 'gone:1:dead00', lease_expires = ?, "
+                   "attempts = ?, started_at = ? WHERE job_id = ?",
+                   (time.time() - 1, attempts, time.time() - 5, job_id))
+
+
+def test_submitted_jobs_run_on_a_consuming_worker(queues):
+    api = queues(consume=False)
+    api.submit("a", record, "a")
+    api.submit("b", record, "b", priority=5)
+    assert api.positions() == {"b": 1, "a": 2}
+
+    worker = queues()
+    worker.start()
+
+    assert _until(lambda: len(RAN) == 2)
+    assert RAN == ["b", "a"]
+    assert _until(lambda: _job(api, "a")["status"] == "done")
+    assert _job(api, "a")["worker"] == worker.worker_id
+
+
+def test_an_expired_lease_is_taken_over_by_another_worker(queues):
+    api = queues(consume=False)
+    api.submit("job", record, "job")
+    _orphan(api, "job")
+
+    worker = queues()
+    worker.start()
+
+    assert _until(lambda: _job(api, "job")["status"] == "done")
+    job = _job(api, "job")
+    assert RAN == ["job"]
+    assert (job["worker"], job["attempts"]) == (worker.worker_id, 2)
+    assert worker.stats()["requeued"] == 1
+
+
+def test_heartbeat_keeps_a_long_job_leased_to_its_worker(queues):
+    first = queues(lease_seconds=0.3)
+    first.submit("long", wait_for_gate, "long")
+    assert STARTED.wait(5)
+    lease = _job(first, "long")["lease_expires"]
+
+    # A second worker polling all along must not take the job over
+    second = queues(lease_seconds=0.3)
+    second.start()
+    time.sleep(1.0)
+    job = _job(first, "long")
+
+    assert job["lease_expires"] > lease
+    assert (job["status"], job["worker"], job["attempts"]) == ("running", first.worker_id, 1)
+
+    GATE.set()
+    assert _until(lambda: _job(first, "long")["status"] == "done")
+    assert RAN == ["long"]
+
+
+def test_a_worker_that_lost_its_lease_cannot_record_the_outcome(queues):
+    stale = queues()
+    stale.submit("job", wait_for_gate, "job")
+    assert STARTED.wait(5)
+
+    # Another worker took the job over while this one was cut off
+    with sqlite3.connect(stale.db_path) as db:
+        db.execute("UPDATE jobs SET worker = 'other:2:abc123', attempts = 2 WHERE job_id = 'job'")
+    GATE.set()
+
+    assert _until(lambda: stale.stats()["lost"] == 1)
+    job = _job(stale, "job")
+    assert (job["status"], job["worker"]) == ("running", "other:2:abc123")
+    assert stale.stats()["completed"] == 0
+
+
+def test_a_job_whose_workers_keep_dying_is_abandoned(queues):
+    abandoned = []
+    api = queues(consume=False)
+    api.submit("doomed", record, "doomed")
+    _orphan(api, "doomed", attempts=2)
+
+    worker = queues(max_attempts=2, on_abandoned=lambda job_id, error: abandoned.append((job_id, error)))
+    worker.start()
+
+    assert _until(lambda: abandoned)
+    assert abandoned[0][0] == "doomed"
+    assert "gone:1:dead00" in abandoned[0][1]
+    assert _job(api, "doomed")["status"] == "failed"
+    assert RAN == []
+
+
+def test_shutdown_hands_unfinished_jobs_straight_back(queues):
+    first = queues()
+    first.submit("job", wait_for_gate, "job")
+    assert STARTED.wait(5)
+
+    first.shutdown()
+    job = _job(first, "job")
+
+    assert (job["status"], job["worker"], job["attempts"]) == ("queued", None, 0)
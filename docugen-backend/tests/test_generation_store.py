@@ -0,0 +1,150 @@
+import uuid
+from datetime import datetime, timedelta
+
+from app.services.generation_store import GenerationStore
+
+
+def _generation(created_at: str, status: str = "completed", niche: str = "history", **fields):
+    return {"id": str(uuid.uuid4()), "created_at": created_at, "status": status, "niche": niche, **fields}
+
+
+def _walk(store: GenerationStore, **query):
+    pages, after = [], None
+    while True:
+        page, after = store.query(after=after, **query)
+        pages.append([g["id"] for g in page])
+        if after is None:
+            return pages
+
+
+def test_pages_are_newest_first_without_gaps_or_repeats(tmp_path):
+    store = GenerationStore(str(tmp_path / "g.db"))
+    start = datetime(2026, 1, 1)
+    # Pairs share a created_at so the id tiebreak is exercised too
+    inserted = [store.insert(_generation((start + timedelta(minutes=i // 2)).isoformat())) for i in range(7)]
+
+    pages = _walk(store, limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    expected = [g["id"] for g in sorted(inserted, key=lambda g: (g["created_at"], g["id"]), reverse=True)]
+    assert [generation_id for page in pages for generation_id in page] == expected
+
+
+def test_filters_apply_across_pages(tmp_path):
+    store = GenerationStore(str(tmp_path / "g.db"))
+    for i in range(6):
+        store.insert(_generation(f"2026-01-01T00:00:0{i}", status="failed" if i % 2 else "completed",
+                                 niche="science" if i < 3 else "history"))
+
+    failed = [g for page in _walk(store, limit=1, status="failed") for g in page]
+    science = [g for page in _walk(store, limit=2, niche="science", status="completed") for g in page]
+
+    assert len(failed) == 3
+    assert all(store.get(g)["status"] == "failed" for g in failed)
+    assert [store.get(g)["created_at"] for g in science] == ["2026-01-01T00:00:02", "2026-01-01T00:00:00"]
+
+
+def test_change_feed_never_skips_writes_with_the_same_timestamp(tmp_path):
+    store = GenerationStore(str(tmp_path / "g.db"))
+    ts = "2026-01-01T00:00:00"
+    ids = [store.insert(_generation(ts, updated_at=ts))["id"] for _ in range(5)]
+
+    seen, since = [], 0
+    while True:
+        page, _ = store.query(limit=2, since_rev=since)
+        if not page:
+            break
+        seen.extend(g["id"] for g in page)
+        since = page[-1]["rev"]
+    assert seen == ids
+
+    store.update(ids[1], {"status": "failed"})
+    page, _ = store.query(limit=10, since_rev=since)
+    assert [g["id"] for g in page] == [ids[1]]
+
+
+def test_change_feed_reports_deletions(tmp_path):
+    store = GenerationStore(str(tmp_path / "g.db"))
+    kept, removed = (store.insert(_generation("2026-01-01T00:00:00", status="failed")) for _ in range(2))
+    page, _ = store.query(since_rev=0)
+    since = page[-1]["rev"]
+
+    assert store.delete(removed["id"])
+    page, _ = store.query(since_rev=since, status="completed")
+
+    assert [(g["id"], g.get("deleted")) for g in page] == [(removed["id"], True)]
+    assert page[0]["rev"] > since
+    assert store.get(removed["id"]) is None
+    assert [g["id"] for g in store.query()[0]] == [kept["id"]]
+
+
+def test_version_changes_on_every_write(tmp_path):
+    store = GenerationStore(str(tmp_path / "g.db"))
+    before = store.current_version()
+    generation = store.insert(_generation("2026-01-01T00:00:00"))
+    after_insert = store.current_version()
+    store.update(generation["id"], {"status": "failed"})
+
+    assert before < after_insert < store.current_version()
+
+
+def test_version_never_repeats_across_restarts_or_deletes(tmp_path):
+    path = str(tmp_path / "g.db")
+    store = GenerationStore(path)
+    generations = [store.insert(_generation("2026-01-01T00:00:00")) for _ in range(3)]
+    before_restart = store.current_version()
+    store.close()
+
+    # The same number of writes after a restart must not land on a version seen before
+    store = GenerationStore(path)
+    assert store.current_version() == before_restart
+    for _ in range(3):
+        store.insert(_generation("2026-01-01T00:00:01"))
+    after_inserts = store.current_version()
+    store.delete(generations[-1]["id"])
+
+    assert before_restart < after_inserts < store.current_version()
+
+
+def test_generations_etag_answers_304_until_something_changes(api):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(api.app)
+    first = client.get("/api/generations", params={"limit": 5})
+    etag = first.headers["ETag"]
+
+    assert first.status_code == 200
+    assert client.get("/api/generations", params={"limit": 5}, headers={"If-None-Match": etag}).status_code == 304
+    # A different query is a different representation
+    assert client.get("/api/generations", params={"limit": 6}, headers={"If-None-Match": etag}).status_code == 200
+
+    api.generation_store.insert(_generation(datetime.now().isoformat()))
+    changed = client.get("/api/generations", params={"limit": 5}, headers={"If-None-Match": etag})
+
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_shared_stores_see_each_others_writes(tmp_path):
+    path = str(tmp_path / "g.db")
+    api_store = GenerationStore(path, shared=True)
+    worker_store = GenerationStore(path, shared=True)
+    generation = api_store.insert(_generation("2026-01-01T00:00:00", status="generating"))
+    etag_version = api_store.current_version()
+
+    worker_store.update(generation["id"], {"status": "completed", "video_files": {"16:9": "v.mp4"}})
+
+    assert api_store.current_version() > etag_version
+    assert api_store.get(generation["id"])["status"] == "completed"
+    page, _ = api_store.query(status="completed")
+    assert [g["id"] for g in page] == [generation["id"]]
+
+    # Concurrent updates to different fields merge instead of clobbering each other
+    api_store.update(generation["id"], {"title": "Rome"})
+    worker_store.update(generation["id"], {"artifact_bytes": 123})
+    merged = api_store.get(generation["id"])
+    assert (merged["title"], merged["artifact_bytes"], merged["status"]) == ("Rome", 123, "completed")
+
+    worker_store.delete(generation["id"])
+    assert api_store.get(generation["id"]) is None
+    assert len(api_store) == 0
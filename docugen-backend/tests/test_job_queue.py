@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+
+from app.services.job_queue import JobQueue, QueueFullError
+
+
+class Recorder:
+    """Job functions that record their order, with a gate to keep the single worker busy"""
+
+    def __init__(self):
+        self.ran = []
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.done = threading.Semaphore(0)
+
+    def blocker(self):
+        self.started.set()
+        self.gate.wait(5)
+        self.done.release()
+
+    def record(self, name):
+        self.ran.append(name)
+        self.done.release()
+
+    def other(self, name):
+        self.record(name)
+
+    def wait_for(self, count):
+        for _ in range(count):
+            assert self.done.acquire(timeout=5)
+
+
+@pytest.fixture
+def recorder():
+    recorder = Recorder()
+    yield recorder
+    recorder.gate.set()
+
+
+def test_runs_by_priority_then_submission_order(recorder):
+    queue = JobQueue(workers=1, max_size=10)
+    queue.submit("block", recorder.blocker)
+    assert recorder.started.wait(5)
+
+    queue.submit("a", recorder.record, "a")
+    queue.submit("b", recorder.record, "b", priority=5)
+    queue.submit("c", recorder.record, "c")
+    assert queue.positions() == {"b": 1, "a": 2, "c": 3}
+    assert queue.is_running("block")
+
+    recorder.gate.set()
+    recorder.wait_for(4)
+    queue.shutdown()
+    assert recorder.ran == ["b", "a", "c"]
+    assert queue.depth == 0
+
+
+def test_rejects_jobs_beyond_max_size(recorder):
+    queue = JobQueue(workers=1, max_size=2)
+    queue.submit("block", recorder.blocker)
+    assert recorder.started.wait(5)
+    assert queue.submit("a", recorder.record, "a") == 1
+    assert queue.submit("b", recorder.record, "b") == 2
+
+    with pytest.raises(QueueFullError):
+        queue.submit("c", recorder.record, "c")
+
+    recorder.gate.set()
+    recorder.wait_for(3)
+    queue.shutdown()
+
+
+def test_a_held_job_waits_while_jobs_behind_it_run(recorder):
+    held = {recorder.record: 30.0}
+    queue = JobQueue(workers=1, hold=lambda fn: held.get(fn, 0.0))
+    queue.submit("held", recorder.record, "held", priority=5)
+    queue.submit("free", recorder.other, "free")
+
+    recorder.wait_for(1)
+    assert recorder.ran == ["free"]
+    assert queue.positions() == {"held": 1}
+    assert queue.stats()["held_for"] == 30.0
+
+    held.clear()
+    with queue._cond:
+        queue._cond.notify_all()
+    recorder.wait_for(1)
+    queue.shutdown()
+    assert recorder.ran == ["free", "held"]
+
+
+def test_a_failing_job_does_not_stop_the_worker(recorder):
+    def boom():
+        raise RuntimeError("boom")
+
+    queue = JobQueue(workers=1)
+    queue.submit("boom", boom)
+    queue.submit("after", recorder.record, "after")
+
+    recorder.wait_for(1)
+    queue.shutdown()
+    assert recorder.ran == ["after"]
@@ -0,0 +1,157 @@
+import time
+
+import pytest
+import requests
+
+from app.services.rate_limit import (CircuitBreaker, ProviderLimiter, ProviderUnavailableError, RateLimits,
+                                     RETRYABLE_STATUSES, TokenBucket, classify_error)
+
+
+def _limiter(rate_per_minute=6000.0, burst=10, max_wait=None, failures=3, reset_seconds=0.2, max_retries=2):
+    return ProviderLimiter("pexels", TokenBucket("pexels", rate_per_minute, burst, max_wait),
+                           CircuitBreaker("pexels", failure_threshold=failures, reset_seconds=reset_seconds),
+                           max_retries=max_retries, base_delay=0.01, max_delay=0.05)
+
+
+def _search(server):
+    """What VideoGenerator._search_pexels hands the limiter"""
+    def request():
+        response = requests.get(f"{server.api_url}/search", params={"query": "rome", "per_page": 3}, timeout=5)
+        if response.status_code in RETRYABLE_STATUSES:
+            response.raise_for_status()
+        return response
+    return request
+
+
+def test_retries_through_a_short_outage(pexels_server):
+    limiter = _limiter()
+    pexels_server.fail_next(2, status=503)
+
+    response = limiter.call(_search(pexels_server))
+
+    assert response.status_code == 200
+    assert pexels_server.rejected == 2
+    assert limiter.stats()["retries"] == 2
+    assert limiter.breaker.state == "closed"
+
+
+def test_circuit_opens_fails_fast_and_recovers_through_a_probe(pexels_server):
+    limiter = _limiter(failures=2, reset_seconds=0.2, max_retries=3)
+    pexels_server.fail_next(2, status=502)
+
+    with pytest.raises(ProviderUnavailableError):
+        limiter.call(_search(pexels_server))
+    assert limiter.breaker.state == "open"
+    assert limiter.hold_for > 0
+
+    requests_before = pexels_server.requests
+    with pytest.raises(ProviderUnavailableError, match="circuit open"):
+        limiter.call(_search(pexels_server))
+    assert pexels_server.requests == requests_before
+
+    time.sleep(0.25)
+    assert limiter.call(_search(pexels_server)).status_code == 200
+    assert limiter.breaker.state == "closed"
+    assert limiter.breaker.stats()["trips"] == 1
+
+
+def test_a_probe_refused_by_the_bucket_does_not_wedge_the_circuit(pexels_server):
+    limiter = _limiter(max_wait=1.0, failures=1, reset_seconds=0.2)
+    pexels_server.fail_next(1, status=429, retry_after=1.5)
+
+    with pytest.raises(ProviderUnavailableError):
+        limiter.call(_search(pexels_server))
+    time.sleep(0.25)
+
+    # Half-open, but the bucket is still paused past max_wait: the probe never reaches Pexels
+    requests_before = pexels_server.requests
+    for _ in range(2):
+        with pytest.raises(ProviderUnavailableError, match="rate limited"):
+            limiter.call(_search(pexels_server))
+    assert pexels_server.requests == requests_before
+    assert limiter.hold_for > 0
+
+    time.sleep(limiter.bucket.paused_for + 0.05)
+    assert limiter.call(_search(pexels_server)).status_code == 200
+    assert limiter.breaker.state == "closed"
+
+
+def test_client_errors_are_not_retried_or_counted_against_the_circuit(pexels_server):
+    limiter = _limiter(failures=1)
+    pexels_server.fail_next(1, status=403)
+
+    assert limiter.call(_search(pexels_server)).status_code == 403
+    assert limiter.stats()["retries"] == 0
+    assert limiter.breaker.state == "closed"
+
+
+def test_throttling_slows_the_bucket_and_honours_retry_after(pexels_server):
+    limiter = _limiter(rate_per_minute=600.0, max_wait=5.0)
+    pexels_server.fail_next(1, status=429, retry_after=0.3)
+
+    start = time.monotonic()
+    response = limiter.call(_search(pexels_server))
+
+    assert response.status_code == 200
+    assert time.monotonic() - start >= 0.3
+    assert limiter.bucket.stats()["throttled"] == 1
+    assert limiter.bucket.rate_per_minute < 600.0
+
+
+def test_an_exhausted_quota_gives_up_at_max_wait_instead_of_sleeping_until_the_reset():
+    from tests.fakes import FakePexelsServer
+
+    with FakePexelsServer(photos_per_query=1, image_size=(8, 8), quota=2, quota_window=3600) as server:
+        limiter = _limiter(max_wait=1.0)
+        for _ in range(2):
+            assert limiter.call(_search(server)).status_code == 200
+
+        # The last answer said Remaining: 0 until the hour is up
+        start = time.monotonic()
+        with pytest.raises(ProviderUnavailableError) as raised:
+            limiter.call(_search(server))
+
+    assert time.monotonic() - start < 1.0
+    assert raised.value.retry_after > 60
+    assert limiter.bucket.stats()["refused"] == 1
+
+
+def test_a_retry_after_beyond_max_wait_gives_up_at_once(pexels_server):
+    limiter = _limiter(max_wait=1.0)
+    pexels_server.fail_next(1, status=429, retry_after=120)
+
+    start = time.monotonic()
+    with pytest.raises(ProviderUnavailableError) as raised:
+        limiter.call(_search(pexels_server))
+
+    assert time.monotonic() - start < 1.0
+    assert raised.value.retry_after == 120
+
+
+def test_bucket_spreads_a_burst_at_the_configured_rate():
+    bucket = TokenBucket("test", rate_per_minute=600.0, burst=2)
+    waits = [bucket.acquire() for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.1, abs=0.02)
+    assert waits[3] == pytest.approx(0.1, abs=0.02)
+
+
+def test_only_providers_without_a_fallback_hold_jobs():
+    limits = RateLimits()
+    limits.provider("pexels").bucket.throttle(retry_after=600)
+    assert limits.hold_for() == 0.0
+
+    limits.provider("openai").bucket.throttle(retry_after=600)
+    assert limits.hold_for() > 500
+    assert limits.hold_for(["pexels", "elevenlabs"]) == 0.0
+    assert limits.hold_for(["openai"]) > 500
+
+
+def test_only_network_failures_are_retryable():
+    assert classify_error(requests.ConnectionError("reset"))["retryable"]
+    assert classify_error(requests.Timeout("slow"))["retryable"]
+    assert classify_error(ConnectionResetError())["retryable"]
+    assert not classify_error(OSError(28, "No space left on device"))["retryable"]
+    assert not classify_error(PermissionError("denied"))["retryable"]
+    assert not classify_error(ValueError("bad"))["retryable"]
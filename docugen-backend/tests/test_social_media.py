@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from app.services import social_media
+from app.services.social_media import SocialMediaUploader, UploadStore
+
+CHUNK = 256 * 1024
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(os.urandom(CHUNK * 3 + 1000))
+    return str(path)
+
+
+@pytest.fixture
+def uploader(upload_server, tmp_path, monkeypatch):
+    # No real backoff between attempts
+    monkeypatch.setattr(social_media.random, "uniform", lambda low, high: 0.0)
+    uploader = SocialMediaUploader(store=UploadStore(str(tmp_path / "uploads.db")))
+    uploader.youtube_api_key = "test-key"
+    uploader.youtube_access_token = uploader.youtube_refresh_token = None
+    uploader.youtube_upload_url = upload_server.upload_url
+    uploader.chunk_size = CHUNK
+    uploader.max_retries = 3
+    return uploader
+
+
+def _upload(uploader, video):
+    upload = uploader._new_upload("gen-1", "youtube", video, "Title", "Description")
+    return upload, uploader.upload_to_youtube(video, "Title", "Description", upload=upload)
+
+
+def _uploaded_bytes(server, result):
+    return server.videos[result["video_id"]]["bytes"]
+
+
+def test_resumes_from_the_server_offset_after_an_interrupted_chunk(uploader, upload_server, video):
+    upload_server.interrupt_next(1)
+
+    upload, result = _upload(uploader, video)
+
+    assert result["status"] == "success"
+    with open(video, "rb") as f:
+        assert _uploaded_bytes(upload_server, result) == f.read()
+    # Half of the interrupted chunk was kept and not sent again
+    assert upload_server.bytes_received == os.path.getsize(video)
+    assert len(upload_server.sessions) == 1
+    assert upload["bytes_sent"] == os.path.getsize(video)
+
+
+def test_starts_a_new_session_when_the_old_one_expires(uploader, upload_server, video):
+    progress = []
+
+    def expire_once(upload):
+        progress.append(upload["bytes_sent"])
+        if len(progress) == 2:
+            upload_server.expire_sessions()
+
+    uploader.on_progress = expire_once
+    upload, result = _upload(uploader, video)
+
+    assert result["status"] == "success"
+    assert len(upload_server.sessions) == 2
+    with open(video, "rb") as f:
+        assert _uploaded_bytes(upload_server, result) == f.read()
+    # The restart went back to the start of the file
+    assert progress[2] == 0
+
+
+def test_gives_up_after_max_retries_interruptions(uploader, upload_server, video):
+    upload_server.interrupt_next(100)
+
+    upload, result = _upload(uploader, video)
+
+    assert result["status"] == "error"
+    assert not upload_server.videos
+    # One chunk and one offset query per attempt, after the first attempt's chunk
+    assert upload_server.requests == 1 + (uploader.max_retries + 1) + uploader.max_retries
+    assert uploader.store.get(upload["id"])["session_uri"]
+
+
+def test_gives_up_when_every_session_expires(uploader, upload_server, video):
+    uploader.on_progress = lambda upload: upload_server.expire_sessions()
+
+    upload, result = _upload(uploader, video)
+
+    assert result["status"] == "error"
+    assert "expired" in result["message"]
+    assert len(upload_server.sessions) == uploader.max_retries + 1
+    assert not upload_server.videos
@@ -0,0 +1,89 @@
+import pytest
+
+from app.services.voice import (Mp3DurationTracker, mp3_frames, parse_frame_header, split_script, stream_to_file,
+                                without_leading_tags)
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, no padding: 417-byte frames of 1152 samples
+HEADER = bytes([0xFF, 0xFB, 0x90, 0x00])
+FRAME_SECONDS = 1152 / 44100
+
+
+def _frame(fill: int = 0) -> bytes:
+    return HEADER + bytes([fill]) * 413
+
+
+def _info_frame() -> bytes:
+    frame = bytearray(_frame())
+    frame[36:40] = b"Info"
+    return bytes(frame)
+
+
+def _id3(payload_size: int = 300) -> bytes:
+    size = bytes([(payload_size >> shift) & 0x7F for shift in (21, 14, 7, 0)])
+    return b"ID3\x04\x00\x00" + size + b"\x00" * payload_size
+
+
+def _mp3(frames: int, tag: bool = True, info: bool = True) -> bytes:
+    return (_id3() if tag else b"") + (_info_frame() if info else b"") + b"".join(_frame(i % 7) for i in range(frames))
+
+
+def _chunks(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_parses_a_frame_header():
+    assert parse_frame_header(HEADER) == (417, 1152, 44100)
+    assert parse_frame_header(b"ID3\x04") is None
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 417, 4096, 1 << 20])
+def test_tracker_counts_audio_frames_whatever_the_chunking(chunk_size):
+    tracker = Mp3DurationTracker()
+    for chunk in _chunks(_mp3(40), chunk_size):
+        tracker.feed(chunk)
+
+    # Neither the ID3 tag nor the Info frame counts as audio
+    assert tracker.frames == 40
+    assert tracker.duration == pytest.approx(40 * FRAME_SECONDS)
+    assert tracker.bytes_seen == len(_mp3(40))
+
+
+def test_tracker_duration_grows_as_bytes_arrive():
+    tracker = Mp3DurationTracker()
+    durations = [tracker.feed(chunk) for chunk in _chunks(_mp3(20, tag=False, info=False), 417 * 5)]
+
+    assert durations == sorted(durations)
+    assert durations[0] == pytest.approx(5 * FRAME_SECONDS)
+    assert durations[-1] == pytest.approx(20 * FRAME_SECONDS)
+
+
+def test_stream_to_file_writes_everything_and_reports_progress(tmp_path):
+    progress = []
+    path = tmp_path / "voice.mp3"
+    data = _mp3(12)
+
+    duration = stream_to_file(_chunks(data, 1000), str(path), lambda sent, seconds: progress.append((sent, seconds)))
+
+    assert path.read_bytes() == data
+    assert duration == pytest.approx(12 * FRAME_SECONDS)
+    assert progress[-1] == (len(data), duration)
+
+
+def test_segments_join_into_one_stream_with_the_combined_duration():
+    first = b"".join(without_leading_tags(_chunks(_mp3(10), 50)))
+    second, second_duration = mp3_frames(_mp3(6))
+    tracker = Mp3DurationTracker()
+    tracker.feed(first + second)
+
+    assert first[:4] == HEADER
+    assert second_duration == pytest.approx(6 * FRAME_SECONDS)
+    assert tracker.frames == 16
+
+
+def test_split_script_packs_paragraphs_up_to_the_limit():
+    script = "\n\n".join(["Short one."] * 3 + ["A long sentence here. " * 20])
+    segments = split_script(script, max_chars=120)
+
+    assert segments[0] == "Short one.\n\nShort one.\n\nShort one."
+    assert all(len(segment) <= 120 for segment in segments)
+    assert " ".join(segments[1:]).split() == ("A long sentence here. " * 20).split()